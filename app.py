@@ -1,18 +1,84 @@
-from flask import Flask
+import time
+started = time.perf_counter()
+
+import logging
+import os
+from flask import Flask, Response, g, request, jsonify
 from routes.weather import weather_blueprint
 from routes.predict import predict_blueprint
+from routes.rainfall import rainfall_blueprint
 from flask_cors import CORS
+from services.artifacts import admin_allowed, reload_models, reload_on_sighup
+from services.metrics import begin_request, end_request, metrics, record_error
+from services.model_bundle import BundleError
+from services.open_meteo import get_client
+from services.profiler import slow_request_profiler
+from services.resources import resources
 
 app = Flask(__name__)
+logger = logging.getLogger(__name__)
 CORS(app)  # Enable CORS for frontend integration
 
 # Register Blueprints
 app.register_blueprint(weather_blueprint, url_prefix="/weather")
 app.register_blueprint(predict_blueprint, url_prefix="/predict")
+app.register_blueprint(rainfall_blueprint, url_prefix="/rainfall")
+
+# Models and datasets load on first use; WARMUP=1 loads them all at startup instead
+if os.environ.get("WARMUP", "0") == "1":
+    resources.warm_up()
+resources.startup_seconds = round(time.perf_counter() - started, 4)
+logger.info("Startup took %.3fs (rss %s MB)", resources.startup_seconds, resources.stats()["rss_mb"])
+
+@app.before_request
+def start_timing():
+    g.started = begin_request()
+    if slow_request_profiler:
+        slow_request_profiler.begin()
+
+@app.after_request
+def finish_timing(response):
+    # Route templates, not raw paths, keep the endpoint label to a handful of values
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    elapsed, server_timing = end_request(endpoint, response.status_code, g.started)
+    response.headers["Server-Timing"] = server_timing
+    if slow_request_profiler:
+        slow_request_profiler.end(f"{request.method} {request.path}", elapsed)
+    return response
 
 @app.route("/", methods=["GET"])
 def home():
     return {"message": "Welcome to Crop Prediction API!"}
 
+@app.route("/status", methods=["GET"])
+def status():
+    """Load time and memory of each shared resource."""
+    return {**resources.stats(), "open_meteo": get_client().stats()}
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Stage timings and counters of this process, in the Prometheus text format."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/admin/reload", methods=["POST"])
+def admin_reload():
+    """Swap in the active model bundle, or activate {"version": ...} first, without a restart.
+
+    Only this process reloads at once; other workers see the new CURRENT
+    bundle within MODEL_CHECK_SECONDS.
+    """
+    if not admin_allowed(request.headers.get("X-Admin-Token")):
+        return jsonify({"error": "Forbidden"}), 403
+    try:
+        data = request.get_json(silent=True)
+        version = reload_models(data.get("version") if isinstance(data, dict) else None)
+    except BundleError as e:
+        return jsonify({"error": f"{e}; still serving the old model"}), 400
+    except Exception as e:
+        record_error("admin_reload", e)
+        return jsonify({"error": f"Model reload failed, still serving the old model: {e}"}), 500
+    return jsonify({"model_version": version, "generation": resources.generation}), 200
+
 if __name__ == "__main__":
+    reload_on_sighup()
     app.run(host="0.0.0.0", port=5001, debug=True)
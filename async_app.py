@@ -0,0 +1,212 @@
+"""Async serving stack for /weather/ and /predict/.
+
+Open-Meteo calls share one pooled keep-alive aiohttp session (with the same
+coalescing and circuit breaker as the sync client), so a request waiting on
+the archive holds a coroutine rather than a thread, and model scoring runs on
+a small thread pool. Responses match the Flask app's.
+
+    python async_app.py --port 5002
+    gunicorn -c gunicorn.conf.py async_app:app -k aiohttp.GunicornWebWorker
+"""
+import time
+started = time.perf_counter()
+
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from aiohttp import web
+from routes.predict import cached_prediction, read_district, read_soil, render_prediction
+from routes.weather import format_weather
+from services.artifacts import admin_allowed, reload_models, reload_on_sighup
+from services.climate_store import get_or_fetch_seasons_async
+from services.districts import get_lat_lon, parse_lat_lon, resolution_headers, resolve_query
+from services.metrics import begin_request, end_request, metrics, record_error, span
+from services.model_bundle import BundleError
+from services.open_meteo import AsyncOpenMeteoClient
+from services.resources import resources
+
+logger = logging.getLogger(__name__)
+
+# Scoring is CPU-bound and short, so a couple of threads keep the event loop free
+INFERENCE_THREADS = int(os.environ.get("INFERENCE_THREADS", "2"))
+inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_THREADS, thread_name_prefix="inference")
+
+open_meteo_key = web.AppKey("open_meteo", AsyncOpenMeteoClient)
+
+
+def json_response(payload, status=200):
+    # Same bytes as Flask's jsonify: sorted keys, compact, ASCII-escaped
+    text = json.dumps(payload, sort_keys=True, separators=(",", ":")) + "\n"
+    return web.Response(text=text, status=status, content_type="application/json")
+
+
+async def get_seasonal_weather(request, district):
+    lat, lon = get_lat_lon(district)
+    if lat is None or lon is None:
+        return {}
+    return await get_or_fetch_seasons_async(lat, lon, request.app[open_meteo_key].season_averages)
+
+
+async def home(request):
+    return json_response({"message": "Welcome to Crop Prediction API!"})
+
+
+async def status(request):
+    """Load time and memory of each shared resource."""
+    return json_response({**resources.stats(), "open_meteo": request.app[open_meteo_key].stats()})
+
+
+async def weather(request):
+    district = request.query.get("district")
+    try:
+        lat, lon = parse_lat_lon(request.query.get("lat"), request.query.get("lon"))
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+
+    if not district and lat is None:
+        return json_response({"error": "District parameter is required"}, 400)
+    try:
+        with span("district"):
+            district, how = resolve_query(district, lat, lon)
+        if not district:
+            return json_response({"error": f"No district within reach of {lat}, {lon}"}, 404)
+
+        with span("climate"):
+            climate = await get_seasonal_weather(request, district)
+        with span("render"):
+            payload, status_code = format_weather(district, climate)
+            response = json_response(payload, status_code)
+        response.headers.update(resolution_headers(district, how))
+        return response
+
+    except Exception as e:
+        record_error("weather", e)
+        return json_response({"error": str(e)}, 500)
+
+
+async def predict(request):
+    try:
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None  # read_district answers with a 400
+        with span("district"):
+            district, how, error = read_district(data)
+        if error:
+            return json_response({"error": error[0]}, error[1])
+
+        soil, error = read_soil(data)
+        if error:
+            return json_response({"error": error[0]}, error[1])
+        with span("cache"):
+            cache_key, body = cached_prediction(district, soil)
+        if body is None:
+            with span("climate"):
+                seasonal_weather = await get_seasonal_weather(request, district)
+            # Run in this request's context, so the scoring spans are reported with it
+            body = await asyncio.get_running_loop().run_in_executor(
+                inference_executor, contextvars.copy_context().run, render_prediction, district, soil,
+                seasonal_weather, cache_key
+            )
+        if body is None:
+            return json_response({"error": f"Could not fetch weather data for {district}"}, 500)
+        return web.Response(text=body, content_type="application/json", headers=resolution_headers(district, how))
+
+    except Exception as e:
+        record_error("predict", e)
+        return json_response({"error": str(e)}, 500)
+
+
+async def metrics_endpoint(request):
+    """Stage timings and counters of this process, in the Prometheus text format."""
+    return web.Response(body=metrics.render().encode(), headers={"Content-Type": "text/plain; version=0.0.4"})
+
+
+async def admin_reload(request):
+    """Same as the Flask app's /admin/reload; the model is built off the event loop."""
+    if not admin_allowed(request.headers.get("X-Admin-Token")):
+        return json_response({"error": "Forbidden"}, 403)
+    try:
+        data = await request.json() if request.can_read_body else {}
+    except ValueError:
+        return json_response({"error": "Request body must be JSON"}, 400)
+    try:
+        version = await asyncio.get_running_loop().run_in_executor(
+            inference_executor, reload_models, (data if isinstance(data, dict) else {}).get("version")
+        )
+    except BundleError as e:
+        return json_response({"error": f"{e}; still serving the old model"}, 400)
+    except Exception as e:
+        record_error("admin_reload", e)
+        return json_response({"error": f"Model reload failed, still serving the old model: {e}"}, 500)
+    return json_response({"model_version": version, "generation": resources.generation})
+
+
+@web.middleware
+async def cors(request, handler):
+    """Allow any origin, like flask_cors' defaults on the sync app."""
+    if request.method == "OPTIONS":
+        response = web.Response(headers={
+            "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+            "Access-Control-Allow-Headers": request.headers.get("Access-Control-Request-Headers", "*"),
+        })
+    else:
+        response = await handler(request)
+    response.headers["Access-Control-Allow-Origin"] = "*"
+    return response
+
+
+@web.middleware
+async def timing(request, handler):
+    """Request latency and counts, with the stage timings sent back in Server-Timing."""
+    started = begin_request()
+    resource = request.match_info.route.resource
+    endpoint = resource.canonical if resource is not None else "unmatched"
+    try:
+        response = await handler(request)
+    except web.HTTPException as e:
+        # 404s and 405s arrive as exceptions
+        _, e.headers["Server-Timing"] = end_request(endpoint, e.status, started)
+        raise
+    _, response.headers["Server-Timing"] = end_request(endpoint, response.status, started)
+    return response
+
+
+async def open_meteo_client(app):
+    # The session belongs to the worker's event loop, so it is opened here
+    app[open_meteo_key] = AsyncOpenMeteoClient()
+    yield
+    await app[open_meteo_key].close()
+
+
+def make_app():
+    app = web.Application(middlewares=[cors, timing])
+    app.cleanup_ctx.append(open_meteo_client)
+    app.router.add_get("/", home)
+    app.router.add_get("/status", status)
+    app.router.add_get("/weather/", weather)
+    app.router.add_post("/predict/", predict)
+    app.router.add_get("/metrics", metrics_endpoint)
+    app.router.add_post("/admin/reload", admin_reload)
+    return app
+
+
+app = make_app()
+
+# Models and datasets load on first use; WARMUP=1 loads them all at startup instead
+if os.environ.get("WARMUP", "0") == "1":
+    resources.warm_up()
+resources.startup_seconds = round(time.perf_counter() - started, 4)
+logger.info("Startup took %.3fs (rss %s MB)", resources.startup_seconds, resources.stats()["rss_mb"])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Async Crop Prediction API")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5002)
+    args = parser.parse_args()
+    reload_on_sighup()
+    web.run_app(app, host=args.host, port=args.port)
@@ -0,0 +1,56 @@
+import argparse
+import time
+import numpy as np
+from services.climate_store import iter_or_fetch_many
+from services.districts import get_registry
+from services.open_meteo import MAX_LOCATIONS, METEO_API_URL, OpenMeteoClient
+from services.recommendation_map import (build_recommendation_map, load_soil_profiles, models_version,
+                                         read_models_version, recommendation_map_path, soil_profiles_path,
+                                         write_recommendation_map)
+from services.resources import resources
+
+
+def district_climate(url):
+    """Seasonal climate of every district: from the store, fetching misses in multi-location calls."""
+    registry = get_registry()
+    points = {(float(registry.lat[p]), float(registry.lon[p])) for p in set(registry.index.values())
+              if not np.isnan(registry.lat[p])}
+    client = OpenMeteoClient(url=url)
+    return dict(iter_or_fetch_many(sorted(points), client.season_averages_many, chunk_size=MAX_LOCATIONS))
+
+
+def run(url, profiles_path, output):
+    started = time.perf_counter()
+    profiles = load_soil_profiles(profiles_path)
+    # Score with whatever models/ holds now, not what was loaded at import
+    resources.reload(["inference"])
+    arrays = build_recommendation_map(district_climate(url), profiles)
+    write_recommendation_map(arrays, output)
+
+    districts, _, seasons = arrays["available"].shape
+    missing = districts * seasons - int(arrays["available"][:, 0].sum())
+    print(f"✅ {districts} districts x {len(profiles)} profiles x {seasons} seasons in "
+          f"{time.perf_counter() - started:.2f}s ({missing} district-seasons without climate); wrote {output}")
+    return missing
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute /predict/ answers for standard soil profiles")
+    parser.add_argument("--url", default=METEO_API_URL, help="Open-Meteo archive endpoint (or a local fake)")
+    parser.add_argument("--profiles", default=soil_profiles_path)
+    parser.add_argument("--output", default=recommendation_map_path)
+    parser.add_argument("--force", action="store_true", help="Rebuild even if models/ hasn't changed")
+    parser.add_argument("--watch", type=float, metavar="SECONDS",
+                        help="Keep running and rebuild whenever models/ changes, checking this often")
+    args = parser.parse_args()
+
+    while True:
+        # The artifact records the models/ fingerprint it was built from
+        if args.force or read_models_version(args.output) != models_version():
+            run(args.url, args.profiles, args.output)
+            args.force = False
+        elif not args.watch:
+            print(f"👍 {args.output} is up to date with models/")
+        if not args.watch:
+            break
+        time.sleep(args.watch)
@@ -1,26 +1,21 @@
 import streamlit as st
 import pandas as pd
-import joblib
 import numpy as np
 import matplotlib.pyplot as plt
 import requests
 import os
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
-import openmeteo_requests
-import requests_cache
-from retry_requests import retry
+from services.artifacts import get_inference_model
+from services.climate_store import get_or_fetch
+from services.districts import get_lat_lon, get_rainfall
+from services.inference import build_feature_matrix, predict_top_k
+from services.open_meteo import fetch_season_averages
 
 # Load environment variables
 load_dotenv()
 
-# Load trained model and preprocessing files
-model = joblib.load("./pkl_files/crop_prediction_xgb_model.pkl")
-label_encoder = joblib.load("./pkl_files/label_encoder.pkl")
-scaler = joblib.load("./pkl_files/scaler.pkl")
-
-# Define feature names
-feature_names = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+# Load the active model bundle through the same loader as the API
+inference = get_inference_model()
 
 # Define crop seasons
 season_crops = {
@@ -29,76 +24,13 @@ season_crops = {
     "WINTER": ["Wheat", "Chickpea", "Lentil", "Kidneybeans", "Apple", "Grapes", "Papaya"]
 }
 
-# Load Rainfall Dataset
-rainfall_data = pd.read_csv("./data/rainfall.csv")  # Ensure this file exists
-
-# Open-Meteo API Configuration
-cache_session = requests_cache.CachedSession('.cache', expire_after=3600)
-retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-openmeteo = openmeteo_requests.Client(session=retry_session)
-
-# Function to get latitude and longitude for a district
-def get_lat_lon(district):
-    row = rainfall_data[rainfall_data["DISTRICT"].str.strip().str.lower() == district.strip().lower()]
-    if not row.empty:
-        coord_str = row.iloc[0]["coord"]
-        coord_dict = eval(coord_str.strip())  # Convert string to dictionary
-        return coord_dict["lat"], coord_dict["lon"]
-    return None, None
-
-# Function to fetch historical temperature and humidity using Open-Meteo API
+# Function to fetch historical temperature and humidity through the shared Open-Meteo client
 def get_historical_weather(district, season):
     lat, lon = get_lat_lon(district)
     if lat is None or lon is None:
         st.warning(f"⚠️ Could not fetch coordinates for {district}.")
         return None, None
-
-    # Define date ranges for each season
-    year = datetime.now().year - 5  # Fetch data of 5 yr before
-    if season == "SUMMER":
-        start_date = f"{year}-04-01"
-        end_date = f"{year}-06-30"
-    elif season == "MONSOON":
-        start_date = f"{year}-07-01"
-        end_date = f"{year}-09-30"
-    elif season == "WINTER":
-        start_date = f"{year}-12-01"
-        end_date = f"{year + 1}-02-28"
-    else:
-        st.warning(f"⚠️ Invalid season: {season}.")
-        return None, None
-
-    # Make API request
-    url = "https://archive-api.open-meteo.com/v1/archive"
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "start_date": start_date,
-        "end_date": end_date,
-        "hourly": ["temperature_2m", "relative_humidity_2m"],
-        "timezone": "Asia/Kolkata"
-    }
-    responses = openmeteo.weather_api(url, params=params)
-
-    # Process the response
-    response = responses[0]
-    hourly = response.Hourly()
-    hourly_temperature_2m = hourly.Variables(0).ValuesAsNumpy()
-    hourly_relative_humidity_2m = hourly.Variables(1).ValuesAsNumpy()
-
-    # Calculate average temperature and humidity
-    avg_temperature = np.mean(hourly_temperature_2m)
-    avg_humidity = np.mean(hourly_relative_humidity_2m)
-
-    return avg_temperature, avg_humidity
-
-# Get Rainfall Data from Dataset using Seasonal Columns
-def get_rainfall(district, season):
-    season_col_map = {"WINTER": "Oct-Dec", "SUMMER": "Mar-May", "MONSOON": "Jun-Sep"}
-    row = rainfall_data[rainfall_data["DISTRICT"] == district]
-    if not row.empty and season in season_col_map:
-        return row.iloc[0][season_col_map[season]]
-    return 0  # Default to 0 if no data found
+    return get_or_fetch(lat, lon, season, fetch_season_averages)
 
 # Streamlit App UI
 st.title("🌾 Crop Prediction Web App")
@@ -129,20 +61,21 @@ if st.button("Fetch Weather Data"):
 # Predict Crop Button
 if st.button("Predict Crop"):
     st.write("## 🌍 Best Crops for Each Season")
-    crop_recommendations = {}
-    for season, crops in season_crops.items():
-        season_predictions = []
+    crop_recommendations = {season: [] for season in season_crops}
+    seasons, climate_rows = [], []
+    for season in season_crops:
         temperature, humidity = get_historical_weather(selected_district, season)
         rainfall = get_rainfall(selected_district, season)
         if temperature is not None:
-            input_data = pd.DataFrame([[nitrogen, phosphorus, potassium, temperature, humidity, pH_level, rainfall]],
-                                      columns=feature_names)
-            input_data_scaled = scaler.transform(input_data)
-            prediction_probs = model.predict_proba(input_data_scaled)[0]
-            top_indices = np.argsort(prediction_probs)[-3:][::-1]
-            top_crops = label_encoder.inverse_transform(top_indices)
-            season_predictions.extend(top_crops)
-        crop_recommendations[season] = list(set(season_predictions))
+            seasons.append(season)
+            climate_rows.append((temperature, humidity, rainfall))
+
+    # Score all seasons with one batched model call
+    input_data = build_feature_matrix(nitrogen, phosphorus, potassium, pH_level, climate_rows)
+    top_indices, _ = predict_top_k(inference.model, inference.scaler, input_data, k=3)
+    for row, season in enumerate(seasons):
+        top_crops = inference.classes[top_indices[row]]
+        crop_recommendations[season] = list(set(top_crops))
 
     for season, crops in crop_recommendations.items():
         st.write(f"### 🌿 {season} Season")
@@ -0,0 +1,30 @@
+import gc
+import os
+
+# Pre-fork serving: the master loads every model and dataset once, then forks
+# workers that share those pages copy-on-write.
+#
+#   gunicorn -c gunicorn.conf.py app:app
+#
+# PRELOAD=0 falls back to each worker loading its own copies.
+bind = os.environ.get("BIND", "0.0.0.0:5001")
+workers = int(os.environ.get("WEB_CONCURRENCY", "4"))
+threads = int(os.environ.get("THREADS", "4"))
+preload_app = os.environ.get("PRELOAD", "1") == "1"
+
+if preload_app:
+    # Load everything in the master, with large arrays in shared memory-mapped files
+    os.environ.setdefault("WARMUP", "1")
+    os.environ.setdefault("SHARED_ARRAYS", "1")
+    # No collections in the master: they would rewrite GC headers of every object
+    gc.disable()
+
+
+def pre_fork(server, worker):
+    # Park everything loaded so far in the permanent generation, so the workers'
+    # collections never touch (and copy) those pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
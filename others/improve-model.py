@@ -1,99 +1,22 @@
-import pandas as pd
-import numpy as np
-from sklearn.model_selection import train_test_split, RandomizedSearchCV
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import classification_report, accuracy_score
-from imblearn.over_sampling import SMOTE
-from xgboost import XGBClassifier
-from xgboost import XGBClassifier, plot_importance
-import matplotlib.pyplot as plt
 import os
+import sys
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
-file_path = os.path.join(current_dir, "..", "data", "Crop_recommendation_real.csv")
+sys.path.insert(0, os.path.join(current_dir, ".."))
 
-# Load your dataset
-data = pd.read_csv(file_path)
+from training.pipeline import PARAM_GRID, load_prepared, print_report, run_experiment, search
 
-# Fix column names
-data.columns = data.columns.str.strip()  # Remove spaces
-data.rename(columns={"label": "Best_Crop"}, inplace=True)  # Rename if necessary
+# Preprocessing comes from the shared cache instead of being redone per run
+prepared = load_prepared()
 
-# Check if column exists
-if "Best_Crop" not in data.columns:
-    raise ValueError("🚨 Column 'Best_Crop' not found! Check CSV file.")
+# Randomised search: 30 candidates x 5 folds, fits spread over every core
+results = search(prepared, n_iter=30, folds=5, param_grid=PARAM_GRID)
+print("Best Parameters:", results[0]["params"])
 
-# Encode categorical labels
-from sklearn.preprocessing import LabelEncoder
-label_encoder = LabelEncoder()
-data["Best_Crop"] = label_encoder.fit_transform(data["Best_Crop"])
+# Refit the best candidate and evaluate it on the held-out test split
+best_xgb, report = run_experiment(results[0]["params"], prepared)
+print_report(report)
 
-# Handle missing values (replace with median)
-data.fillna(data.median(), inplace=True)
-
-# Separate features and target
-X = data.drop(columns=["Best_Crop"])
-y = data["Best_Crop"]
-
-# Normalize numerical features
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
-
-# Handle class imbalance using SMOTE
-smote = SMOTE(random_state=42)
-X_resampled, y_resampled = smote.fit_resample(X_scaled, y)
-
-# Split data into train and test sets
-X_train, X_test, y_train, y_test = train_test_split(X_resampled, y_resampled, test_size=0.2, random_state=42)
-
-# Define hyperparameter search space
-param_grid = {
-    'n_estimators': [50, 100, 200],  # Reduce tree count
-    'max_depth': [2, 3],  # Lower depth to prevent complex trees
-    'learning_rate': [0.01, 0.05, 0.1],  # Keep learning rate low
-    'gamma': [0.1, 0.2, 0.5],  # Increase to prevent unnecessary splits
-    'subsample': [0.5, 0.7],  # Reduce to prevent overfitting
-    'reg_lambda': [1, 5, 10],  # Increase L2 regularization
-    'reg_alpha': [0.1, 0.5, 1],  # Increase L1 regularization
-    'min_child_weight': [3, 5, 7]  # Increase to force splits on bigger patterns
-}
-
-
-
-# Initialize XGBoost classifier
-xgb = XGBClassifier(eval_metric='logloss')
-
-# Perform RandomizedSearch for best hyperparameters
-random_search = RandomizedSearchCV(
-    xgb, param_distributions=param_grid, n_iter=30, cv=5, n_jobs=-1, verbose=2
-)
-random_search.fit(X_train, y_train)
-
-# Get best model
-best_xgb = random_search.best_estimator_
-print("Best Parameters:", random_search.best_params_)
-
-
-# Evaluate model
-train_accuracy = best_xgb.score(X_train, y_train)
-test_accuracy = best_xgb.score(X_test, y_test)
-
-print(f"Training Accuracy: {train_accuracy:.4f}")
-print(f"Test Accuracy: {test_accuracy:.4f}")
-
-# Detailed classification report
-y_pred = best_xgb.predict(X_test)
+from sklearn.metrics import classification_report
 print("Classification Report:")
-print(classification_report(y_test, y_pred))
-
-
-# Feature importance visualization
-plot_importance(best_xgb)
-plt.title("Feature Importance in Crop Prediction Model")
-plt.show()
-
-# Test model on a new sample input
-sample_input = np.array([[40, 30, 15, 6.5, 200, 30, 70]])  # Example values
-sample_input = scaler.transform(sample_input)  # Apply same scaling as training
-predicted_crop = best_xgb.predict(sample_input)
-print("Predicted Crop (Encoded):", predicted_crop)
+print(classification_report(prepared.y_test, best_xgb.predict(prepared.X_test)))
@@ -0,0 +1,79 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from services.districts import SEASONS, get_registry
+from services.climate_store import (climate_artifact_path, climate_year, get_store, make_key,
+                                    season_date_range)
+from services.open_meteo import METEO_API_URL, OpenMeteoClient
+
+
+def pending_jobs(year):
+    """Unique (lat, lon, season) triples that are not in the store yet."""
+    registry, store = get_registry(), get_store()
+    seen = set()
+    jobs = []
+    for lat, lon in zip(registry.lat, registry.lon):
+        if np.isnan(lat) or np.isnan(lon):
+            continue
+        for season in SEASONS:
+            key = make_key(lat, lon, season, year)
+            if key in seen or key in store:
+                continue  # Resume: skip districts already fetched
+            seen.add(key)
+            jobs.append((float(lat), float(lon), season))
+    return jobs
+
+
+def fetch_job(client, lat, lon, season, year):
+    start_date, end_date = season_date_range(season, year)
+    return client.season_averages(lat, lon, start_date, end_date)
+
+
+def run(url, workers, year, output, fetch=fetch_job):
+    jobs = pending_jobs(year)
+    store = get_store()
+    print(f"📍 {len(get_registry())} districts, {len(jobs)} season fetches pending for {year}")
+
+    # One pooled, retrying client shared by every worker thread
+    client = OpenMeteoClient(url=url, max_connections=workers)
+
+    started = time.perf_counter()
+    done = failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fetch, client, lat, lon, season, year): (lat, lon, season)
+                   for lat, lon, season in jobs}
+        for future in as_completed(futures):
+            lat, lon, season = futures[future]
+            try:
+                temperature, humidity = future.result()
+            except Exception as e:
+                # One bad download must not stop the backfill; the next run retries the point
+                print(f"⚠️ {lat},{lon} {season}: {type(e).__name__}: {e}")
+                failed += 1
+                continue
+            if temperature is None or np.isnan(temperature) or np.isnan(humidity):
+                print(f"⚠️ {lat},{lon} {season}: no data (breaker {client.breaker.state})")
+                failed += 1
+                continue
+            # Every result is committed right away so an interrupted run can resume
+            store.put(lat, lon, season, year, temperature, humidity)
+            done += 1
+            if done % 100 == 0:
+                print(f"  {done}/{len(jobs)} fetched")
+
+    rows = store.export_artifact(output)
+    elapsed = time.perf_counter() - started
+    print(f"✅ {done} fetched, {failed} failed in {elapsed:.1f}s; wrote {rows} rows to {output}")
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute seasonal climate averages for every district")
+    parser.add_argument("--url", default=METEO_API_URL, help="Open-Meteo archive endpoint (or a local fake)")
+    parser.add_argument("--workers", type=int, default=8, help="Maximum concurrent upstream requests")
+    parser.add_argument("--year", type=int, default=climate_year())
+    parser.add_argument("--output", default=climate_artifact_path)
+    args = parser.parse_args()
+
+    raise SystemExit(1 if run(args.url, args.workers, args.year, args.output) else 0)
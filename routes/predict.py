@@ -1,147 +1,401 @@
-from flask import Blueprint, request, jsonify
-import pandas as pd
-import joblib
+from flask import Blueprint, Response, request, jsonify
 import numpy as np
+import io
 import os
 import json
-from datetime import datetime, timedelta
-import openmeteo_requests
-import requests_cache
-from retry_requests import retry
+from services.districts import (SEASONS, get_lat_lon, get_rainfall, get_registry, parse_lat_lon,
+                                resolution_headers, resolve_query)
+from services.climate_store import get_or_fetch_many, get_or_fetch_seasons
+from services.inference import build_feature_matrix, predict_top_k, scale_features
+from services.batcher import MicroBatcher
+from services.artifacts import get_inference_model
+from services.crop_details import dumps
+from services.metrics import count, record_error, span
+from services.open_meteo import fetch_season_averages
+from services.recommendation_map import get_recommendation_map, load_soil_profiles
+from services.response_cache import make_response_cache, quantise_soil
+from services.sweep import SWEEP_AXES, SWEEP_DEFAULTS, SWEEP_MAX_POINTS, parse_axis, run_sweep
 
 predict_blueprint = Blueprint("predict", __name__)
 
-# Get the absolute path of the current directory (routes)
-current_dir = os.path.dirname(os.path.abspath(__file__))
-
-# Construct correct paths
-scaler_file_path = os.path.join(current_dir, "..", "models", "scaler.pkl")
-label_encoder_file_path = os.path.join(current_dir, "..", "models", "label_encoder.pkl")
-crop_model_file_path = os.path.join(current_dir, "..", "models", "crop_prediction_xgb_model.pkl")
-crop_info_file_path = os.path.join(current_dir, "..", "data", "crop_info.json")
-rainfall_file_path = os.path.join(current_dir, "..", "data", "rainfall.csv")
-
-# Load Model and Preprocessing Files
-model = joblib.load(crop_model_file_path)
-label_encoder = joblib.load(label_encoder_file_path)
-scaler = joblib.load(scaler_file_path)
-
-# Load Crop Details
-with open(crop_info_file_path, "r") as f:
-    crop_info = json.load(f)
-
-# Load Rainfall Dataset
-rainfall_data = pd.read_csv(rainfall_file_path)
-
-# Open-Meteo API Configuration
-cache_session = requests_cache.CachedSession('.cache', expire_after=3600)
-retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-openmeteo = openmeteo_requests.Client(session=retry_session)
-
-# Function to get latitude and longitude for a district
-def get_lat_lon(district):
-    row = rainfall_data[rainfall_data["DISTRICT"].str.strip().str.lower() == district.strip().lower()]
-    if not row.empty:
-        coord_str = row.iloc[0]["coord"]
-        coord_dict = eval(coord_str.strip())  # Convert string to dictionary
-        return coord_dict["lat"], coord_dict["lon"]
-    return None, None
-
-# Function to fetch historical temperature and humidity using Open-Meteo API
-def get_historical_weather(district, season):
+# Upper bound on records accepted by /predict/batch in one call
+MAX_BATCH_RECORDS = int(os.environ.get("MAX_BATCH_RECORDS", "100000"))
+
+# Largest number of grid values (top crops plus probabilities) one sweep answer may hold
+SWEEP_MAX_VALUES = {
+    "json": int(os.environ.get("SWEEP_MAX_JSON_VALUES", "2000000")),
+    "npz": int(os.environ.get("SWEEP_MAX_NPZ_VALUES", "25000000")),
+}
+
+def predict_coalesced(rows):
+    """Probabilities for the raw feature rows of one micro-batch."""
+    # One snapshot per batch, so a reload can't pair the old scaler with the new model
+    inference = get_inference_model()
+    if inference.scaler is not None:
+        rows = scale_features(rows, inference.scaler)
+    return inference.model.predict_proba(rows)
+
+# Optionally coalesce concurrent single predictions into one model call
+if os.environ.get("MICROBATCH", "0") == "1":
+    batcher = MicroBatcher(
+        predict_coalesced,
+        max_batch_size=int(os.environ.get("MICROBATCH_MAX_ROWS", "256")),
+        max_wait_ms=float(os.environ.get("MICROBATCH_MAX_WAIT_MS", "2")),
+    )
+else:
+    batcher = None
+
+# Soil readings used when a request leaves one out
+SOIL_DEFAULTS = (("N", 50.0), ("P", 30.0), ("K", 40.0), ("ph", 6.5))
+
+# Finished /predict/ bodies keyed on (model, district, soil readings)
+response_cache = make_response_cache()
+
+# All three seasons at once; cold seasons are downloaded concurrently
+def get_seasonal_weather(district):
     lat, lon = get_lat_lon(district)
     if lat is None or lon is None:
+        return {}
+    return get_or_fetch_seasons(lat, lon, fetch_season_averages)
+
+def read_district(data):
+    """Return ``(district, how, error)`` for a request body with a district name and/or lat/lon.
+
+    ``error`` is a ``(message, status)`` pair when the request can't be served.
+    """
+    # Missing or non-JSON bodies arrive as None, arrays as lists
+    if not isinstance(data, dict):
+        return None, None, ("Request body must be a JSON object", 400)
+    district = data.get("district") or ""
+    if not isinstance(district, str):
+        return None, None, ("District must be a string", 400)
+    district = district.upper()
+    try:
+        lat, lon = parse_lat_lon(data.get("lat"), data.get("lon"))
+    except (TypeError, ValueError) as e:
+        return None, None, (str(e), 400)
+    if not district and lat is None:
+        return None, None, ("District is required", 400)
+    # Misspelled names and GPS coordinates resolve to the nearest known district
+    district, how = resolve_query(district, lat, lon)
+    if not district:
+        return None, None, (f"No district within reach of {lat}, {lon}", 404)
+    return district, how, None
+
+def read_soil(data):
+    """Return ``(soil, error)``: (N, P, K, ph) from a request body, snapped for the response cache when it is on.
+
+    ``error`` is a ``(message, status)`` pair when a reading isn't a finite number.
+    """
+    soil = parse_soil(data)
+    if soil is None:
+        return None, ("N, P, K and ph must be numbers", 400)
+    return (quantise_soil(*soil) if response_cache is not None else soil), None
+
+def parse_soil(data):
+    """(N, P, K, ph) of a request body or batch record, or None unless each is a finite number."""
+    try:
+        soil = tuple(float(data.get(name, default)) for name, default in SOIL_DEFAULTS)
+    except (AttributeError, TypeError, ValueError):
+        return None
+    return soil if np.isfinite(soil).all() else None
+
+def cached_prediction(district, soil):
+    """Return ``(cache_key, body)``; body is None on a miss, key is None when caching is off."""
+    if response_cache is None:
         return None, None
+    # Climate inputs are fixed per district, so the soil readings decide the response
+    cache_key = "|".join(map(str, (get_inference_model().version, district, *soil)))
+    body = response_cache.get(cache_key)
+    count("cache_requests_total", cache="response", result="miss" if body is None else "hit")
+    return cache_key, body
+
+def render_prediction(district, soil, seasonal_weather, cache_key=None):
+    """Score every season with weather data and return the JSON body, or None if none has any."""
+    # Fetch seasonal temperature, humidity, and rainfall
+    seasons, climate_rows = [], []
+    for season in ["SUMMER", "MONSOON", "WINTER"]:
+        temp, humidity = seasonal_weather.get(season, (None, None))
+        if temp is None:
+            continue
+        seasons.append(season)
+        climate_rows.append((temp, humidity, get_rainfall(district, season)))
+
+    # Score every season with one batched model call
+    inference = get_inference_model()
+    with span("features"):
+        input_data = build_feature_matrix(*soil, climate_rows)
+    # The micro-batcher scales the rows itself, with the scaler of the model that scores them
+    if inference.scaler is not None and batcher is None:
+        with span("scale"):
+            input_data = scale_features(input_data, inference.scaler)
+    with span("predict"):
+        top_indices, prediction_probs = predict_top_k(batcher or inference.model, None, input_data, k=3)
+
+    if seasonal_weather and not seasons:
+        return None
 
-    year = datetime.now().year - 5  # Fetch data of 5 years before
-    season_months = {"SUMMER": ("04-01", "06-30"), "MONSOON": ("07-01", "09-30"), "WINTER": ("12-01", "02-01")}
-    start_date, end_date = season_months.get(season, ("01-01", "01-31"))
-    start_date = f"{year}-{start_date}"
-    # end_date = f"{year}-{end_date}"
-    if(season == "WINTER"):
-        end_date = f"{year + 1}-{end_date}"
-    else:
-        end_date = f"{year}-{end_date}"
-
-    url = "https://archive-api.open-meteo.com/v1/archive"
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "start_date": start_date,
-        "end_date": end_date,
-        "hourly": ["temperature_2m", "relative_humidity_2m"],
-        "timezone": "Asia/Kolkata"
-    }
-    responses = openmeteo.weather_api(url, params=params)
-
-    response = responses[0]
-    hourly = response.Hourly()
-    avg_temperature = np.mean(hourly.Variables(0).ValuesAsNumpy())
-    avg_humidity = np.mean(hourly.Variables(1).ValuesAsNumpy())
-
-    return avg_temperature, avg_humidity
-
-# Get Rainfall Data from Dataset using Seasonal Columns
-def get_rainfall(district, season):
-    season_col_map = {"WINTER": "Oct-Dec", "SUMMER": "Mar-May", "MONSOON": "Jun-Sep"}
-    row = rainfall_data[rainfall_data["DISTRICT"].str.strip().str.lower() == district.strip().lower()]
-    if not row.empty and season in season_col_map:
-        return row.iloc[0][season_col_map[season]]
-    return 0  # Default to 0 if no data found
-
-# Define feature names
-feature_names = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+    # Assemble the response from the pre-serialised crop detail fragments
+    with span("render"):
+        body = inference.details.render(seasons, top_indices, prediction_probs)
+    # Only complete answers are cached; a missing season may come back later
+    if cache_key is not None and len(seasons) == len(SEASONS):
+        response_cache.put(cache_key, body)
+    return body
 
 @predict_blueprint.route("/", methods=["POST"])
 def predict_crop():
     try:
         # Get JSON input
-        data = request.get_json()
-        district = data.get("district", "").upper()
-        nitrogen = data.get("N", 50.0)
-        phosphorus = data.get("P", 30.0)
-        potassium = data.get("K", 40.0)
-        ph_level = data.get("ph", 6.5)
-        if not district:
-            return jsonify({"error": "District is required"}), 400
-
-        predictions = {}
-
-        for season in ["SUMMER", "MONSOON", "WINTER"]:
-            # Fetch seasonal temperature, humidity, and rainfall
-            temp, humidity = get_historical_weather(district, season)
-            rainfall = get_rainfall(district, season)
+        data = request.get_json(silent=True)
+        with span("district"):
+            district, how, error = read_district(data)
+        if error:
+            return jsonify({"error": error[0]}), error[1]
+        soil, error = read_soil(data)
+        if error:
+            return jsonify({"error": error[0]}), error[1]
+        with span("cache"):
+            cache_key, body = cached_prediction(district, soil)
+        if body is None:
+            with span("climate"):
+                seasonal_weather = get_seasonal_weather(district)
+            body = render_prediction(district, soil, seasonal_weather, cache_key)
+        if body is None:
+            return jsonify({"error": f"Could not fetch weather data for {district}"}), 500
+        return Response(body, status=200, mimetype="application/json", headers=resolution_headers(district, how))
+
+    except Exception as e:
+        record_error("predict", e)
+        return jsonify({"error": str(e)}), 500
+
+@predict_blueprint.route("/profile", methods=["GET"])
+def predict_profile():
+    """/predict/ for a standard soil profile, answered from the precomputed map when it's current."""
+    try:
+        with span("district"):
+            district, how, error = read_district(request.args)
+        if error:
+            return jsonify({"error": error[0]}), error[1]
+        profile = request.args.get("profile", "default")
+        with span("cache"):
+            recommendation_map = get_recommendation_map()
+            body = recommendation_map.render(district, profile) if recommendation_map else None
+        count("cache_requests_total", cache="recommendation_map", result="miss" if body is None else "hit")
+        source = "map"
+        if body is None:
+            # Not in the map (or the map is stale): score the profile like /predict/
+            profiles = load_soil_profiles()
+            if profile not in profiles:
+                return jsonify({"error": f"profile must be one of {', '.join(profiles)}"}), 400
+            with span("climate"):
+                seasonal_weather = get_seasonal_weather(district)
+            body = render_prediction(district, profiles[profile], seasonal_weather)
+            source = "model"
+        if body is None:
+            return jsonify({"error": f"Could not fetch weather data for {district}"}), 500
+        headers = {**resolution_headers(district, how), "X-Recommendation-Source": source}
+        return Response(body, status=200, mimetype="application/json", headers=headers)
+
+    except Exception as e:
+        record_error("predict_profile", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@predict_blueprint.route("/microbatch/stats", methods=["GET"])
+def microbatch_stats():
+    if batcher is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, **batcher.stats(reset=request.args.get("reset") == "1")}), 200
+
+@predict_blueprint.route("/cache/stats", methods=["GET"])
+def response_cache_stats():
+    if response_cache is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, **response_cache.stats(reset=request.args.get("reset") == "1")}), 200
+
+# Read a JSON array or an NDJSON body into a list of records
+def parse_batch_records():
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        return [json.loads(line) for line in request.get_data().splitlines() if line.strip()]
+    records = json.loads(request.get_data() or b"null")
+    if not isinstance(records, list):
+        raise ValueError("Expected a JSON array of records")
+    return records
+
+@predict_blueprint.route("/batch", methods=["POST"])
+def predict_batch():
+    try:
+        records = parse_batch_records()
+    except ValueError as e:
+        return jsonify({"error": f"Invalid batch body: {e}"}), 400
+    if len(records) > MAX_BATCH_RECORDS:
+        return jsonify({"error": f"At most {MAX_BATCH_RECORDS} records per batch"}), 413
+
+    try:
+        return score_batch(records)
+    except Exception as e:
+        record_error("predict_batch", e)
+        return jsonify({"error": str(e)}), 500
+
+def score_batch(records):
+    """Stream one NDJSON line per record: its predictions, or why it couldn't be scored."""
+    # Validate records and resolve each district to a registry row once
+    registry = get_registry()
+    errors = {}
+    soil = np.zeros((len(records), 4), dtype=np.float64)
+    positions = np.full(len(records), -1, dtype=np.intp)
+    with span("district"):
+        for i, record in enumerate(records):
+            record_soil = parse_soil(record)
+            if record_soil is None:
+                errors[i] = "Record must be an object with numeric N, P, K and ph"
+                continue
+            position = registry.position(str(record.get("district", "")))
+            if position is None or np.isnan(registry.lat[position]):
+                errors[i] = "Unknown district"
+                continue
+            soil[i] = record_soil
+            positions[i] = position
+
+    # Group by district: climate is looked up (or fetched) once per district
+    unique_positions, district_of = np.unique(positions, return_inverse=True)
+    points = [(float(registry.lat[p]), float(registry.lon[p])) if p >= 0 else None for p in unique_positions]
+    with span("climate"):
+        climate = get_or_fetch_many([point for point in points if point], fetch_season_averages)
+    district_climate = np.full((len(unique_positions), len(SEASONS), 2), np.nan)
+    for d, point in enumerate(points):
+        if point:
+            for s, season in enumerate(SEASONS):
+                value = climate[point].get(season, (None, None))
+                if value[0] is not None:
+                    district_climate[d, s] = value
+
+    # One feature row per (record, season) with climate available
+    with span("features"):
+        available = (positions >= 0)[:, None] & ~np.isnan(district_climate[district_of, :, 0])
+        record_idx, season_idx = np.nonzero(available)
+        rainfall = np.stack([registry.rainfall[season] for season in SEASONS])
+        input_data = np.empty((len(record_idx), 7), dtype=np.float64)
+        input_data[:, [0, 1, 2, 5]] = soil[record_idx]
+        input_data[:, [3, 4]] = district_climate[district_of[record_idx], season_idx]
+        input_data[:, 6] = rainfall[season_idx, positions[record_idx]]
+
+    # Score every farm and season with a single model call
+    inference = get_inference_model()
+    details = inference.details
+    with span("predict"):
+        top_indices, prediction_probs = predict_top_k(inference.model, inference.scaler, input_data, k=3)
+    row_of = np.full(available.shape, -1, dtype=np.intp)
+    row_of[record_idx, season_idx] = np.arange(len(record_idx))
+
+    def generate():
+        try:
+            for i in range(len(records)):
+                if i in errors:
+                    yield dumps({"index": i, "error": errors[i]}) + "\n"
+                    continue
+                rows = row_of[i]
+                seasons = [season for season, row in zip(SEASONS, rows) if row >= 0]
+                if not seasons:
+                    yield dumps({"index": i, "error": "Could not fetch weather data"}) + "\n"
+                    continue
+                predictions = details.render_short(seasons, top_indices, prediction_probs, rows[rows >= 0])
+                yield (f'{{"index":{i},"district":{dumps(str(registry.names[positions[i]]))},'
+                       f'"predictions":{predictions}}}\n')
+        except Exception as e:
+            # The status line has gone out already, so the error ends the stream as its last line
+            record_error("predict_batch", e)
+            yield dumps({"error": str(e)}) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+def read_sweep(data, inference):
+    """Return ``(axes, seasons, crop_indices)`` of a sweep request, raising ValueError when invalid."""
+    axes = {name: parse_axis(data.get(name), SWEEP_DEFAULTS[name]) for name in SWEEP_AXES}
+    seasons = data.get("seasons") or list(SEASONS)
+    if not isinstance(seasons, list) or not set(seasons) <= set(SEASONS):
+        raise ValueError(f"seasons must be a list drawn from {', '.join(SEASONS)}")
+    names = [str(crop).lower() for crop in inference.classes]
+    crops = data.get("crops") or names
+    if not isinstance(crops, list) or not set(map(str.lower, map(str, crops))) <= set(names):
+        raise ValueError("crops must be a list of known crop names")
+    return axes, [s for s in SEASONS if s in seasons], [names.index(str(crop).lower()) for crop in crops]
+
+@predict_blueprint.route("/sweep", methods=["POST"])
+def predict_sweep():
+    """Score an N/P/K/ph grid for one district with its climate held fixed.
+
+    Each axis is a number, a list, ``{"min", "max", "step"}`` or
+    ``{"min", "max", "num"}``. The answer has, per season, the top crop at
+    every grid point and probability surfaces for the requested crops, as
+    nested lists indexed [N][P][K][ph] (JSON) or named arrays (format=npz).
+    """
+    try:
+        data = request.get_json(silent=True)
+        district, how, error = read_district(data)
+        if error:
+            return jsonify({"error": error[0]}), error[1]
+        inference = get_inference_model()
+        try:
+            axes, seasons, crop_indices = read_sweep(data, inference)
+        except KeyError as e:
+            return jsonify({"error": f"Invalid sweep: range is missing {e}"}), 400
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid sweep: {e}"}), 400
+        output = data.get("format", "json")
+        if output not in SWEEP_MAX_VALUES:
+            return jsonify({"error": "format must be json or npz"}), 400
+
+        shape = [len(axes[name]) for name in SWEEP_AXES]
+        points = int(np.prod(shape))
+        if points > SWEEP_MAX_POINTS:
+            return jsonify({"error": f"Grid has {points} points; at most {SWEEP_MAX_POINTS} per sweep"}), 413
+        if points * (len(crop_indices) + 1) * len(seasons) > SWEEP_MAX_VALUES[output]:
+            return jsonify({"error": "Answer too large; request fewer crops or seasons, or format=npz"}), 413
+
+        # Climate is fixed per district and season; only the soil readings vary
+        seasonal_weather = get_seasonal_weather(district)
+        results = {}
+        for season in seasons:
+            temp, humidity = seasonal_weather.get(season, (None, None))
             if temp is None:
                 continue
+            climate_row = (temp, humidity, get_rainfall(district, season))
+            results[season] = run_sweep(inference, climate_row, axes, crop_indices)
+        if not results:
+            return jsonify({"error": f"Could not fetch weather data for {district}"}), 500
+
+        headers = resolution_headers(district, how)
+        crop_names = [str(crop) for crop in inference.classes]
+        if output == "npz":
+            arrays = {name: axes[name] for name in SWEEP_AXES}
+            arrays["classes"] = np.asarray(crop_names)
+            for season, (top_crop, surfaces) in results.items():
+                arrays[f"{season}/top_crop"] = top_crop
+                for c, surface in surfaces.items():
+                    arrays[f"{season}/{crop_names[c]}"] = surface
+            buffer = io.BytesIO()
+            np.savez(buffer, **arrays)
+            return Response(buffer.getvalue(), mimetype="application/octet-stream", headers=headers)
 
-            # Prepare input for model
-            input_data = pd.DataFrame([[nitrogen, phosphorus, potassium, temp, humidity, ph_level, rainfall]],
-                                      columns=feature_names)
-            input_data_scaled = scaler.transform(input_data)
-
-            # Make Prediction
-            prediction_probs = model.predict_proba(input_data_scaled)[0]
-            top_indices = np.argsort(prediction_probs)[-3:][::-1]
-            top_crops = label_encoder.inverse_transform(top_indices)
-
-            # Get Crop Details
-            crop_details = [
-                {
-                    "name": crop.capitalize(),
-                    "soil_type": crop_info.get(crop.capitalize(), {}).get("soil_type", "Unknown"),
-                    "min_yield": crop_info.get(crop.capitalize(), {}).get("min_yield", 0),
-                    "max_yield": crop_info.get(crop.capitalize(), {}).get("max_yield", 0),
-                    "min_price": crop_info.get(crop.capitalize(), {}).get("min_price", 0),
-                    "max_price": crop_info.get(crop.capitalize(), {}).get("max_price", 0),
-                    "fertilizer": crop_info.get(crop.capitalize(), {}).get("fertilizer", "Unknown"),
-                    "description": crop_info.get(crop.capitalize(), {}).get("description", "No description available"),
-                    "confidence": f"{prediction_probs[idx] * 100:.2f}%"
-                }
-                for idx, crop in zip(top_indices, top_crops)
-            ]
-
-            predictions[season] = crop_details
-        return jsonify(predictions), 200
+        payload = {
+            "district": district,
+            "grid": {name: axes[name].tolist() for name in SWEEP_AXES},
+            "shape": shape,
+            "classes": crop_names,
+            "seasons": {},
+        }
+        for season, (top_crop, surfaces) in results.items():
+            counts = np.bincount(top_crop.ravel(), minlength=len(crop_names))
+            payload["seasons"][season] = {
+                "top_crop": top_crop.tolist(),
+                "top_share": {crop_names[c]: round(float(n) / points, 4) for c, n in enumerate(counts) if n},
+                "probabilities": {crop_names[c]: np.round(surface.astype(np.float64), 4).tolist() for c, surface in surfaces.items()},
+            }
+        return Response(dumps(payload), mimetype="application/json", headers=headers)
 
     except Exception as e:
+        record_error("predict_sweep", e)
         return jsonify({"error": str(e)}), 500
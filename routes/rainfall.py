@@ -1,47 +1,84 @@
-from flask import Blueprint, request, jsonify
-import pandas as pd
+import hashlib
+import json
 import os
-import pandas as pd
+from functools import lru_cache
+from flask import Blueprint, Response, request, jsonify
+import numpy as np
+from services.districts import RAINFALL_COLUMNS, SEASONS, get_registry
+from services.districts import normalize_district
+from services.metrics import record_error
+from services.resources import resources
 
-# Get the absolute path of the current directory (routes)
-current_dir = os.path.dirname(os.path.abspath(__file__))
+rainfall_blueprint = Blueprint("rainfall", __name__)
 
-# Construct the correct path to rainfall.csv
-rainfall_file_path = os.path.join(current_dir, "..", "data", "rainfall.csv")
+# The dataset is static, so clients and proxies may keep answers this long
+RAINFALL_MAX_AGE = int(os.environ.get("RAINFALL_MAX_AGE", "86400"))
+# Rendered answers kept per process, keyed on the normalised query
+RAINFALL_RESPONSE_CACHE = int(os.environ.get("RAINFALL_RESPONSE_CACHE", "4096"))
+VIEWS = ("seasons", "table")
 
-# Load the Rainfall Dataset
-rainfall_data = pd.read_csv(rainfall_file_path)
+def season_entry(registry, position):
+    """Seasonal rainfall of one district, formatted like the original single-district API."""
+    if position is None:
+        return {season: {"error": "No rainfall data found"} for season in SEASONS}
+    return {season: f"{float(registry.rainfall[season][position])} mm" for season in SEASONS}
 
-rainfall_blueprint = Blueprint("rainfall", __name__)
-# Get Rainfall Data from Dataset using Seasonal Columns
-def get_rainfall(district, season):
-    season_col_map = {"WINTER": "Oct-Dec", "SUMMER": "Mar-May", "MONSOON": "Jun-Sep"}
-    
-    # Convert input to lowercase for case-insensitive match
-    row = rainfall_data[rainfall_data["DISTRICT"].str.strip().str.lower() == district.strip().lower()]
-    
-    if not row.empty and season in season_col_map:
-        return row.iloc[0][season_col_map[season]]
-    
-    return None  # Return None if no data is found
+def table_entry(registry, position):
+    """Every monthly and seasonal column of one district as numbers (null when missing)."""
+    if position is None:
+        return {"error": "No rainfall data found"}
+    values = registry.rainfall_table[:, position]
+    return {column: None if np.isnan(value) else float(value) for column, value in zip(RAINFALL_COLUMNS, values)}
+
+@lru_cache(maxsize=RAINFALL_RESPONSE_CACHE)
+def render_rainfall(districts, state, view):
+    """Return ``(body, etag, status)`` for a normalised query.
+
+    One district gives its entry directly; several districts or a state give
+    ``{district: entry}``. Answers are memoised until the district data reloads.
+    """
+    registry = get_registry()
+    entry = table_entry if view == "table" else season_entry
+    if len(districts) == 1 and not state:
+        payload = entry(registry, registry.position(districts[0]))
+    else:
+        payload = {}
+        for name in districts:
+            position = registry.position(name)
+            payload[name.upper() if position is None else str(registry.names[position])] = entry(registry, position)
+        if state:
+            positions = registry.state_positions(state)
+            if not positions:
+                return json.dumps({"error": f"Unknown state {state}"}, separators=(",", ":")) + "\n", None, 404
+            for position in positions:
+                payload[str(registry.names[position])] = entry(registry, position)
+
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":")) + "\n"
+    return body, hashlib.sha1(body.encode()).hexdigest()[:20], 200
+
+resources.on_reload(lambda names: render_rainfall.cache_clear())
 
 # Define Rainfall API Route
 @rainfall_blueprint.route("/", methods=["GET"])
 def fetch_rainfall():
     try:
-        district = request.args.get("district")
-        if not district:
+        names = [request.args.get("district", "")] + request.args.get("districts", "").split(",")
+        districts = tuple(dict.fromkeys(normalize_district(name) for name in names if name.strip()))
+        state = normalize_district(request.args.get("state", ""))
+        view = request.args.get("view", "seasons")
+        if not districts and not state:
             return jsonify({"error": "District is required"}), 400
+        if view not in VIEWS:
+            return jsonify({"error": f"view must be one of {', '.join(VIEWS)}"}), 400
 
-        rainfall_data_response = {}
-        for season in ["SUMMER", "MONSOON", "WINTER"]:
-            rainfall = get_rainfall(district, season)
-            if rainfall is not None:
-                rainfall_data_response[season] = f"{rainfall} mm"
-            else:
-                rainfall_data_response[season] = {"error": "No rainfall data found"}
-
-        return jsonify(rainfall_data_response), 200
+        body, etag, status = render_rainfall(districts, state, view)
+        response = Response(body, status=status, mimetype="application/json")
+        if etag is None:
+            return response
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = f"public, max-age={RAINFALL_MAX_AGE}"
+        return response.make_conditional(request)
 
     except Exception as e:
+        record_error("rainfall", e)
         return jsonify({"error": str(e)}), 500
@@ -1,95 +1,36 @@
-from flask import Blueprint, request, jsonify
-import pandas as pd
+import os
+from flask import Blueprint, Response, request, jsonify
 import numpy as np
-from datetime import datetime
-import requests
+from services.districts import (get_lat_lon, get_rainfall, get_registry, parse_lat_lon, resolution_headers,
+                                resolve_query)
+from services.climate_store import get_or_fetch_seasons, iter_or_fetch_many
+from services.crop_details import dumps
+from services.metrics import record_error, span
+from services.open_meteo import MAX_LOCATIONS, fetch_season_averages, get_client
 
 weather_blueprint = Blueprint('weather', __name__)
 
-# Load Rainfall Dataset
-rainfall_data = pd.read_csv("./data/rainfall.csv")
+# Upper bound on districts accepted by one /weather/bulk call
+MAX_BULK_DISTRICTS = int(os.environ.get("MAX_BULK_DISTRICTS", "1000"))
 
-# Open-Meteo API Configuration
-METEO_API_URL = "https://archive-api.open-meteo.com/v1/archive"
-
-def get_lat_lon(district):
-    """Fetch latitude and longitude from the rainfall dataset."""
-    row = rainfall_data[rainfall_data["DISTRICT"].str.strip().str.lower() == district.strip().lower()]
-    if not row.empty:
-        coord_str = row.iloc[0]["coord"]
-        coord_dict = eval(coord_str.strip())  # Convert string to dictionary
-        return coord_dict["lat"], coord_dict["lon"]
-    return None, None
-
-def get_historical_weather(district, season):
-    """Fetch historical temperature and humidity from Open-Meteo API."""
+def get_seasonal_weather(district):
+    """Seasonal averages for every season; cold seasons are fetched concurrently."""
     lat, lon = get_lat_lon(district)
     if lat is None or lon is None:
-        return None, None
-
-    # Define date ranges for each season (fetching 5-year-old data for consistency)
-    year = datetime.now().year - 5  
-    season_dates = {
-        "SUMMER": (f"{year}-04-01", f"{year}-06-30"),
-        "MONSOON": (f"{year}-07-01", f"{year}-09-30"),
-        "WINTER": (f"{year}-12-01", f"{year+1}-02-28")
-    }
-    
-    if season not in season_dates:
-        return None, None  # Invalid season
-
-    start_date, end_date = season_dates[season]
-
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "start_date": start_date,
-        "end_date": end_date,
-        "hourly": ["temperature_2m", "relative_humidity_2m"],
-        "timezone": "Asia/Kolkata"
-    }
-    
-    response = requests.get(METEO_API_URL, params=params)
-    
-    if response.status_code == 200 and "hourly" in response.json():
-        data = response.json()["hourly"]
-        avg_temp = np.mean(data["temperature_2m"])
-        avg_humidity = np.mean(data["relative_humidity_2m"])
-        return avg_temp, avg_humidity
-
-    return None, None
-
-def get_rainfall(district, season):
-    """Fetch seasonal rainfall for a given district from the dataset."""
-    season_col_map = {"WINTER": "Oct-Dec", "SUMMER": "Mar-May", "MONSOON": "Jun-Sep"}
-
-    # Normalize district name (remove spaces, make lowercase)
-    district = district.strip().lower()
-
-    # Find matching district in the dataset
-    row = rainfall_data[rainfall_data["DISTRICT"].str.strip().str.lower() == district]
-
-    if not row.empty and season in season_col_map:
-        return row.iloc[0][season_col_map[season]]  # Get rainfall for the season
-
-    return 0  # Default to 0 if no data found
-
-@weather_blueprint.route('/', methods=['GET'])
-def get_weather():
-    """API route to fetch weather data (temperature, humidity, rainfall)."""
-    district = request.args.get('district')
-
-    if not district:
-        return jsonify({"error": "District parameter is required"}), 400
+        return {}
+    return get_or_fetch_seasons(lat, lon, fetch_season_averages)
 
+def format_weather(district, climate):
+    """Response body and status for a district's seasonal climate."""
     seasonal_weather = {}
-
     for season in ["SUMMER", "MONSOON", "WINTER"]:
-        temperature, humidity = get_historical_weather(district, season)
+        temperature, humidity = climate.get(season, (None, None))
         rainfall = get_rainfall(district, season)  # Fetch rainfall from dataset
 
         if temperature is None:
-            return jsonify({"error": f"Could not fetch data for {district} in {season}"}), 500
+            # Keep the seasons that did come back
+            seasonal_weather[season] = {"error": f"Could not fetch data for {district} in {season}"}
+            continue
 
         seasonal_weather[season] = {
             "temperature": f"{temperature:.2f}°C",
@@ -97,4 +38,93 @@ def get_weather():
             "rainfall": f"{rainfall} mm"  # Include rainfall data
         }
 
-    return jsonify(seasonal_weather)
+    if all("error" in values for values in seasonal_weather.values()):
+        return {"error": f"Could not fetch data for {district}"}, 500
+
+    return seasonal_weather, 200
+
+@weather_blueprint.route('/', methods=['GET'])
+def get_weather():
+    """API route to fetch weather data (temperature, humidity, rainfall)."""
+    district = request.args.get('district')
+    try:
+        lat, lon = parse_lat_lon(request.args.get('lat'), request.args.get('lon'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if not district and lat is None:
+        return jsonify({"error": "District parameter is required"}), 400
+    try:
+        # Misspelled names and GPS coordinates resolve to the nearest known district
+        with span("district"):
+            district, how = resolve_query(district, lat, lon)
+        if not district:
+            return jsonify({"error": f"No district within reach of {lat}, {lon}"}), 404
+
+        with span("climate"):
+            climate = get_seasonal_weather(district)  # All seasons fetched concurrently
+        with span("render"):
+            payload, status = format_weather(district, climate)
+            response = jsonify(payload)
+        return response, status, resolution_headers(district, how)
+
+    except Exception as e:
+        record_error("weather", e)
+        return jsonify({"error": str(e)}), 500
+
+@weather_blueprint.route('/bulk', methods=['GET'])
+def get_weather_bulk():
+    """Weather for many districts (``districts=a,b`` and/or ``state=``), streamed as NDJSON.
+
+    Districts are resolved against the registry in one pass, their coordinates
+    fetched in multi-location upstream calls, and each district's line is
+    written as soon as all of its seasons are in.
+    """
+    registry = get_registry()
+    names = [name.strip() for name in request.args.get('districts', '').split(',') if name.strip()]
+    state = request.args.get('state')
+    if not names and not state:
+        return jsonify({"error": "districts or state parameter is required"}), 400
+
+    positions = [registry.position(name) for name in names]
+    unknown = [name for name, position in zip(names, positions) if position is None]
+    positions = [position for position in positions if position is not None]
+    if state:
+        state_positions = registry.state_positions(state)
+        if not state_positions:
+            return jsonify({"error": f"Unknown state {state}"}), 404
+        positions += state_positions
+    positions = list(dict.fromkeys(positions))
+    if len(positions) > MAX_BULK_DISTRICTS:
+        return jsonify({"error": f"At most {MAX_BULK_DISTRICTS} districts per call"}), 413
+
+    # Districts that share coordinates share one set of fetches
+    by_point, no_coords = {}, []
+    for position in positions:
+        lat, lon = registry.lat[position], registry.lon[position]
+        if np.isnan(lat) or np.isnan(lon):
+            no_coords.append(position)
+        else:
+            by_point.setdefault((float(lat), float(lon)), []).append(position)
+    fetch_many = get_client().season_averages_many
+
+    def district_line(position, climate):
+        district = str(registry.names[position])
+        payload, _ = format_weather(district, climate)
+        return dumps({"district": district, "state": str(registry.states[position]), **payload}) + "\n"
+
+    def generate():
+        for name in unknown:
+            yield dumps({"district": name, "error": "Unknown district"}) + "\n"
+        for position in no_coords:
+            yield district_line(position, {})
+        try:
+            for point, climate in iter_or_fetch_many(list(by_point), fetch_many, chunk_size=MAX_LOCATIONS):
+                for position in by_point[point]:
+                    yield district_line(position, climate)
+        except Exception as e:
+            # The status line has gone out already, so the error ends the stream as its last line
+            record_error("weather_bulk", e)
+            yield dumps({"error": str(e)}) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
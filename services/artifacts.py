@@ -0,0 +1,136 @@
+import hmac
+import json
+import logging
+import os
+import signal
+import numpy as np
+from services.crop_details import CropDetailTable
+from services.model_bundle import activate, current_version, load_bundle
+from services.resources import resources
+from services.tree_ensemble import TreeEnsemble
+
+logger = logging.getLogger(__name__)
+
+# Get the absolute path of the current directory (services)
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Construct correct paths
+scaler_file_path = os.path.join(current_dir, "..", "models", "scaler.pkl")
+label_encoder_file_path = os.path.join(current_dir, "..", "models", "label_encoder.pkl")
+crop_model_file_path = os.path.join(current_dir, "..", "models", "crop_prediction_xgb_model.pkl")
+raw_model_file_path = os.path.join(current_dir, "..", "models", "crop_model_raw.npz")
+crop_info_file_path = os.path.join(current_dir, "..", "data", "crop_info.json")
+
+# "raw" (default) serves the exported trees with the scaler folded in, so raw
+# features go straight in; "compiled" evaluates the exported trees on scaled
+# features; "xgboost" keeps the two-stage scaler + XGBClassifier pipeline
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "raw")
+# Required in X-Admin-Token by /admin/reload; the endpoint is off while it is unset
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+# How often each process checks models/bundles/CURRENT for a newly activated bundle
+MODEL_CHECK_SECONDS = float(os.environ.get("MODEL_CHECK_SECONDS", "10"))
+
+
+class InferenceModel:
+    """Everything needed to score a feature matrix, swapped as one unit on reload."""
+
+    def __init__(self, model, scaler, classes, backend, version=None):
+        self.model = model
+        self.scaler = scaler  # None when the model takes raw features
+        self.classes = np.asarray(classes)
+        self.crop_names = [str(crop).capitalize() for crop in self.classes]
+        self.backend = backend
+        # Identifies the artifact on disk, so caches shared between workers never
+        # mix responses from different models
+        self.version = version
+        # Crop details aligned with the class indices, compiled with the model
+        self.details = CropDetailTable(self.crop_names, load_crop_info())
+
+
+def artifact_version(path):
+    stat = os.stat(path)
+    return f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def load_bundle_model(bundle):
+    """InferenceModel from a verified bundle; the raw backend stays pickle-free and xgboost-free."""
+    version = f"bundle:{bundle.version}"
+    if INFERENCE_BACKEND == "raw":
+        return InferenceModel(bundle.raw_ensemble(), None, bundle.classes, "raw", version)
+    import xgboost
+    if INFERENCE_BACKEND == "compiled":
+        model = TreeEnsemble.from_booster(xgboost.Booster(model_file=bundle.booster_path))
+    else:
+        model = xgboost.XGBClassifier()
+        model.load_model(bundle.booster_path)
+    return InferenceModel(model, bundle.scaler(), bundle.classes, INFERENCE_BACKEND, version)
+
+
+def load_inference_model():
+    # The active bundle wins; the separate pickles are the fallback for trees without one
+    bundle = load_bundle()
+    if bundle is not None:
+        return load_bundle_model(bundle)
+
+    if INFERENCE_BACKEND == "raw" and os.path.exists(raw_model_file_path):
+        # Pickle-free path: neither xgboost nor scikit-learn gets imported
+        with np.load(raw_model_file_path) as arrays:
+            classes = arrays["classes"] if "classes" in arrays else None
+        if classes is None:
+            import joblib
+            classes = joblib.load(label_encoder_file_path).classes_
+        return InferenceModel(
+            TreeEnsemble.load(raw_model_file_path), None, classes, "raw", artifact_version(raw_model_file_path)
+        )
+
+    import joblib
+    model = joblib.load(crop_model_file_path)
+    scaler = joblib.load(scaler_file_path)
+    classes = joblib.load(label_encoder_file_path).classes_
+    version = artifact_version(crop_model_file_path)
+    if INFERENCE_BACKEND == "compiled":
+        return InferenceModel(TreeEnsemble.from_booster(model), scaler, classes, "compiled", version)
+    return InferenceModel(model, scaler, classes, "xgboost", version)
+
+
+def load_crop_info():
+    with open(crop_info_file_path, "r") as f:
+        return json.load(f)
+
+
+resources.register("inference", load_inference_model)
+resources.watch("inference", current_version, MODEL_CHECK_SECONDS)
+
+
+def reload_models(version=None):
+    """Activate ``version`` (if given) and swap the new model in; requests in flight finish on the old one."""
+    if not version:
+        resources.reload(["inference"])
+        return get_inference_model().version
+    # Load and verify before CURRENT changes, so a bad bundle never becomes the one restarts load
+    model = load_bundle_model(load_bundle(version))
+    activate(version)
+    resources.replace("inference", model, source_version=version)
+    return model.version
+
+
+def admin_allowed(token):
+    # compare_digest only takes ASCII str, and a header may hold anything, so compare bytes
+    # Behind a local reverse proxy every caller looks like 127.0.0.1, so only the token counts
+    return bool(ADMIN_TOKEN) and hmac.compare_digest((token or "").encode("utf-8", "surrogatepass"),
+                                                  ADMIN_TOKEN.encode("utf-8", "surrogatepass"))
+
+
+def reload_on_sighup():
+    """Reload the model when a standalone server receives SIGHUP (gunicorn uses HUP itself)."""
+    def reload(signum, frame):
+        try:
+            logger.info("Reloaded model %s", reload_models())
+        except Exception as e:
+            logger.warning("Model reload failed, still serving the old one: %s", e)
+
+    signal.signal(signal.SIGHUP, reload)
+
+
+def get_inference_model():
+    return resources.get("inference")
@@ -0,0 +1,122 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+
+# Upper bounds (rows) of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class MicroBatcher:
+    """Coalesces concurrent ``predict_proba`` calls into larger model calls.
+
+    Callers hand over their feature rows and block on a future. A single
+    worker thread waits up to ``max_wait_ms`` after the first pending request
+    (or until ``max_batch_size`` rows are queued), runs one ``predict_proba``
+    on the stacked rows and hands each caller back its own slice.
+
+    The batcher exposes ``predict_proba`` itself, so it can stand in for the
+    model wherever one is expected.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=256, max_wait_ms=2.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+        self._start()
+        # Threads don't survive fork(); pre-forked workers start their own
+        os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def _reset_stats(self):
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+        self.max_rows = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.batch_size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+
+    def submit(self, rows):
+        """Queue a (n, features) matrix; returns a Future for its probabilities."""
+        future = Future()
+        self._queue.put((np.asarray(rows), future, time.perf_counter()))
+        return future
+
+    def predict_proba(self, rows, timeout=None):
+        return self.submit(rows).result(timeout)
+
+    def _collect(self):
+        pending = [self._queue.get()]
+        total = len(pending[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while total < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(item)
+            total += len(item[0])
+        return pending, total
+
+    def _run(self):
+        while True:
+            pending, total = self._collect()
+            started = time.perf_counter()
+            try:
+                probabilities = self.predict_fn(np.concatenate([rows for rows, _, _ in pending]))
+            except Exception as e:
+                for _, future, _ in pending:
+                    future.set_exception(e)
+            else:
+                offset = 0
+                for rows, future, _ in pending:
+                    future.set_result(probabilities[offset:offset + len(rows)])
+                    offset += len(rows)
+            self._record(pending, total, started)
+
+    def _record(self, pending, total, started):
+        waits = [started - queued_at for _, _, queued_at in pending]
+        bucket = next((i for i, bound in enumerate(BATCH_SIZE_BUCKETS) if total <= bound), len(BATCH_SIZE_BUCKETS))
+        with self._stats_lock:
+            self.batches += 1
+            self.requests += len(pending)
+            self.rows += total
+            self.max_rows = max(self.max_rows, total)
+            self.queue_wait_total += sum(waits)
+            self.queue_wait_max = max(self.queue_wait_max, max(waits))
+            self.batch_size_counts[bucket] += 1
+
+    def stats(self, reset=False):
+        """Batch-size and queue-wait metrics collected since start (or last reset)."""
+        with self._stats_lock:
+            histogram = {f"le_{bound}": count for bound, count in zip(BATCH_SIZE_BUCKETS, self.batch_size_counts)}
+            histogram["inf"] = self.batch_size_counts[-1]
+            stats = {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "batches": self.batches,
+                "requests": self.requests,
+                "rows": self.rows,
+                "avg_batch_rows": self.rows / self.batches if self.batches else 0.0,
+                "max_batch_rows": self.max_rows,
+                "avg_queue_wait_ms": 1000.0 * self.queue_wait_total / self.requests if self.requests else 0.0,
+                "max_queue_wait_ms": 1000.0 * self.queue_wait_max,
+                "batch_size_histogram": histogram,
+                "queue_depth": self._queue.qsize(),
+            }
+            if reset:
+                self._reset_stats()
+        return stats
@@ -0,0 +1,277 @@
+import asyncio
+import math
+import os
+import sqlite3
+import threading
+import weakref
+from datetime import datetime
+import numpy as np
+from services.concurrency import iter_concurrently, run_concurrently
+from services.metrics import count
+from services.resources import resources
+
+# Get the absolute path of the current directory (services)
+current_dir = os.path.dirname(os.path.abspath(__file__))
+climate_store_path = os.environ.get(
+    "CLIMATE_STORE_PATH", os.path.join(current_dir, "..", "data", "climate_cache.sqlite")
+)
+# Columnar artifact written by precompute_climate.py and loaded at startup
+climate_artifact_path = os.environ.get(
+    "CLIMATE_ARTIFACT_PATH", os.path.join(current_dir, "..", "data", "climate.npz")
+)
+
+# Season windows shared by every code path that averages archive data
+season_months = {"SUMMER": ("04-01", "06-30"), "MONSOON": ("07-01", "09-30"), "WINTER": ("12-01", "02-28")}
+
+
+def climate_year():
+    """Year whose archive data is averaged (5 years before the current one)."""
+    return datetime.now().year - 5
+
+
+def season_date_range(season, year):
+    """Return the (start_date, end_date) strings for a season, or (None, None)."""
+    if season not in season_months:
+        return None, None
+    start, end = season_months[season]
+    end_year = year + 1 if season == "WINTER" else year
+    return f"{year}-{start}", f"{end_year}-{end}"
+
+
+def make_key(lat, lon, season, year):
+    # Round coordinates so the same district always maps to the same key
+    return round(float(lat), 4), round(float(lon), 4), season, int(year)
+
+
+class ClimateStore:
+    """Durable (lat, lon, season, year) -> (avg temperature, avg humidity) store.
+
+    Rows live in SQLite so they survive restarts, and the whole table is mirrored
+    in a dict so reads never touch the disk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._memory = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # SQLite connections must not cross fork(); pre-forked workers reopen theirs
+        store = weakref.ref(self)
+        os.register_at_fork(after_in_child=lambda: store() and store()._reconnect())
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS climate ("
+            "lat REAL, lon REAL, season TEXT, year INTEGER, "
+            "temperature REAL, humidity REAL, "
+            "PRIMARY KEY (lat, lon, season, year))"
+        )
+        self._conn.commit()
+        for lat, lon, season, year, temperature, humidity in self._conn.execute(
+            "SELECT lat, lon, season, year, temperature, humidity FROM climate"
+        ):
+            self._memory[make_key(lat, lon, season, year)] = (temperature, humidity)
+
+    def _reconnect(self):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+
+    def __len__(self):
+        return len(self._memory)
+
+    def __contains__(self, key):
+        return make_key(*key) in self._memory
+
+    def get(self, lat, lon, season, year):
+        return self._memory.get(make_key(lat, lon, season, year))
+
+    def put(self, lat, lon, season, year, temperature, humidity):
+        key = make_key(lat, lon, season, year)
+        value = (float(temperature), float(humidity))
+        with self._lock:
+            self._memory[key] = value
+            self._conn.execute(
+                "INSERT OR REPLACE INTO climate VALUES (?, ?, ?, ?, ?, ?)", key + value
+            )
+            self._conn.commit()
+        return value
+
+    def load_artifact(self, path):
+        """Merge a columnar .npz artifact into memory; SQLite rows take precedence."""
+        if not os.path.exists(path):
+            return 0
+        with np.load(path) as artifact:
+            columns = [artifact[name] for name in ("lat", "lon", "season", "year", "temperature", "humidity")]
+        loaded = 0
+        for lat, lon, season, year, temperature, humidity in zip(*columns):
+            key = make_key(lat, lon, str(season), year)
+            if key not in self._memory:
+                self._memory[key] = (float(temperature), float(humidity))
+                loaded += 1
+        return loaded
+
+    def export_artifact(self, path):
+        """Write every stored row as one columnar .npz artifact."""
+        keys = sorted(self._memory)
+        values = [self._memory[key] for key in keys]
+        np.savez(
+            path,
+            lat=np.array([key[0] for key in keys], dtype=np.float64),
+            lon=np.array([key[1] for key in keys], dtype=np.float64),
+            season=np.array([key[2] for key in keys], dtype="U7"),
+            year=np.array([key[3] for key in keys], dtype=np.int32),
+            temperature=np.array([value[0] for value in values], dtype=np.float32),
+            humidity=np.array([value[1] for value in values], dtype=np.float32),
+        )
+        return len(keys)
+
+
+def load_store():
+    store = ClimateStore(climate_store_path)
+    store.load_artifact(climate_artifact_path)
+    return store
+
+
+resources.register("climate_store", load_store)
+
+
+def get_store():
+    return resources.get("climate_store")
+
+
+def get_or_fetch(lat, lon, season, fetch):
+    """Return the averaged climate for a season, calling fetch only on a miss.
+
+    ``fetch(lat, lon, start_date, end_date)`` must return ``(temperature,
+    humidity)`` or ``(None, None)``; failed or NaN fetches are not stored.
+    """
+    store = get_store()
+    year = climate_year()
+    cached = store.get(lat, lon, season, year)
+    if cached is not None:
+        return cached
+
+    start_date, end_date = season_date_range(season, year)
+    if start_date is None:
+        return None, None  # Invalid season
+
+    return store_fetched(store, lat, lon, season, year, fetch(lat, lon, start_date, end_date))
+
+
+def count_lookups(lookups, misses):
+    count("cache_requests_total", lookups - misses, cache="climate", result="hit")
+    count("cache_requests_total", misses, cache="climate", result="miss")
+
+
+def store_fetched(store, lat, lon, season, year, fetched):
+    """Persist a fetched ``(temperature, humidity)``; failed or NaN fetches are not stored."""
+    temperature, humidity = fetched
+    if temperature is None or humidity is None:
+        return None, None
+    if math.isnan(temperature) or math.isnan(humidity):
+        return temperature, humidity  # Don't persist gaps in the archive
+    return store.put(lat, lon, season, year, temperature, humidity)
+
+
+def get_or_fetch_many(points, fetch, seasons=tuple(season_months)):
+    """``get_or_fetch`` for many (lat, lon) points and seasons at once.
+
+    Cached entries are answered inline and every miss is fetched concurrently.
+    Returns ``{(lat, lon): {season: (temperature, humidity)}}``; seasons whose
+    fetch failed or timed out map to ``(None, None)``.
+    """
+    store = get_store()
+    year = climate_year()
+    results = {point: {} for point in points}
+    missing = []
+    for point, climate in results.items():
+        for season in seasons:
+            cached = store.get(point[0], point[1], season, year)
+            if cached is not None:
+                climate[season] = cached
+            else:
+                missing.append((point, season))
+    count_lookups(len(points) * len(seasons), len(missing))
+
+    if missing:
+        fetched = run_concurrently(lambda job: get_or_fetch(job[0][0], job[0][1], job[1], fetch), missing)
+        for (point, season), value in fetched.items():
+            results[point][season] = (None, None) if isinstance(value, Exception) else value
+    return results
+
+
+def iter_or_fetch_many(points, fetch_many, seasons=tuple(season_months), chunk_size=50):
+    """Yield ``(point, {season: (temperature, humidity)})`` as each point completes.
+
+    Fully cached points come first. Misses are fetched with
+    ``fetch_many(points, start_date, end_date)``, one multi-location call per
+    season and ``chunk_size`` points, all chunks concurrently; a point is
+    yielded as soon as the last of its seasons arrives. Failed fetches map to
+    ``(None, None)`` and are not stored.
+    """
+    store = get_store()
+    year = climate_year()
+    results = {point: {} for point in points}
+    missing = {season: [] for season in seasons}
+    for point, climate in results.items():
+        for season in seasons:
+            cached = store.get(point[0], point[1], season, year)
+            if cached is not None:
+                climate[season] = cached
+            elif season in season_months:
+                missing[season].append(point)
+            else:
+                climate[season] = (None, None)  # Invalid season
+    count_lookups(len(points) * len(seasons), sum(map(len, missing.values())))
+    waiting = {point: len(seasons) - len(climate) for point, climate in results.items()}
+    for point, pending in waiting.items():
+        if not pending:
+            yield point, results[point]
+
+    chunks = [
+        (season, tuple(season_points[i:i + chunk_size]))
+        for season, season_points in missing.items()
+        for i in range(0, len(season_points), chunk_size)
+    ]
+
+    def fetch_chunk(chunk):
+        season, chunk_points = chunk
+        return fetch_many(chunk_points, *season_date_range(season, year))
+
+    for (season, chunk_points), values in iter_concurrently(fetch_chunk, chunks):
+        if isinstance(values, Exception):
+            values = [(None, None)] * len(chunk_points)
+        for point, value in zip(chunk_points, values):
+            results[point][season] = store_fetched(store, point[0], point[1], season, year, value)
+            waiting[point] -= 1
+            if not waiting[point]:
+                yield point, results[point]
+
+
+def get_or_fetch_seasons(lat, lon, fetch, seasons=tuple(season_months)):
+    """``get_or_fetch_many`` for a single point."""
+    return get_or_fetch_many([(lat, lon)], fetch, seasons)[(lat, lon)]
+
+
+async def get_or_fetch_seasons_async(lat, lon, fetch, seasons=tuple(season_months)):
+    """``get_or_fetch_seasons`` for a coroutine ``fetch``; misses are awaited together."""
+    store = get_store()
+    year = climate_year()
+    results, missing = {}, []
+    for season in seasons:
+        cached = store.get(lat, lon, season, year)
+        if cached is not None:
+            results[season] = cached
+        elif season in season_months:
+            missing.append(season)
+        else:
+            results[season] = (None, None)  # Invalid season
+    count_lookups(len(seasons), len(missing))
+
+    fetched = await asyncio.gather(
+        *(fetch(lat, lon, *season_date_range(season, year)) for season in missing), return_exceptions=True
+    )
+    for season, value in zip(missing, fetched):
+        if isinstance(value, Exception):
+            results[season] = (None, None)
+        else:
+            results[season] = store_fetched(store, lat, lon, season, year, value)
+    return results
@@ -0,0 +1,59 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+# Shared, bounded pool for blocking upstream calls (Open-Meteo etc.)
+UPSTREAM_WORKERS = int(os.environ.get("UPSTREAM_WORKERS", "16"))
+UPSTREAM_TIMEOUT = float(os.environ.get("UPSTREAM_TIMEOUT", "30"))
+
+upstream_executor = ThreadPoolExecutor(max_workers=UPSTREAM_WORKERS, thread_name_prefix="upstream")
+
+
+def _new_pool_after_fork():
+    # Pool threads don't survive fork(); give pre-forked workers a fresh pool
+    global upstream_executor
+    upstream_executor = ThreadPoolExecutor(max_workers=UPSTREAM_WORKERS, thread_name_prefix="upstream")
+
+
+os.register_at_fork(after_in_child=_new_pool_after_fork)
+
+
+def run_concurrently(fn, items, timeout=UPSTREAM_TIMEOUT):
+    """Call ``fn(item)`` for every item at the same time on the shared pool.
+
+    Returns ``{item: result}``. Calls that raise or don't finish within
+    ``timeout`` seconds map to the exception instead, so callers can keep
+    whatever partial results did come back.
+    """
+    futures = {upstream_executor.submit(fn, item): item for item in items}
+    done, not_done = wait(futures, timeout=timeout)
+
+    results = {}
+    for future, item in futures.items():
+        if future in not_done:
+            future.cancel()
+            results[item] = TimeoutError(f"{item} timed out after {timeout}s")
+        elif future.exception() is not None:
+            results[item] = future.exception()
+        else:
+            results[item] = future.result()
+    return results
+
+
+def iter_concurrently(fn, items, timeout=UPSTREAM_TIMEOUT):
+    """``run_concurrently`` that yields ``(item, result)`` pairs as calls finish.
+
+    Calls still running when ``timeout`` expires are cancelled and yielded
+    with a ``TimeoutError``.
+    """
+    futures = {upstream_executor.submit(fn, item): item for item in items}
+    pending = set(futures)
+    try:
+        for future in as_completed(futures, timeout=timeout):
+            pending.discard(future)
+            error = future.exception()
+            yield futures[future], error if error is not None else future.result()
+    except FuturesTimeoutError:
+        for future in pending:
+            future.cancel()
+            yield futures[future], TimeoutError(f"{futures[future]} timed out after {timeout}s")
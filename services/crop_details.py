@@ -0,0 +1,71 @@
+import json
+
+# orjson is optional; it only speeds up the generic (non-fragment) JSON parts
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj):
+    """Compact JSON text, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def detail_dict(name, info):
+    """Crop details shown with every prediction (without the confidence)."""
+    return {
+        "name": name,
+        "soil_type": info.get("soil_type", "Unknown"),
+        "min_yield": info.get("min_yield", 0),
+        "max_yield": info.get("max_yield", 0),
+        "min_price": info.get("min_price", 0),
+        "max_price": info.get("max_price", 0),
+        "fertilizer": info.get("fertilizer", "Unknown"),
+        "description": info.get("description", "No description available"),
+    }
+
+
+class CropDetailTable:
+    """crop_info.json compiled into pre-serialised JSON, one entry per label index.
+
+    Each entry is the crop's detail object with sorted keys (as ``jsonify``
+    would write it) split around the confidence value, so a response is just
+    string concatenation plus one formatted number per crop.
+    """
+
+    def __init__(self, crop_names, crop_info):
+        self.names = tuple(crop_names)
+        self.details = tuple(detail_dict(name, crop_info.get(name, {})) for name in self.names)
+        # "confidence" sorts first, so every fragment is '{"confidence":"' + value + suffix
+        self.suffixes = tuple(
+            '%",' + json.dumps(details, sort_keys=True, separators=(",", ":"))[1:]
+            for details in self.details
+        )
+        self.name_prefixes = tuple('{"name":' + json.dumps(name) + ',"confidence":"' for name in self.names)
+
+    def entry(self, index, probability):
+        """Full detail object for one predicted crop."""
+        return f'{{"confidence":"{probability * 100:.2f}{self.suffixes[index]}'
+
+    def short_entry(self, index, probability):
+        """Name and confidence only (used by /predict/batch)."""
+        return f'{self.name_prefixes[index]}{probability * 100:.2f}%"}}'
+
+    def render(self, seasons, top_indices, probabilities):
+        """JSON object {season: [details, ...]} with seasons in sorted key order."""
+        parts = []
+        for row, season in sorted(enumerate(seasons), key=lambda item: item[1]):
+            entries = ",".join(self.entry(idx, probabilities[row, idx]) for idx in top_indices[row])
+            parts.append(f'"{season}":[{entries}]')
+        return "{" + ",".join(parts) + "}\n"
+
+    def render_short(self, seasons, top_indices, probabilities, rows):
+        """JSON object {season: [{name, confidence}, ...]} for the given matrix rows."""
+        parts = []
+        for season, row in zip(seasons, rows):
+            entries = ",".join(self.short_entry(idx, probabilities[row, idx]) for idx in top_indices[row])
+            parts.append(f'"{season}":[{entries}]')
+        return "{" + ",".join(parts) + "}"
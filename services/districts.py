@@ -0,0 +1,280 @@
+import ast
+import csv
+import os
+from collections import Counter
+import numpy as np
+from services.resources import resources
+from services.shared_arrays import share_arrays
+
+# Get the absolute path of the current directory (services)
+current_dir = os.path.dirname(os.path.abspath(__file__))
+rainfall_file_path = os.path.join(current_dir, "..", "data", "rainfall.csv")
+
+# Seasonal rainfall columns used by the prediction model
+SEASONS = ["SUMMER", "MONSOON", "WINTER"]
+# Misspelled names must share at least this much (Dice score over trigrams) with a district
+FUZZY_MIN_SCORE = float(os.environ.get("FUZZY_MIN_SCORE", "0.5"))
+# Names this short share too few trigrams to score, so they must be one edit from a district instead
+FUZZY_SHORT_NAME = int(os.environ.get("FUZZY_SHORT_NAME", "6"))
+# Coordinates farther than this from every district centre don't resolve
+NEAREST_MAX_KM = float(os.environ.get("NEAREST_MAX_KM", "250"))
+EARTH_RADIUS_KM = 6371.0
+
+season_col_map = {"WINTER": "Oct-Dec", "SUMMER": "Mar-May", "MONSOON": "Jun-Sep"}
+# Every monthly and seasonal rainfall column, in rainfall.csv order
+RAINFALL_COLUMNS = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC",
+                    "ANNUAL", "Jan-Feb", "Mar-May", "Jun-Sep", "Oct-Dec"]
+
+
+def normalize_district(district):
+    """Normalise a district name the same way for the index and for lookups."""
+    return district.strip().lower()
+
+
+def trigrams(name):
+    """Character trigrams of a normalised name, padded so word starts count double."""
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def within_one_edit(a, b):
+    """True if ``b`` is ``a`` with at most one character inserted, deleted, replaced, or two adjacent ones swapped."""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    start = 0
+    while start < min(len(a), len(b)) and a[start] == b[start]:
+        start += 1
+    if len(a) == len(b):
+        return (a[start + 1:] == b[start + 1:]
+                or a[start:start + 2] == b[start:start + 2][::-1] and a[start + 2:] == b[start + 2:])
+    shorter, longer = sorted((a, b), key=len)
+    return shorter[start:] == longer[start + 1:]
+
+
+def unit_vectors(lat, lon):
+    """Points on the unit sphere; the largest dot product is the nearest great-circle point."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def parse_coord(coord_str):
+    """Parse a "{'lon': .., 'lat': ..}" cell without eval."""
+    try:
+        coord_dict = ast.literal_eval(str(coord_str).strip())
+        return float(coord_dict["lat"]), float(coord_dict["lon"])
+    except (ValueError, SyntaxError, KeyError, TypeError):
+        return np.nan, np.nan
+
+
+def read_rainfall_csv(path):
+    """Read rainfall.csv into {column: list of strings} with the csv module.
+
+    Data rows carry an extra leading index field that the header doesn't name.
+    """
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        columns = {name: [] for name in header}
+        for row in reader:
+            for name, value in zip(header, row[len(row) - len(header):]):
+                columns[name].append(value)
+    return columns
+
+
+class DistrictRegistry:
+    """Read-only index over rainfall.csv.
+
+    Every per-district column is held in a compact NumPy array and names are
+    mapped to row positions through a dict, so lookups never touch pandas.
+    """
+
+    def __init__(self, rainfall_data):
+        self.names = np.array([name.strip() for name in rainfall_data["DISTRICT"]])
+        self.states = np.array([state.strip() for state in rainfall_data["STATE_UT_NAME"]])
+
+        # Keep the first row for duplicated names, like row.iloc[0] used to
+        self.index = {}
+        for position, name in enumerate(self.names):
+            self.index.setdefault(normalize_district(name), position)
+
+        # Each state's districts (first row per name), for state-wide queries
+        self.state_index = {}
+        for position in sorted(set(self.index.values())):
+            self.state_index.setdefault(normalize_district(self.states[position]), []).append(position)
+
+        coords = [parse_coord(value) for value in rainfall_data["coord"]]
+        self.lat = np.array([lat for lat, _ in coords], dtype=np.float64)
+        self.lon = np.array([lon for _, lon in coords], dtype=np.float64)
+
+        # Nearest-district index: unit vectors of every named district with coordinates
+        named = sorted(set(self.index.values()))
+        self.coord_positions = np.array([p for p in named if not np.isnan(self.lat[p])], dtype=np.intp)
+        self.coord_vectors = unit_vectors(self.lat[self.coord_positions], self.lon[self.coord_positions])
+
+        # Fuzzy-name index: trigram -> positions of the names containing it
+        self.trigram_index = {}
+        self.trigram_counts = {}
+        # Short names by length, for the one-edit match
+        self.short_names = {}
+        for name, position in self.index.items():
+            if len(name) <= FUZZY_SHORT_NAME + 1:
+                self.short_names.setdefault(len(name), []).append((name, position))
+            grams = trigrams(name)
+            self.trigram_counts[position] = len(grams)
+            for gram in grams:
+                self.trigram_index.setdefault(gram, []).append(position)
+
+        # Column-oriented rainfall table: one column per RAINFALL_COLUMNS entry
+        self.rainfall_table = np.array(
+            [[float(value or "nan") for value in rainfall_data[column]] for column in RAINFALL_COLUMNS],
+            dtype=np.float64,
+        )
+
+        # Optionally move the columns into memory-mapped files shared by all workers
+        shared = share_arrays("districts", {
+            "names": self.names, "states": self.states, "lat": self.lat, "lon": self.lon,
+            "rainfall_table": self.rainfall_table,
+        })
+        self.names, self.states = shared["names"], shared["states"]
+        self.lat, self.lon = shared["lat"], shared["lon"]
+        self.rainfall_table = shared["rainfall_table"]
+        # Seasonal columns used by the model are views into the table
+        self.rainfall = {
+            season: self.rainfall_table[RAINFALL_COLUMNS.index(column)] for season, column in season_col_map.items()
+        }
+
+    def __len__(self):
+        return len(self.names)
+
+    def position(self, district):
+        """Return the row position for a district name, or None."""
+        if not district:
+            return None
+        return self.index.get(normalize_district(district))
+
+    def fuzzy_position(self, district, min_score=FUZZY_MIN_SCORE):
+        """Row position of the closest-spelled district, or None below ``min_score``.
+
+        Names of up to FUZZY_SHORT_NAME characters match a district one edit
+        away instead: a trigram score can't tell "puen" from PUNE, or
+        "delhi" from NE DELHI.
+        """
+        name = normalize_district(district or "")
+        if len(name) <= FUZZY_SHORT_NAME:
+            return self.one_edit_position(name)
+        grams = trigrams(name)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.trigram_index.get(gram, ()))
+        if not shared:
+            return None
+        scores = {position: 2.0 * count / (len(grams) + self.trigram_counts[position])
+                  for position, count in shared.items()}
+        best = max(scores, key=lambda position: (scores[position], -position))
+        return best if scores[best] >= min_score else None
+
+    def one_edit_position(self, name):
+        """Row position of the first district one edit away from a short name, or None."""
+        matches = [position for length in (len(name) - 1, len(name), len(name) + 1)
+                   for candidate, position in self.short_names.get(length, ()) if within_one_edit(name, candidate)]
+        return min(matches) if name and matches else None
+
+    def nearest_position(self, lat, lon, max_km=NEAREST_MAX_KM):
+        """Row position of the district centre nearest to a point, or None beyond ``max_km``."""
+        dots = self.coord_vectors @ unit_vectors(lat, lon)
+        best = int(np.argmax(dots))
+        distance_km = EARTH_RADIUS_KM * float(np.arccos(np.clip(dots[best], -1.0, 1.0)))
+        return int(self.coord_positions[best]) if distance_km <= max_km else None
+
+    def resolve(self, district=None, lat=None, lon=None):
+        """Return ``(position, how)`` for a name (exact, then fuzzy) or a lat/lon.
+
+        ``how`` is "exact", "fuzzy" or "nearest"; ``(None, None)`` if nothing matches.
+        """
+        if district:
+            position = self.position(district)
+            if position is not None:
+                return position, "exact"
+            position = self.fuzzy_position(district)
+            if position is not None:
+                return position, "fuzzy"
+        if lat is not None and lon is not None:
+            position = self.nearest_position(lat, lon)
+            if position is not None:
+                return position, "nearest"
+        return None, None
+
+    def state_positions(self, state):
+        """Row positions of every district in a state (``STATE_UT_NAME``)."""
+        return list(self.state_index.get(normalize_district(state or ""), []))
+
+    def get_lat_lon(self, district):
+        position = self.position(district)
+        if position is None or np.isnan(self.lat[position]):
+            return None, None
+        return float(self.lat[position]), float(self.lon[position])
+
+    def get_rainfall(self, district, season, default=0):
+        position = self.position(district)
+        if position is None or season not in self.rainfall:
+            return default
+        return float(self.rainfall[season][position])
+
+
+# Load the Rainfall Dataset on first use and share the index across blueprints
+resources.register("districts", lambda: DistrictRegistry(read_rainfall_csv(rainfall_file_path)))
+
+
+def get_registry():
+    return resources.get("districts")
+
+
+def resolve_district(district=None, lat=None, lon=None):
+    """Canonical district name for a possibly misspelled name or a lat/lon, and how it matched."""
+    registry = get_registry()
+    position, how = registry.resolve(district, lat, lon)
+    if position is None:
+        return None, None
+    return str(registry.names[position]), how
+
+
+def resolve_query(district=None, lat=None, lon=None):
+    """District a request should be served for, and how it was matched.
+
+    Exact names are kept as given; misspelled names and bare coordinates are
+    replaced by the matching district. Unmatched names come back unchanged
+    with ``how`` None, so callers keep their unknown-district handling.
+    """
+    name, how = resolve_district(district, lat, lon)
+    if how is None or how == "exact":
+        return district, how
+    return name, how
+
+
+def resolution_headers(district, how):
+    """Response headers naming the district a fuzzy or coordinate query was served for."""
+    if how in ("fuzzy", "nearest"):
+        return {"X-Resolved-District": district, "X-Resolved-By": how}
+    return {}
+
+
+def parse_lat_lon(lat, lon):
+    """Validate optional lat/lon query values; raises ValueError for bad input."""
+    if lat is None and lon is None:
+        return None, None
+    if lat is None or lon is None:
+        raise ValueError("lat and lon must be given together")
+    lat, lon = float(lat), float(lon)
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("lat/lon out of range")
+    return lat, lon
+
+
+def get_lat_lon(district):
+    """Fetch latitude and longitude for a district from the index."""
+    return get_registry().get_lat_lon(district)
+
+
+def get_rainfall(district, season, default=0):
+    """Fetch seasonal rainfall for a district from the index."""
+    return get_registry().get_rainfall(district, season, default)
@@ -0,0 +1,50 @@
+import numpy as np
+
+# Feature order the scaler and model were trained on
+feature_names = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+
+
+def build_feature_matrix(nitrogen, phosphorus, potassium, ph_level, climate_rows):
+    """Stack one raw feature row per (temperature, humidity, rainfall) tuple.
+
+    Soil values are shared by every row; the result has shape (len(climate_rows), 7).
+    """
+    raw = np.empty((len(climate_rows), len(feature_names)), dtype=np.float64)
+    raw[:, 0] = nitrogen
+    raw[:, 1] = phosphorus
+    raw[:, 2] = potassium
+    raw[:, 5] = ph_level
+    if len(climate_rows):
+        raw[:, [3, 4, 6]] = climate_rows
+    return raw
+
+
+def scale_features(raw, scaler):
+    """Apply a fitted StandardScaler in one vectorised step.
+
+    The arithmetic matches ``scaler.transform`` in float64; the result is cast
+    to the float32 matrix XGBoost evaluates on, without any DataFrame round trip.
+    """
+    return ((raw - scaler.mean_) / scaler.scale_).astype(np.float32)
+
+
+def top_k(probabilities, k=3):
+    """Indices of the k most likely classes per row, highest first."""
+    k = min(k, probabilities.shape[1])
+    candidates = np.argpartition(probabilities, -k, axis=1)[:, -k:]
+    candidate_probs = np.take_along_axis(probabilities, candidates, axis=1)
+    order = np.argsort(-candidate_probs, axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def predict_top_k(model, scaler, raw, k=3):
+    """Score every row with a single predict_proba call.
+
+    Pass ``scaler=None`` for models that take raw features (the scaler folded
+    into the trees). Returns ``(top_indices, probabilities)`` where
+    ``top_indices`` has shape (rows, k) and ``probabilities`` (rows, n_classes).
+    """
+    if len(raw) == 0:
+        return np.empty((0, k), dtype=np.intp), np.empty((0, 0), dtype=np.float32)
+    probabilities = model.predict_proba(raw if scaler is None else scale_features(raw, scaler))
+    return top_k(probabilities, k), probabilities
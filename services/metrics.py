@@ -0,0 +1,170 @@
+"""Per-stage timing spans and counters, served at /metrics in the Prometheus text format.
+
+    with span("predict"):
+        probabilities = model.predict_proba(X)
+    count("cache_requests_total", cache="response", result="hit")
+
+Every span is added to the ``dhaan_stage_seconds`` histogram. It is also
+recorded against the request in progress (a context variable), and the app
+sends those stages back in a ``Server-Timing`` header. A span costs one to two
+microseconds: two clock reads, a bisect and an uncontended lock.
+
+Each process keeps its own numbers, so under gunicorn a scrape shows the
+worker that answered it. The ``pid`` in ``dhaan_process_info`` tells which.
+"""
+import contextvars
+import logging
+import os
+import threading
+from bisect import bisect_left
+from time import perf_counter
+
+PREFIX = "dhaan_"
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                   2.5, 5.0, 10.0)
+
+# Type and help text of every metric family
+FAMILIES = {
+    "stage_seconds": ("histogram", "Time spent in each stage of a request"),
+    "request_seconds": ("histogram", "Request latency by endpoint"),
+    "requests_total": ("counter", "Requests by endpoint and status code"),
+    "errors_total": ("counter", "Unhandled errors by endpoint and exception type"),
+    "cache_requests_total": ("counter", "Cache lookups by cache and result"),
+    "upstream_calls_total": ("counter", "Open-Meteo archive calls by outcome"),
+    "upstream_retries_total": ("counter", "Open-Meteo archive calls retried after an error"),
+    "upstream_coalesced_total": ("counter", "Open-Meteo lookups answered by a call already in flight"),
+    "slow_requests_total": ("counter", "Requests slower than SLOW_REQUEST_MS"),
+}
+
+logger = logging.getLogger(__name__)
+
+# Stages of the request being served, or None outside a request
+request_stages = contextvars.ContextVar("request_stages", default=None)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+
+
+class Metrics:
+    """Counters and latency histograms, keyed on (family, sorted label pairs)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        # A lock held by another thread at fork time would stay held in the child
+        os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    def inc(self, family, amount=1, **labels):
+        key = (family, tuple(sorted(labels.items())) if len(labels) > 1 else tuple(labels.items()))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, key, seconds):
+        """Add one observation; ``key`` is (family, tuple of (label, value) pairs)."""
+        bucket = bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.counts[bucket] += 1
+            histogram.sum += seconds
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {key: (list(h.counts), h.sum) for key, h in self.histograms.items()}
+
+        lines = [f"# HELP {PREFIX}process_info Serving process",
+                 f"# TYPE {PREFIX}process_info gauge",
+                 f'{PREFIX}process_info{{pid="{os.getpid()}"}} 1']
+        for family, (kind, help_text) in FAMILIES.items():
+            name = PREFIX + family
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            if kind == "counter":
+                for (key_family, labels), value in sorted(counters.items()):
+                    if key_family == family:
+                        lines.append(f"{name}{format_labels(labels)} {value}")
+                continue
+            for (key_family, labels), (counts, total) in sorted(histograms.items()):
+                if key_family != family:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(LATENCY_BUCKETS + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(labels)} {total!r}")
+                lines.append(f"{name}_count{format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+metrics = Metrics()
+
+
+class span:
+    """Time a block as one stage: ``with span("climate"): ...``."""
+
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = perf_counter() - self.started
+        metrics.observe(("stage_seconds", (("stage", self.stage),)), elapsed)
+        stages = request_stages.get()
+        if stages is not None:
+            stages.append((self.stage, elapsed))
+        return False
+
+
+def count(family, amount=1, **labels):
+    metrics.inc(family, amount, **labels)
+
+
+def record_error(endpoint, error):
+    """Count an unhandled error and log its traceback, so a 500 can be traced afterwards."""
+    metrics.inc("errors_total", endpoint=endpoint, type=type(error).__name__)
+    logger.error("Unhandled %s in %s", type(error).__name__, endpoint, exc_info=error)
+
+
+def begin_request():
+    """Start collecting the stages of a new request; returns its start time."""
+    request_stages.set([])
+    return perf_counter()
+
+
+def end_request(endpoint, status, started):
+    """Record a finished request; returns ``(seconds, Server-Timing header value)``."""
+    elapsed = perf_counter() - started
+    metrics.observe(("request_seconds", (("endpoint", endpoint),)), elapsed)
+    metrics.inc("requests_total", endpoint=endpoint, status=str(status))
+    totals = {}
+    for stage, seconds in request_stages.get() or ():
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    request_stages.set(None)
+    timings = [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in totals.items()]
+    timings.append(f"total;dur={elapsed * 1000:.3f}")
+    return elapsed, ", ".join(timings)
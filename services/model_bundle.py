@@ -0,0 +1,205 @@
+"""Versioned, pickle-free model bundles.
+
+A bundle is a directory under ``models/bundles/<version>/`` holding
+
+- ``booster.ubj``: the XGBoost booster in its native UBJSON format
+- ``scaler_mean.npy`` / ``scaler_scale.npy``: the StandardScaler statistics
+- ``trees_*.npy``: the raw-feature tree arrays the API serves (scaler folded in)
+- ``manifest.json``: class names, feature order, and a SHA-256 checksum of
+  every file
+
+The version is derived from the checksum, so a bundle's name is its content.
+``models/bundles/CURRENT`` names the active bundle. Writing it (see
+``activate``) is atomic, and serving processes pick up the change on their own.
+
+    python -m services.model_bundle            # bundle models/*.pkl and activate it
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import numpy as np
+from services.inference import feature_names
+from services.tree_ensemble import TreeEnsemble, best_rounds
+
+# Get the absolute path of the current directory (services)
+current_dir = os.path.dirname(os.path.abspath(__file__))
+bundles_dir = os.environ.get("MODEL_BUNDLE_DIR", os.path.join(current_dir, "..", "models", "bundles"))
+BUNDLE_FORMAT = 1
+TREE_ARRAYS = ("feature", "threshold", "default_left", "leaf_value")
+
+
+class BundleError(ValueError):
+    """A bundle is missing, incomplete, or doesn't match its manifest."""
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def bundle_checksum(files):
+    """One SHA-256 over every file's name and digest."""
+    return hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()
+
+
+class BundleScaler:
+    """The fitted part of a StandardScaler, read back from a bundle."""
+
+    def __init__(self, mean, scale):
+        self.mean_ = mean
+        self.scale_ = scale
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+
+class ModelBundle:
+    """A verified bundle on disk; arrays are memory-mapped, not copied."""
+
+    def __init__(self, path, verify=True):
+        self.path = path
+        try:
+            with open(os.path.join(path, "manifest.json")) as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            raise BundleError(f"Unreadable bundle manifest in {path}: {e}") from e
+        if self.manifest.get("format") != BUNDLE_FORMAT:
+            raise BundleError(f"Unsupported bundle format {self.manifest.get('format')!r} in {path}")
+        if self.manifest["feature_names"] != feature_names:
+            raise BundleError(f"Bundle feature order {self.manifest['feature_names']} != {feature_names}")
+        if verify:
+            self.verify()
+        self.version = self.manifest["version"]
+        self.classes = np.array(self.manifest["classes"], dtype=str)
+
+    def verify(self):
+        """Check every file against the manifest's digests and checksum."""
+        files = self.manifest["files"]
+        if bundle_checksum(files) != self.manifest["checksum"]:
+            raise BundleError(f"Bundle manifest checksum mismatch in {self.path}")
+        for name, digest in files.items():
+            path = os.path.join(self.path, name)
+            if not os.path.exists(path) or file_digest(path) != digest:
+                raise BundleError(f"Bundle file {name} is missing or corrupt in {self.path}")
+
+    def array(self, name):
+        return np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r", allow_pickle=False)
+
+    @property
+    def booster_path(self):
+        return os.path.join(self.path, "booster.ubj")
+
+    def scaler(self):
+        return BundleScaler(self.array("scaler_mean"), self.array("scaler_scale"))
+
+    def raw_ensemble(self):
+        """The served trees, taking raw features; needs neither xgboost nor scikit-learn."""
+        return TreeEnsemble(*(self.array(f"trees_{name}") for name in TREE_ARRAYS),
+                            self.manifest["n_classes"], self.manifest["base_score"])
+
+
+def write_bundle(model, scaler, classes, root=None, metadata=None):
+    """Write a bundle for a trained booster (or XGBClassifier) and return its version.
+
+    Nothing becomes active until ``activate`` is called with that version.
+    """
+    root = root or bundles_dir
+    os.makedirs(root, exist_ok=True)
+    booster = best_rounds(model)
+    ensemble = TreeEnsemble.from_booster(booster).fold_scaler(scaler.mean_, scaler.scale_)
+
+    # Build next to the final location, then rename the finished directory into place
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=root)
+    os.chmod(staging, 0o755)
+    try:
+        with open(os.path.join(staging, "booster.ubj"), "wb") as f:
+            f.write(booster.save_raw(raw_format="ubj"))
+        arrays = {"scaler_mean": np.asarray(scaler.mean_, dtype=np.float64),
+                  "scaler_scale": np.asarray(scaler.scale_, dtype=np.float64)}
+        arrays.update({f"trees_{name}": np.ascontiguousarray(getattr(ensemble, name)) for name in TREE_ARRAYS})
+        for name, array in arrays.items():
+            np.save(os.path.join(staging, f"{name}.npy"), array, allow_pickle=False)
+
+        files = {name: file_digest(os.path.join(staging, name)) for name in sorted(os.listdir(staging))}
+        checksum = bundle_checksum(files)
+        version = checksum[:16]
+        manifest = {
+            "format": BUNDLE_FORMAT,
+            "version": version,
+            "checksum": checksum,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "feature_names": feature_names,
+            "classes": [str(name) for name in classes],
+            "n_classes": ensemble.n_classes,
+            "base_score": ensemble.base_score,
+            "rounds": booster.num_boosted_rounds(),
+            "files": files,
+            **(metadata or {}),
+        }
+        with open(os.path.join(staging, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+        target = os.path.join(root, version)
+        if os.path.exists(target):
+            shutil.rmtree(staging)  # Same content is already bundled
+        else:
+            os.replace(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return version
+
+
+def current_version(root=None):
+    """Version named by CURRENT, or None when no bundle is active."""
+    try:
+        with open(os.path.join(root or bundles_dir, "CURRENT")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def check_version(version):
+    """``version`` if it looks like a bundle version (so it is safe in a path), else BundleError."""
+    if not re.fullmatch(r"[0-9a-f]{16}", str(version)):
+        raise BundleError(f"Invalid bundle version {version!r}")
+    return version
+
+
+def activate(version, root=None):
+    """Verify a bundle and make it the active one."""
+    root = root or bundles_dir
+    ModelBundle(os.path.join(root, check_version(version)))
+    temp_path = os.path.join(root, f".CURRENT.{os.getpid()}")
+    with open(temp_path, "w") as f:
+        f.write(version + "\n")
+    os.replace(temp_path, os.path.join(root, "CURRENT"))
+
+
+def load_bundle(version=None, root=None, verify=True):
+    """The given (default: active) bundle, or None when no bundle is active."""
+    root = root or bundles_dir
+    if version:
+        check_version(version)
+    version = version or current_version(root)
+    if version is None:
+        return None
+    return ModelBundle(os.path.join(root, version), verify=verify)
+
+
+if __name__ == "__main__":
+    # Bundle the pickled model, scaler and label encoder in models/ and activate it
+    import joblib
+
+    models_dir = os.path.join(current_dir, "..", "models")
+    version = write_bundle(joblib.load(os.path.join(models_dir, "crop_prediction_xgb_model.pkl")),
+                           joblib.load(os.path.join(models_dir, "scaler.pkl")),
+                           joblib.load(os.path.join(models_dir, "label_encoder.pkl")).classes_)
+    activate(version)
+    print(f"✅ Bundled and activated models/bundles/{version}")
@@ -0,0 +1,292 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from services.metrics import count, span
+from services.resources import resources
+
+# Open-Meteo API Configuration (override to point at a local fake server)
+METEO_API_URL = os.environ.get("OPEN_METEO_ARCHIVE_URL", "https://archive-api.open-meteo.com/v1/archive")
+REQUEST_TIMEOUT = float(os.environ.get("OPEN_METEO_TIMEOUT", "30"))
+# Keep-alive connections held open per client
+MAX_CONNECTIONS = int(os.environ.get("OPEN_METEO_MAX_CONNECTIONS", "64"))
+# Retries (with backoff) for connection errors, 429 and 5xx responses
+RETRIES = int(os.environ.get("OPEN_METEO_RETRIES", "3"))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# After this many failed calls in a row, stop calling for the cooldown period
+BREAKER_FAILURES = int(os.environ.get("OPEN_METEO_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.environ.get("OPEN_METEO_BREAKER_COOLDOWN", "30"))
+
+# Locations per multi-location call (they all go into the query string)
+MAX_LOCATIONS = int(os.environ.get("OPEN_METEO_MAX_LOCATIONS", "50"))
+
+# Daily means: ~90 values per variable and season instead of ~2,200 hourly ones
+DAILY_VARIABLES = ["temperature_2m_mean", "relative_humidity_2m_mean"]
+
+
+def season_params(lat, lon, start_date, end_date):
+    return {
+        "latitude": lat,
+        "longitude": lon,
+        "start_date": start_date,
+        "end_date": end_date,
+        "daily": ",".join(DAILY_VARIABLES),
+        "timezone": "Asia/Kolkata"
+    }
+
+
+def average_daily(payload):
+    """Average temperature and humidity of an archive response, or (None, None)."""
+    data = payload.get("daily")
+    if not data:
+        return None, None
+    # Missing days come back as null and turn into NaN, which is never stored
+    avg_temp = np.mean(np.asarray(data["temperature_2m_mean"], dtype=np.float64))
+    avg_humidity = np.mean(np.asarray(data["relative_humidity_2m_mean"], dtype=np.float64))
+    return avg_temp, avg_humidity
+
+
+def request_key(lat, lon, start_date, end_date):
+    return round(float(lat), 4), round(float(lon), 4), start_date, end_date
+
+
+class CircuitBreaker:
+    """Fails fast after repeated upstream failures.
+
+    Once ``failure_threshold`` calls in a row have failed the breaker opens and
+    ``allow`` refuses calls for ``cooldown`` seconds; after that a single trial
+    call is let through, and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.cooldown and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record(self, ok):
+        with self._lock:
+            self._trial = False
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class ArchiveClientBase:
+    """Counters and circuit breaker shared by the sync and async clients."""
+
+    def __init__(self, url=None, max_connections=MAX_CONNECTIONS, timeout=REQUEST_TIMEOUT):
+        self.url = url or METEO_API_URL
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.breaker = CircuitBreaker()
+        self._counter_lock = threading.Lock()
+        self.calls = self.coalesced = self.failures = self.rejected = 0
+
+    def _count(self, name):
+        with self._counter_lock:
+            setattr(self, name, getattr(self, name) + 1)
+        if name == "coalesced":
+            count("upstream_coalesced_total")
+        elif name == "rejected":
+            count("upstream_calls_total", outcome="rejected")
+
+    def stats(self):
+        return {
+            "url": self.url,
+            "upstream_calls": self.calls,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+            "rejected_by_breaker": self.rejected,
+            "breaker": self.breaker.state,
+        }
+
+
+class OpenMeteoClient(ArchiveClientBase):
+    """Pooled, retrying archive client with single-flight request coalescing.
+
+    Concurrent calls for the same (lat, lon, date range) share one upstream
+    request, and a circuit breaker stops calls while the API keeps failing.
+    """
+
+    def __init__(self, url=None, max_connections=MAX_CONNECTIONS, timeout=REQUEST_TIMEOUT):
+        super().__init__(url, max_connections, timeout)
+        self._open_session()
+        # Pooled sockets must not be shared across fork(); workers open their own
+        client = weakref.ref(self)
+        os.register_at_fork(after_in_child=lambda: client() and client()._open_session())
+
+    def _open_session(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        retry = Retry(total=RETRIES, backoff_factor=0.2, status_forcelist=RETRY_STATUSES,
+                      allowed_methods=["GET"], raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def season_averages(self, lat, lon, start_date, end_date):
+        """Average (temperature, humidity) over a date range; (None, None) on an upstream failure."""
+        key = request_key(lat, lon, start_date, end_date)
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = Future()
+        if not leader:
+            self._count("coalesced")
+            return call.result()
+
+        try:
+            result = self._fetch(lat, lon, start_date, end_date)
+            call.set_result(result)
+            return result
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def _fetch(self, lat, lon, start_date, end_date):
+        payload = self._get(season_params(lat, lon, start_date, end_date))
+        return (None, None) if payload is None else average_daily(payload)
+
+    def season_averages_many(self, points, start_date, end_date):
+        """``season_averages`` for many (lat, lon) points in one multi-location call."""
+        lats = ",".join(str(lat) for lat, _ in points)
+        lons = ",".join(str(lon) for _, lon in points)
+        payload = self._get(season_params(lats, lons, start_date, end_date))
+        # Several locations come back as a list, a single one as a plain object
+        payloads = payload if isinstance(payload, list) else [payload]
+        if payload is None or len(payloads) != len(points):
+            return [(None, None)] * len(points)
+        return [average_daily(location) for location in payloads]
+
+    def _get(self, params):
+        """Decoded JSON of an archive call, or None when it failed or was refused."""
+        if not self.breaker.allow():
+            self._count("rejected")
+            return None
+        self._count("calls")
+        try:
+            with span("upstream"):
+                response = self.session.get(self.url, params=params, timeout=self.timeout)
+        except requests.RequestException:
+            response = None
+        else:
+            # urllib3 retried inside the adapter; its history lists every failed attempt
+            retries = getattr(response.raw, "retries", None)
+            if retries is not None and retries.history:
+                count("upstream_retries_total", len(retries.history))
+        # A 4xx is our request's fault, not an outage, so it doesn't trip the breaker
+        healthy = response is not None and response.status_code not in RETRY_STATUSES
+        self.breaker.record(healthy)
+        if response is None or response.status_code != 200:
+            self._count("failures")
+            count("upstream_calls_total", outcome="error")
+            return None
+        count("upstream_calls_total", outcome="ok")
+        return response.json()
+
+
+class AsyncOpenMeteoClient(ArchiveClientBase):
+    """``OpenMeteoClient`` on a pooled keep-alive aiohttp session.
+
+    Create it inside the running event loop and ``close`` it on shutdown.
+    aiohttp is imported here so the sync app doesn't need it.
+    """
+
+    def __init__(self, url=None, max_connections=MAX_CONNECTIONS, timeout=REQUEST_TIMEOUT):
+        import aiohttp
+
+        super().__init__(url, max_connections, timeout)
+        self._errors = (aiohttp.ClientError, asyncio.TimeoutError)
+        self._in_flight = {}
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=max_connections, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        )
+
+    async def season_averages(self, lat, lon, start_date, end_date):
+        key = request_key(lat, lon, start_date, end_date)
+        task = self._in_flight.get(key)
+        if task is not None:
+            self._count("coalesced")
+            return await asyncio.shield(task)
+
+        task = self._in_flight[key] = asyncio.ensure_future(self._fetch(lat, lon, start_date, end_date))
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, lat, lon, start_date, end_date):
+        if not self.breaker.allow():
+            self._count("rejected")
+            return None, None
+        self._count("calls")
+        params = season_params(lat, lon, start_date, end_date)
+        with span("upstream"):
+            for attempt in range(RETRIES + 1):
+                if attempt:
+                    count("upstream_retries_total")
+                    await asyncio.sleep(0.2 * 2 ** (attempt - 1))
+                try:
+                    async with self.session.get(self.url, params=params) as response:
+                        if response.status in RETRY_STATUSES:
+                            continue
+                        self.breaker.record(True)
+                        if response.status != 200:
+                            break
+                        payload = await response.json()
+                    count("upstream_calls_total", outcome="ok")
+                    return average_daily(payload)
+                except self._errors:
+                    continue
+            else:
+                self.breaker.record(False)
+        self._count("failures")
+        count("upstream_calls_total", outcome="error")
+        return None, None
+
+    async def close(self):
+        await self.session.close()
+
+
+resources.register("open_meteo", OpenMeteoClient)
+
+
+def get_client():
+    return resources.get("open_meteo")
+
+
+def fetch_season_averages(lat, lon, start_date, end_date):
+    """Seasonal averages through the shared client; (None, None) on an upstream error."""
+    return get_client().season_averages(lat, lon, start_date, end_date)
@@ -0,0 +1,95 @@
+"""Opt-in sampling profiler for slow requests.
+
+With ``SLOW_REQUEST_MS`` set, a background thread samples the Python stack of
+every thread that is serving a request, every ``PROFILE_INTERVAL_MS``. Once
+a request ends, its samples are dropped unless it took longer than the
+threshold. In that case they go to ``SLOW_REQUEST_PROFILE_DIR`` in the
+collapsed-stack format that flamegraph.pl and speedscope read:
+
+    SLOW_REQUEST_MS=500 gunicorn -c gunicorn.conf.py app:app
+
+Requests that aren't slow cost a dict insert and delete. The profiler follows
+threads, so it is wired into the Flask app, where each request has a thread
+of its own, and not into the async app, where requests share the event loop.
+"""
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from services.metrics import count
+
+logger = logging.getLogger(__name__)
+
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+SLOW_REQUEST_PROFILE_DIR = os.environ.get(
+    "SLOW_REQUEST_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "dhaan-slow-requests")
+)
+
+
+def collapse(frame):
+    """``file:function:line`` frames from the outermost call in, joined by semicolons."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SlowRequestProfiler:
+    def __init__(self, threshold_ms=SLOW_REQUEST_MS, interval_ms=PROFILE_INTERVAL_MS,
+                 output_dir=SLOW_REQUEST_PROFILE_DIR):
+        self.threshold = threshold_ms / 1000.0
+        self.interval = interval_ms / 1000.0
+        self.output_dir = output_dir
+        # Thread id -> stack samples of the request it is serving
+        self._active = {}
+        self._sampler = None
+        self._pid = None
+
+    def _ensure_sampler(self):
+        # Threads don't survive fork(), so each worker starts its own on first use
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._active = {}
+            self._sampler = threading.Thread(target=self._run, name="slow-request-profiler", daemon=True)
+            self._sampler.start()
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            if not self._active:
+                continue
+            frames = sys._current_frames()
+            for ident, samples in list(self._active.items()):
+                frame = frames.get(ident)
+                if frame is not None and ident != own:
+                    samples[collapse(frame)] += 1
+
+    def begin(self):
+        self._ensure_sampler()
+        self._active[threading.get_ident()] = Counter()
+
+    def end(self, label, seconds):
+        """Stop sampling this thread; write the samples out if the request was slow. Returns the path or None."""
+        samples = self._active.pop(threading.get_ident(), None)
+        if seconds < self.threshold or not samples:
+            return None
+        count("slow_requests_total")
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = "".join(c if c.isalnum() else "_" for c in label).strip("_") or "request"
+        path = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{name}-"
+                                             f"{seconds * 1000:.0f}ms.folded")
+        with open(path, "w") as f:
+            f.writelines(f"{stack} {n}\n" for stack, n in samples.most_common())
+        logger.warning("%s took %.0f ms; %d stack samples in %s", label, seconds * 1000, sum(samples.values()), path)
+        return path
+
+
+# None unless SLOW_REQUEST_MS is set
+slow_request_profiler = SlowRequestProfiler() if SLOW_REQUEST_MS > 0 else None
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import numpy as np
+from services.artifacts import artifact_version, get_inference_model
+from services.districts import SEASONS, get_registry, normalize_district
+from services.inference import predict_top_k
+from services.resources import resources
+
+# Get the absolute path of the current directory (services)
+current_dir = os.path.dirname(os.path.abspath(__file__))
+models_dir = os.path.join(current_dir, "..", "models")
+soil_profiles_path = os.environ.get(
+    "SOIL_PROFILES_PATH", os.path.join(current_dir, "..", "data", "soil_profiles.json")
+)
+# Lookup artifact written by build_recommendation_map.py and served by /predict/profile
+recommendation_map_path = os.environ.get(
+    "RECOMMENDATION_MAP_PATH", os.path.join(current_dir, "..", "data", "recommendations.npz")
+)
+# How often a serving process checks the artifact on disk for a rebuild
+RECOMMENDATION_MAP_CHECK_SECONDS = float(os.environ.get("RECOMMENDATION_MAP_CHECK_SECONDS", "30"))
+
+
+def load_soil_profiles(path=None):
+    """{profile: (N, P, K, ph)} in file order."""
+    with open(path or soil_profiles_path) as f:
+        profiles = json.load(f)
+    return {name: tuple(float(values[key]) for key in ("N", "P", "K", "ph")) for name, values in profiles.items()}
+
+
+def models_version():
+    """Fingerprint of every file under models/, changed by any retrain, re-export or bundle switch."""
+    versions = sorted(
+        artifact_version(os.path.join(directory, name))
+        for directory, _, names in os.walk(models_dir) for name in names
+    )
+    return hashlib.sha1("|".join(versions).encode()).hexdigest()[:20]
+
+
+def build_recommendation_map(climate, profiles, k=3):
+    """Score every district x season x soil profile in one model call.
+
+    ``climate`` maps a district's (lat, lon) to ``{season: (temperature,
+    humidity)}``. Returns the arrays of the lookup artifact: the probabilities
+    and top-``k`` crops per (district, profile, season), with ``available``
+    marking the rows that had climate data.
+    """
+    registry, inference = get_registry(), get_inference_model()
+    positions = np.array(sorted(set(registry.index.values())), dtype=np.intp)
+    soil = np.array(list(profiles.values()), dtype=np.float64).reshape(-1, 4)
+
+    # Climate rows per (district, season); NaN where it couldn't be fetched
+    climate_rows = np.full((len(positions), len(SEASONS), 3), np.nan)
+    for d, position in enumerate(positions):
+        point = (float(registry.lat[position]), float(registry.lon[position]))
+        for s, season in enumerate(SEASONS):
+            temperature, humidity = climate.get(point, {}).get(season, (None, None))
+            if temperature is not None:
+                climate_rows[d, s] = temperature, humidity, registry.rainfall[season][position]
+    available = ~np.isnan(climate_rows[:, :, 0])
+
+    # One feature row per (district, profile, season)
+    shape = (len(positions), len(soil), len(SEASONS))
+    input_data = np.empty((int(np.prod(shape)), 7), dtype=np.float64)
+    input_data[:, [0, 1, 2, 5]] = np.broadcast_to(soil[None, :, None], shape + (4,)).reshape(-1, 4)
+    input_data[:, [3, 4, 6]] = np.broadcast_to(climate_rows[:, None], shape + (3,)).reshape(-1, 3)
+    top_indices, probabilities = predict_top_k(inference.model, inference.scaler, input_data, k=k)
+
+    return {
+        "districts": registry.names[positions].astype(str),
+        "profiles": np.array(list(profiles), dtype=str),
+        "soil": soil,
+        "seasons": np.array(SEASONS, dtype=str),
+        "classes": inference.classes.astype(str),
+        "available": np.broadcast_to(available[:, None], shape).copy(),
+        "top": top_indices.reshape(shape + (-1,)).astype(np.uint8),
+        "probabilities": probabilities.reshape(shape + (-1,)).astype(np.float32),
+        "inference_version": np.array(str(inference.version)),
+        "models_version": np.array(models_version()),
+    }
+
+
+def write_recommendation_map(arrays, path=None):
+    """Write the artifact next to its final name and swap it in, so readers never see half a file."""
+    path = path or recommendation_map_path
+    temp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez_compressed(temp_path, **arrays)
+    os.replace(temp_path, path)
+
+
+def read_models_version(path=None):
+    """``models_version`` the artifact was built from, or None when there is none."""
+    path = path or recommendation_map_path
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as artifact:
+        return str(artifact["models_version"])
+
+
+class RecommendationMap:
+    """Precomputed /predict/ answers for the standard soil profiles."""
+
+    def __init__(self, path):
+        self.path = path
+        self.version = artifact_version(path)
+        with np.load(path) as artifact:
+            arrays = {name: artifact[name] for name in artifact.files}
+        self.inference_version = str(arrays["inference_version"])
+        self.profiles = {str(name): p for p, name in enumerate(arrays["profiles"])}
+        self.soil = arrays["soil"]
+        self.seasons = [str(season) for season in arrays["seasons"]]
+        self.classes = arrays["classes"]
+        self.available, self.top, self.probabilities = arrays["available"], arrays["top"], arrays["probabilities"]
+        self.district_row = {normalize_district(str(name)): d for d, name in enumerate(arrays["districts"])}
+
+    def render(self, district, profile):
+        """The /predict/ body for a district and profile, or None when it isn't in the map.
+
+        Only served while the map was built from the model currently loaded,
+        so a lookup always matches what scoring the profile would return.
+        """
+        d, p = self.district_row.get(normalize_district(district)), self.profiles.get(profile)
+        inference = get_inference_model()
+        if d is None or p is None or inference.version != self.inference_version:
+            return None
+        rows = np.flatnonzero(self.available[d, p])
+        if not len(rows):
+            return None
+        seasons = [self.seasons[s] for s in rows]
+        return inference.details.render(seasons, self.top[d, p, rows], self.probabilities[d, p, rows])
+
+
+def load_recommendation_map():
+    if not os.path.exists(recommendation_map_path):
+        return None
+    return RecommendationMap(recommendation_map_path)
+
+
+def recommendation_map_version():
+    return artifact_version(recommendation_map_path) if os.path.exists(recommendation_map_path) else None
+
+
+resources.register("recommendation_map", load_recommendation_map)
+# A rebuilt map replaces the file on disk; serving processes reload it on their own
+resources.watch("recommendation_map", recommendation_map_version, RECOMMENDATION_MAP_CHECK_SECONDS)
+
+
+def get_recommendation_map():
+    """The loaded map, or None when none has been built."""
+    return resources.get("recommendation_map")
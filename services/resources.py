@@ -0,0 +1,160 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB (Linux), or None if unknown."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ResourceRegistry:
+    """Process-wide registry of heavy artifacts (models, datasets, clients).
+
+    Each resource is registered with a loader and built on first use (or all
+    at once by ``warm_up``), then shared by every blueprint. ``reload`` builds
+    fresh copies off to the side and swaps them in together, so requests see
+    either the old set or the new one, never a mix. Load time and the RSS
+    growth caused by each loader are recorded for ``stats``.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._values = {}
+        self._stats = {}
+        self._lock = threading.RLock()
+        self._reload_hooks = []
+        self._watches = {}
+        self.generation = 0
+        self.created_at = time.perf_counter()
+        self.warm_up_seconds = None
+        self.startup_seconds = None  # Set by the app once it is importable
+
+    def register(self, name, loader):
+        self._loaders[name] = loader
+
+    def watch(self, name, source_version, interval):
+        """Reload ``name`` when ``source_version()`` changes.
+
+        ``get`` compares it with the version the loaded copy came from, at most
+        once every ``interval`` seconds and in one thread at a time, so a file
+        swapped on disk (a new model bundle, say) is picked up by every worker
+        without a restart. Requests keep the old copy until the new one is built.
+        """
+        self._watches[name] = {"source_version": source_version, "interval": interval,
+                               "loaded": None, "checked_at": time.monotonic(), "lock": threading.Lock()}
+
+    def on_reload(self, hook):
+        """Call ``hook(names)`` after every successful reload."""
+        self._reload_hooks.append(hook)
+
+    def get(self, name):
+        try:
+            value = self._values[name]
+        except KeyError:
+            pass
+        else:
+            if name in self._watches:
+                return self._refresh(name, value)
+            return value
+        with self._lock:
+            if name not in self._values:
+                self._values[name] = self._load(name)
+            return self._values[name]
+
+    def _refresh(self, name, value):
+        watch = self._watches[name]
+        now = time.monotonic()
+        if now - watch["checked_at"] < watch["interval"] or not watch["lock"].acquire(blocking=False):
+            return value
+        try:
+            watch["checked_at"] = now
+            if watch["source_version"]() == watch["loaded"]:
+                return value
+            try:
+                self.reload([name])
+            except Exception as e:
+                # Keep serving the copy already loaded; the check repeats next interval
+                logger.warning("Reloading %s failed, still serving the loaded copy: %s", name, e)
+                return value
+            return self._values[name]
+        finally:
+            watch["lock"].release()
+
+    def _load(self, name):
+        rss_before = current_rss_mb()
+        started = time.perf_counter()
+        watch = self._watches.get(name)
+        # Read the source version first, so a change during the load is caught next time
+        version = watch["source_version"]() if watch else None
+        value = self._loaders[name]()
+        rss_after = current_rss_mb()
+        self._stats[name] = {
+            "load_seconds": round(time.perf_counter() - started, 4),
+            "rss_delta_mb": round(rss_after - rss_before, 2) if rss_before is not None else None,
+            "loaded_at": time.time(),
+        }
+        if watch:
+            watch["loaded"] = self._stats[name]["source_version"] = version
+        return value
+
+    def warm_up(self, names=None):
+        """Load the given (default: all) resources now instead of on first use."""
+        started = time.perf_counter()
+        for name in names or list(self._loaders):
+            self.get(name)
+        self.warm_up_seconds = round(time.perf_counter() - started, 4)
+        return self.stats()
+
+    def reload(self, names=None):
+        """Rebuild resources and swap them in atomically."""
+        names = list(names or self._values)
+        with self._lock:
+            self._swap({name: self._load(name) for name in names})
+        for hook in self._reload_hooks:
+            hook(names)
+        return self.stats()
+
+    def replace(self, name, value, source_version=None):
+        """Swap in a copy of ``name`` built by the caller, as ``reload`` would.
+
+        For a watched resource, ``source_version`` is the version it was built
+        from, so the watch doesn't load it again.
+        """
+        with self._lock:
+            self._swap({name: value})
+            self._stats[name] = {"loaded_at": time.time()}
+            if name in self._watches:
+                self._watches[name]["loaded"] = self._stats[name]["source_version"] = source_version
+        for hook in self._reload_hooks:
+            hook([name])
+        return self.stats()
+
+    def _swap(self, fresh):
+        values = dict(self._values)
+        values.update(fresh)
+        self._values = values
+        self.generation += 1
+
+    def stats(self):
+        return {
+            "generation": self.generation,
+            "startup_seconds": self.startup_seconds,
+            "warm_up_seconds": self.warm_up_seconds,
+            "seconds_since_start": round(time.perf_counter() - self.created_at, 2),
+            "rss_mb": round(current_rss_mb() or 0, 2),
+            "resources": {
+                name: {"loaded": name in self._values, **self._stats.get(name, {})}
+                for name in self._loaders
+            },
+        }
+
+
+resources = ResourceRegistry()
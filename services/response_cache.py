@@ -0,0 +1,202 @@
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from services.resources import resources
+
+# Entries kept per process (memory) or per file (sqlite); 0 turns the cache off
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "10000"))
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "3600"))
+# Soil readings are snapped to these steps before scoring and keying (0 = exact)
+RESPONSE_CACHE_NPK_STEP = float(os.environ.get("RESPONSE_CACHE_NPK_STEP", "0"))
+RESPONSE_CACHE_PH_STEP = float(os.environ.get("RESPONSE_CACHE_PH_STEP", "0"))
+# "memory" (per worker) or "sqlite" (one file shared by every worker on the host)
+RESPONSE_CACHE_BACKEND = os.environ.get("RESPONSE_CACHE_BACKEND", "memory")
+current_dir = os.path.dirname(os.path.abspath(__file__))
+RESPONSE_CACHE_PATH = os.environ.get(
+    "RESPONSE_CACHE_PATH", os.path.join(current_dir, "..", "data", "response_cache.sqlite")
+)
+
+
+def quantise(value, step):
+    """Snap a reading to the nearest multiple of ``step`` (as a float)."""
+    value = float(value)
+    if step <= 0:
+        return value
+    return round(round(value / step) * step, 6)
+
+
+def quantise_soil(nitrogen, phosphorus, potassium, ph_level):
+    return (
+        quantise(nitrogen, RESPONSE_CACHE_NPK_STEP),
+        quantise(phosphorus, RESPONSE_CACHE_NPK_STEP),
+        quantise(potassium, RESPONSE_CACHE_NPK_STEP),
+        quantise(ph_level, RESPONSE_CACHE_PH_STEP),
+    )
+
+
+class MemoryBackend:
+    """In-process LRU with per-entry expiry; also the stand-in for the shared backend."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, now):
+        """Return ``(body, expired)``; body is None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, False
+            body, expires = entry
+            if expires <= now:
+                del self._entries[key]
+                return None, True
+            self._entries.move_to_end(key)
+            return body, False
+
+    def set(self, key, body, expires):
+        """Store an entry and return how many old ones were evicted for it."""
+        with self._lock:
+            self._entries[key] = (body, expires)
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """LRU/TTL entries in a SQLite file, so every worker on the host shares them."""
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self._connect()
+        # SQLite connections must not cross fork(); pre-forked workers reopen theirs
+        backend = weakref.ref(self)
+        os.register_at_fork(after_in_child=lambda: backend() and backend()._connect())
+
+    def _connect(self):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, body TEXT, expires REAL, used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_used ON responses (used)")
+
+    def get(self, key, now):
+        with self._lock:
+            row = self._conn.execute("SELECT body, expires FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None, False
+            body, expires = row
+            if expires <= now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None, True
+            self._conn.execute("UPDATE responses SET used = ? WHERE key = ?", (now, key))
+            return body, False
+
+    def set(self, key, body, expires):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, body, expires, used) VALUES (?, ?, ?, ?)",
+                (key, body, expires, time.time()),
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            evicted = max(count - self.max_entries, 0)
+            if evicted:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY used LIMIT ?)",
+                    (evicted,),
+                )
+            return evicted
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class ResponseCache:
+    """Bounded LRU/TTL cache of finished response bodies with hit/miss counters."""
+
+    def __init__(self, backend, ttl=RESPONSE_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._counter_lock = threading.Lock()
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self.hits = self.misses = self.expired = self.evictions = self.invalidations = 0
+
+    def get(self, key):
+        body, expired = self.backend.get(key, time.time())
+        with self._counter_lock:
+            if body is None:
+                self.misses += 1
+                self.expired += expired
+            else:
+                self.hits += 1
+        return body
+
+    def put(self, key, body):
+        evicted = self.backend.set(key, body, time.time() + self.ttl)
+        with self._counter_lock:
+            self.evictions += evicted
+
+    def clear(self):
+        self.backend.clear()
+        with self._counter_lock:
+            self.invalidations += 1
+
+    def stats(self, reset=False):
+        with self._counter_lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "backend": type(self.backend).__name__,
+                "entries": len(self.backend),
+                "max_entries": self.backend.max_entries,
+                "ttl_seconds": self.ttl,
+                "npk_step": RESPONSE_CACHE_NPK_STEP,
+                "ph_step": RESPONSE_CACHE_PH_STEP,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+            if reset:
+                self._reset_counters()
+        return stats
+
+
+def make_response_cache():
+    if RESPONSE_CACHE_SIZE <= 0:
+        return None
+    if RESPONSE_CACHE_BACKEND == "sqlite":
+        backend = SQLiteBackend(RESPONSE_CACHE_PATH, RESPONSE_CACHE_SIZE)
+    else:
+        backend = MemoryBackend(RESPONSE_CACHE_SIZE)
+    cache = ResponseCache(backend)
+    # Cached bodies are only valid for the artifacts that produced them
+    resources.on_reload(lambda names: cache.clear())
+    return cache
@@ -0,0 +1,39 @@
+import hashlib
+import os
+import tempfile
+import numpy as np
+
+# SHARED_ARRAYS=1 backs large read-only arrays with memory-mapped .npy files,
+# so every worker process maps the same page-cache pages instead of holding
+# its own copy (and reference-count updates never dirty the array data)
+SHARED_ARRAYS = os.environ.get("SHARED_ARRAYS", "0") == "1"
+shared_array_dir = os.environ.get(
+    "SHARED_ARRAY_DIR", os.path.join(tempfile.gettempdir(), "dhaan-utthan-arrays")
+)
+
+
+def share_arrays(namespace, arrays):
+    """Return read-only memory-mapped copies of ``arrays`` (a name -> array dict).
+
+    Files are content-addressed, so processes that build the same array map
+    the same file, and a reload with new content never clobbers a file
+    another process still has mapped. Without SHARED_ARRAYS the arrays are
+    returned unchanged.
+    """
+    if not SHARED_ARRAYS:
+        return arrays
+    directory = os.path.join(shared_array_dir, namespace)
+    os.makedirs(directory, exist_ok=True)
+
+    shared = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        digest = hashlib.sha1(array.dtype.str.encode() + str(array.shape).encode() + array.tobytes()).hexdigest()
+        path = os.path.join(directory, f"{name}-{digest[:16]}.npy")
+        if not os.path.exists(path):
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                np.save(f, array)
+            os.replace(temp_path, path)
+        shared[name] = np.load(path, mmap_mode="r")
+    return shared
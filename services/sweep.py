@@ -0,0 +1,134 @@
+import os
+import numpy as np
+from services.inference import feature_names
+from services.tree_ensemble import TreeEnsemble, softmax
+
+# Largest grid one sweep may score, and rows scored at a time
+SWEEP_MAX_POINTS = int(os.environ.get("SWEEP_MAX_POINTS", "1000000"))
+SWEEP_CHUNK_ROWS = int(os.environ.get("SWEEP_CHUNK_ROWS", "65536"))
+
+# Grid dimensions, in the order the flattened surfaces are laid out (C order)
+SWEEP_AXES = ["N", "P", "K", "ph"]
+SWEEP_DEFAULTS = {"N": 50.0, "P": 30.0, "K": 40.0, "ph": 6.5}
+
+
+def axis_number(value, name):
+    """One number of an axis specification; bools are JSON true/false, not numbers."""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"{name} must be a number")
+    number = float(value)
+    if not np.isfinite(number):
+        raise ValueError(f"{name} must be a finite number")
+    return number
+
+
+def parse_axis(spec, default):
+    """Values of one grid axis from a number, a list, or {"min", "max", "step"|"num"}.
+
+    Ranges are sized before any array is built, so an axis longer than
+    SWEEP_MAX_POINTS is refused without allocating it.
+    """
+    if spec is None:
+        spec = default
+    if isinstance(spec, bool):
+        raise ValueError(f"Invalid axis specification: {spec!r}")
+    if isinstance(spec, (int, float)):
+        values = [axis_number(spec, "value")]
+    elif isinstance(spec, list):
+        if len(spec) > SWEEP_MAX_POINTS:
+            raise ValueError(f"axis has more than {SWEEP_MAX_POINTS} points")
+        values = [axis_number(value, "value") for value in spec]
+    elif isinstance(spec, dict):
+        low, high = axis_number(spec["min"], "min"), axis_number(spec["max"], "max")
+        if "num" in spec:
+            points = axis_number(spec["num"], "num")
+            if points < 1 or points != int(points):
+                raise ValueError("num must be a positive whole number")
+        else:
+            step = axis_number(spec["step"], "step")
+            if step <= 0:
+                raise ValueError("step must be positive")
+            # Inclusive of max, without the float drift of np.arange
+            points = np.floor((high - low) / step + 1e-9) + 1
+            if points < 1:
+                raise ValueError("max must not be below min")
+        # Sized before allocating, so a huge num or a tiny step is refused cheaply
+        if not points <= SWEEP_MAX_POINTS:
+            raise ValueError(f"axis has more than {SWEEP_MAX_POINTS} points")
+        if "num" in spec:
+            values = np.linspace(low, high, int(points))
+        else:
+            values = low + step * np.arange(int(points))
+    else:
+        raise ValueError(f"Invalid axis specification: {spec!r}")
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim != 1 or not len(values) or not np.isfinite(values).all():
+        raise ValueError(f"Invalid axis specification: {spec!r}")
+    return values
+
+
+def sweep_chunks(inference, climate_row, axes, chunk_rows=SWEEP_CHUNK_ROWS):
+    """Yield ``(start, probabilities)`` over the flattened grid in chunks of ``chunk_rows``.
+
+    ``axes`` maps each SWEEP_AXES name to its values and ``climate_row`` is the
+    district's fixed (temperature, humidity, rainfall). Table-compiled tree
+    ensembles are evaluated from per-axis margin tables; other models score
+    each chunk's feature matrix in one predict_proba call.
+    """
+    shape = [len(axes[name]) for name in SWEEP_AXES]
+    total = int(np.prod(shape))
+    columns = [feature_names.index(name) for name in SWEEP_AXES]
+    fixed = dict(zip([feature_names.index(name) for name in ("temperature", "humidity", "rainfall")], climate_row))
+    model, scaler = inference.model, inference.scaler
+
+    terms = None
+    if isinstance(model, TreeEnsemble):
+        def model_input(feature, values):
+            # The scaler is per feature, so grid axes can be scaled on their own
+            values = np.asarray(values, dtype=np.float64)
+            if scaler is None:
+                return values
+            return ((values - scaler.mean_[feature]) / scaler.scale_[feature]).astype(np.float32)
+
+        terms = model.grid_terms(
+            [(feature, model_input(feature, axes[name])) for feature, name in zip(columns, SWEEP_AXES)],
+            {feature: float(model_input(feature, value)) for feature, value in fixed.items()},
+        )
+
+    for start in range(0, total, chunk_rows):
+        index = np.unravel_index(np.arange(start, min(start + chunk_rows, total)), shape)
+        if terms is not None:
+            constant, parts = terms
+            margin = np.broadcast_to(constant, (len(index[0]), len(constant))).copy()
+            for key, table in parts:
+                margin += table[tuple(index[a] for a in key)]
+            yield start, softmax(margin.astype(np.float32))
+            continue
+
+        raw = np.empty((len(index[0]), len(feature_names)), dtype=np.float64)
+        for a, (feature, name) in enumerate(zip(columns, SWEEP_AXES)):
+            raw[:, feature] = axes[name][index[a]]
+        for feature, value in fixed.items():
+            raw[:, feature] = value
+        if scaler is not None:
+            raw = ((raw - scaler.mean_) / scaler.scale_).astype(np.float32)
+        yield start, model.predict_proba(raw)
+
+
+def run_sweep(inference, climate_row, axes, crop_indices, chunk_rows=SWEEP_CHUNK_ROWS):
+    """Top crop per grid point and probability surfaces for ``crop_indices``.
+
+    Returns ``(top_crop, surfaces)``: a uint8 grid of class indices and
+    ``{class index: float32 grid}``, each shaped like the grid. Only one chunk
+    of full probabilities is held at a time.
+    """
+    shape = [len(axes[name]) for name in SWEEP_AXES]
+    total = int(np.prod(shape))
+    top_crop = np.empty(total, dtype=np.uint8)
+    surfaces = {c: np.empty(total, dtype=np.float32) for c in crop_indices}
+    for start, probabilities in sweep_chunks(inference, climate_row, axes, chunk_rows):
+        end = start + len(probabilities)
+        top_crop[start:end] = probabilities.argmax(axis=1)
+        for c, surface in surfaces.items():
+            surface[start:end] = probabilities[:, c]
+    return top_crop.reshape(shape), {c: surface.reshape(shape) for c, surface in surfaces.items()}
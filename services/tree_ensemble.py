@@ -0,0 +1,336 @@
+import json
+import numpy as np
+from services.shared_arrays import share_arrays
+
+# Tables bigger than this (cells across all groups) fall back to traversal
+MAX_TABLE_CELLS = 1 << 22
+
+
+class TreeEnsemble:
+    """Flat NumPy copy of a multi-class XGBoost booster.
+
+    Every tree is padded to a complete binary tree of the ensemble's maximum
+    depth (children of slot ``s`` sit at ``2s+1``/``2s+2``), so traversal is
+    ``max_depth`` vectorised compare/select steps over a (trees, rows) matrix.
+    Leaves above the bottom level are copied into both subtrees, which makes
+    the direction taken below them irrelevant.
+
+    Shallow ensembles are additionally compiled into lookup tables: trees are
+    grouped by the features they split on, each feature value is bucketed once
+    against the sorted split thresholds, and the summed leaf margins of a group
+    are read from a table indexed by those buckets. Traversal is only used to
+    build the tables (and when they would be too large).
+
+    ``predict_proba`` takes the same float32 matrix as the wrapped
+    ``XGBClassifier`` and returns the same probabilities within float rounding.
+    After ``fold_scaler`` it takes raw, unscaled float64 features instead.
+    """
+
+    def __init__(self, feature, threshold, default_left, leaf_value, n_classes, base_score):
+        self.feature = feature            # (trees, 2**depth - 1) split feature per slot
+        self.threshold = threshold        # (trees, 2**depth - 1) go left if x < threshold
+        self.default_left = default_left  # (trees, 2**depth - 1) direction for NaN
+        self.leaf_value = leaf_value      # (trees, 2**depth) leaf margins
+        self.n_classes = int(n_classes)
+        self.base_score = float(base_score)
+        self.n_trees, self.n_slots = feature.shape
+        self.max_depth = int(np.log2(self.n_slots + 1))
+        self.tree_class = np.arange(self.n_trees) % self.n_classes  # Trees cycle through the classes
+        # Rows per pass; keeps the temporary work arrays cache sized
+        self.chunk_rows = 1024
+        self._compile_tables()
+        self._share()
+
+    @classmethod
+    def from_booster(cls, booster):
+        """Export the trees of an ``xgboost.Booster`` (or ``XGBClassifier``)."""
+        booster = best_rounds(booster)
+        learner = json.loads(booster.save_raw(raw_format="json"))["learner"]
+        params = learner["learner_model_param"]
+        model = learner["gradient_booster"]["model"]
+        n_classes = max(int(params["num_class"]), 1)
+        if learner["objective"]["name"] != "multi:softprob" or int(model["gbtree_model_param"]["num_parallel_tree"]) != 1:
+            raise ValueError("Only multi:softprob boosters with one tree per class and round are supported")
+        if model["tree_info"] != [i % n_classes for i in range(len(model["trees"]))]:
+            raise ValueError("Trees are not ordered round-robin by class")
+
+        trees = model["trees"]
+        depth = max(cls._depth(tree, 0) for tree in trees)
+        n_slots = 2 ** depth - 1
+        feature = np.zeros((len(trees), n_slots), dtype=np.int32)
+        threshold = np.full((len(trees), n_slots), np.inf, dtype=np.float32)
+        default_left = np.ones((len(trees), n_slots), dtype=bool)
+        leaf_value = np.zeros((len(trees), n_slots + 1), dtype=np.float32)
+        for t, tree in enumerate(trees):
+            cls._fill(tree, 0, 0, 0, depth, feature[t], threshold[t], default_left[t], leaf_value[t])
+        return cls(feature, threshold, default_left, leaf_value, n_classes, float(params["base_score"]))
+
+    def fold_scaler(self, mean, scale):
+        """Return a copy that takes raw features, with a StandardScaler folded in.
+
+        The scaled pipeline sends x left when ``float32((x - mean) / scale) <
+        threshold``. That is monotone in x, so each split has a raw boundary r
+        with ``x < r`` exactly when the scaled comparison holds; r is found by
+        bisection in float64, which keeps decisions identical for float64 inputs.
+        """
+        is_split = np.isfinite(self.threshold)
+        mean = np.asarray(mean, dtype=np.float64)[self.feature[is_split]]
+        scale = np.asarray(scale, dtype=np.float64)[self.feature[is_split]]
+        threshold = self.threshold[is_split]
+
+        def goes_left(x):
+            return ((x - mean) / scale).astype(np.float32) < threshold
+
+        # Neighbouring float32 thresholds bracket the raw boundary
+        lo = np.nextafter(threshold, np.float32(-np.inf)).astype(np.float64) * scale + mean
+        hi = np.nextafter(threshold, np.float32(np.inf)).astype(np.float64) * scale + mean
+        assert goes_left(lo).all() and not goes_left(hi).any()
+        for _ in range(128):
+            mid = lo + (hi - lo) / 2
+            left = goes_left(mid)
+            lo = np.where(left, mid, lo)
+            hi = np.where(left, hi, mid)
+            if (np.nextafter(lo, np.inf) >= hi).all():
+                break
+
+        raw_threshold = np.full(self.threshold.shape, np.inf, dtype=np.float64)
+        raw_threshold[is_split] = hi
+        return TreeEnsemble(self.feature, raw_threshold, self.default_left, self.leaf_value,
+                            self.n_classes, self.base_score)
+
+    @staticmethod
+    def _depth(tree, node):
+        if tree["left_children"][node] == -1:
+            return 0
+        return 1 + max(TreeEnsemble._depth(tree, tree["left_children"][node]),
+                       TreeEnsemble._depth(tree, tree["right_children"][node]))
+
+    @staticmethod
+    def _fill(tree, node, slot, level, depth, feature, threshold, default_left, leaf_value):
+        if tree["left_children"][node] == -1:
+            # Leaf: every bottom-level leaf below this slot carries its value
+            width = 2 ** (depth - level)
+            first = (slot - (2 ** level - 1)) * width
+            leaf_value[first:first + width] = tree["split_conditions"][node]
+            return
+        feature[slot] = tree["split_indices"][node]
+        threshold[slot] = tree["split_conditions"][node]
+        default_left[slot] = bool(tree["default_left"][node])
+        for child, child_slot in ((tree["left_children"][node], 2 * slot + 1),
+                                  (tree["right_children"][node], 2 * slot + 2)):
+            TreeEnsemble._fill(tree, child, child_slot, level + 1, depth,
+                               feature, threshold, default_left, leaf_value)
+
+    def _traverse(self, X, trees=slice(None)):
+        """Leaf margin reached in each tree, shape (trees, rows)."""
+        # Work on (trees, rows) so each split compares one contiguous feature column
+        columns = np.ascontiguousarray(np.asarray(X, dtype=self.threshold.dtype).T)
+        feature, threshold = self.feature[trees], self.threshold[trees]
+        default_left, leaf_value = self.default_left[trees], self.leaf_value[trees]
+        has_nan = np.isnan(columns).any()
+        # Index within the level; intp because 2 * position + 1 wraps a uint8 past depth 8
+        position = np.zeros((len(feature), columns.shape[1]), dtype=np.intp)
+        for level in range(self.max_depth):
+            go_left = None
+            for offset in range(2 ** level):
+                slot = 2 ** level - 1 + offset
+                values = columns[feature[:, slot]]
+                slot_left = values < threshold[:, slot, None]
+                if has_nan:
+                    slot_left |= np.isnan(values) & default_left[:, slot, None]
+                # Each (tree, row) keeps the decision of the slot it is sitting on
+                go_left = slot_left if go_left is None else np.where(position == offset, slot_left, go_left)
+            position = 2 * position + (~go_left)
+        leaves = np.zeros(position.shape, dtype=np.float32)
+        for leaf in range(self.n_slots + 1):
+            np.copyto(leaves, leaf_value[:, leaf, None], where=position == leaf)
+        return leaves
+
+    def _sum_by_class(self, leaves, tree_class):
+        margin = np.zeros((leaves.shape[1], self.n_classes), dtype=np.float64)
+        for c in range(self.n_classes):
+            margin[:, c] = leaves[tree_class == c].sum(axis=0, dtype=np.float64)
+        return margin
+
+    def _compile_tables(self):
+        """Group trees by split features and tabulate each group's class margins."""
+        self.tables = None
+        is_split = np.isfinite(self.threshold)
+        n_features = int(self.feature[is_split].max(initial=0)) + 1
+
+        # Global buckets per feature: 0 below every cut, i at/after cut i-1, last one for NaN
+        self.cuts = [np.unique(self.threshold[is_split & (self.feature == f)]) for f in range(n_features)]
+        representatives = [np.concatenate(([-np.inf], cuts, [np.nan])).astype(cuts.dtype) for cuts in self.cuts]
+
+        groups = {}
+        for t in range(self.n_trees):
+            groups.setdefault(tuple(sorted(set(self.feature[t][is_split[t]].tolist()))), []).append(t)
+        width = max(max(len(key) for key in groups), 1)
+        max_buckets = max(len(cuts) + 2 for cuts in self.cuts)
+
+        group_feature = np.zeros((len(groups), width), dtype=np.intp)
+        bucket_map = np.zeros((len(groups), width, max_buckets), dtype=np.intp)
+        stride = np.zeros((len(groups), width), dtype=np.intp)
+        offset = np.zeros(len(groups), dtype=np.intp)
+        tables = []
+        cells = 0
+        for g, (features, trees) in enumerate(groups.items()):
+            axes = []
+            for j, f in enumerate(features):
+                # Only the cuts this group's trees use matter for its table
+                local_cuts = np.unique(self.threshold[trees][is_split[trees] & (self.feature[trees] == f)])
+                local = np.searchsorted(local_cuts, representatives[f], side="right")
+                local[-1] = len(local_cuts) + 1
+                group_feature[g, j] = f
+                bucket_map[g, j, :len(local)] = local
+                axes.append(np.concatenate(([-np.inf], local_cuts, [np.nan])).astype(local_cuts.dtype))
+            shape = [len(axis) for axis in axes]
+            stride[g, :len(shape)] = [int(np.prod(shape[j + 1:])) for j in range(len(shape))]
+            offset[g] = cells
+            cells += int(np.prod(shape))
+            if cells > MAX_TABLE_CELLS:
+                return
+
+            # Evaluate the group's trees once on every bucket combination
+            grid = np.zeros((int(np.prod(shape)), n_features), dtype=self.threshold.dtype)
+            for j, values in enumerate(np.meshgrid(*axes, indexing="ij")):
+                grid[:, features[j]] = values.ravel()
+            tables.append(self._sum_by_class(self._traverse(grid, trees), self.tree_class[trees]))
+
+        self.tables = np.concatenate(tables).astype(np.float32)
+        self.group_feature, self.bucket_map = group_feature, bucket_map
+        self.stride, self.offset = stride, offset
+
+    def _share(self):
+        """Swap the model arrays for shared memory-mapped copies (if enabled)."""
+        names = ["feature", "threshold", "default_left", "leaf_value", "tree_class"]
+        if self.tables is not None:
+            names += ["tables", "group_feature", "bucket_map", "stride", "offset"]
+        arrays = {name: getattr(self, name) for name in names}
+        arrays.update({f"cuts_{f}": cuts for f, cuts in enumerate(self.cuts)})
+        shared = share_arrays("tree_ensemble", arrays)
+        for name in names:
+            setattr(self, name, shared[name])
+        self.cuts = [shared[f"cuts_{f}"] for f in range(len(self.cuts))]
+
+    def _margin_tables(self, X, groups=None):
+        buckets = np.empty((len(X), len(self.cuts)), dtype=np.intp)
+        for f, cuts in enumerate(self.cuts):
+            buckets[:, f] = np.searchsorted(cuts, X[:, f], side="right")
+            buckets[np.isnan(X[:, f]), f] = len(cuts) + 1
+        if groups is None:
+            groups = np.arange(len(self.offset))
+        code = np.broadcast_to(self.offset[groups], (len(X), len(groups))).copy()
+        for j in range(self.group_feature.shape[1]):
+            code += self.bucket_map[groups, j, buckets[:, self.group_feature[groups, j]]] * self.stride[groups, j]
+        return self.tables[code].sum(axis=1, dtype=np.float64)
+
+    def grid_terms(self, axes, fixed):
+        """Split the margins over a Cartesian grid into small per-axis tables.
+
+        ``axes`` lists ``(feature, values)`` for the grid dimensions and ``fixed``
+        maps the other features to scalars. A tree group's margin only depends
+        on the grid axes it splits on, so each group is tabulated over just
+        those axes. Returns ``(constant, terms)``, where each term is
+        ``(axis_numbers, table)`` with one table dimension per listed axis plus
+        one for the classes: the margin at grid index ``(i0, i1, ...)`` is
+        ``constant`` plus every ``table[i_a, i_b, ...]``. Returns None when the
+        lookup tables weren't compiled.
+        """
+        if self.tables is None:
+            return None
+        axis_of = {feature: a for a, (feature, _) in enumerate(axes)}
+        base = np.zeros(max(len(self.cuts), 1 + max([*fixed, *axis_of])), dtype=self.threshold.dtype)
+        for feature, value in fixed.items():
+            base[feature] = value
+        for feature, values in axes:
+            base[feature] = values[0]
+
+        # Groups that split on the same grid axes are tabulated together
+        by_axes = {}
+        for g in range(len(self.offset)):
+            features = self.group_feature[g][self.stride[g] > 0]
+            key = tuple(sorted({axis_of[f] for f in features.tolist() if f in axis_of}))
+            by_axes.setdefault(key, []).append(g)
+
+        constant = np.full(self.n_classes, self.base_score, dtype=np.float64)
+        terms = []
+        for key, groups in by_axes.items():
+            values = [axes[a][1] for a in key]
+            X = np.tile(base, (int(np.prod([len(v) for v in values])), 1))
+            for a, mesh in zip(key, np.meshgrid(*values, indexing="ij")):
+                X[:, axes[a][0]] = mesh.ravel()
+            margin = self._margin_tables(X, np.array(groups, dtype=np.intp))
+            if key:
+                terms.append((key, margin.reshape([len(v) for v in values] + [self.n_classes])))
+            else:
+                constant += margin[0]
+        return constant, terms
+
+    def predict_margin(self, X):
+        """Raw per-class margins, shape (rows, n_classes)."""
+        X = np.asarray(X, dtype=self.threshold.dtype)
+        margin = np.empty((len(X), self.n_classes), dtype=np.float32)
+        for start in range(0, len(X), self.chunk_rows):
+            chunk = X[start:start + self.chunk_rows]
+            if self.tables is not None:
+                chunk_margin = self._margin_tables(chunk)
+            else:
+                chunk_margin = self._sum_by_class(self._traverse(chunk), self.tree_class)
+            margin[start:start + self.chunk_rows] = chunk_margin + self.base_score
+        return margin
+
+    def predict_proba(self, X):
+        return softmax(self.predict_margin(X))
+
+    def save(self, path, **extra):
+        np.savez(path, feature=self.feature, threshold=self.threshold, default_left=self.default_left,
+                 leaf_value=self.leaf_value, n_classes=self.n_classes, base_score=self.base_score, **extra)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls(arrays["feature"], arrays["threshold"], arrays["default_left"],
+                       arrays["leaf_value"], int(arrays["n_classes"]), float(arrays["base_score"]))
+
+
+def best_rounds(booster):
+    """The ``xgboost.Booster`` of a booster or classifier, cut after its best round.
+
+    Early-stopped models predict with the rounds up to the best one only.
+    """
+    if hasattr(booster, "get_booster"):
+        booster = booster.get_booster()
+    best_iteration = booster.attr("best_iteration")
+    if best_iteration is not None and int(best_iteration) + 1 < booster.num_boosted_rounds():
+        booster = booster[: int(best_iteration) + 1]
+    return booster
+
+
+def softmax(margin):
+    """Class probabilities from float32 margins, computed in place."""
+    margin -= margin.max(axis=1, keepdims=True)
+    np.exp(margin, out=margin)
+    margin /= margin.sum(axis=1, keepdims=True)
+    return margin
+
+
+def export_raw_model(model, scaler, label_encoder, path):
+    """Write the "raw-feature" artifact: trees with the scaler folded in."""
+    ensemble = TreeEnsemble.from_booster(model).fold_scaler(scaler.mean_, scaler.scale_)
+    ensemble.save(path, classes=np.asarray(label_encoder.classes_, dtype=str),
+                  feature_names=np.asarray(getattr(scaler, "feature_names_in_", []), dtype=str))
+    return ensemble
+
+
+if __name__ == "__main__":
+    # Rebuild models/crop_model_raw.npz from the pickled model and scaler
+    import os
+    import joblib
+
+    models_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models")
+    export_raw_model(joblib.load(os.path.join(models_dir, "crop_prediction_xgb_model.pkl")),
+                     joblib.load(os.path.join(models_dir, "scaler.pkl")),
+                     joblib.load(os.path.join(models_dir, "label_encoder.pkl")),
+                     os.path.join(models_dir, "crop_model_raw.npz"))
+    print("✅ Exported models/crop_model_raw.npz")
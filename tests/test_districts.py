@@ -0,0 +1,27 @@
+"""Resolution of misspelled district names."""
+import pytest
+from services.districts import resolve_query, within_one_edit
+
+
+@pytest.mark.parametrize("query, district", [
+    ("puen", "PUNE"), ("pnue", "PUNE"), ("nagpr", "NAGPUR"), ("mumbia", "MUMBAI"), ("chenai", "CHENNAI"),
+])
+def test_short_typos_resolve(query, district):
+    assert resolve_query(query) == (district, "fuzzy")
+
+
+@pytest.mark.parametrize("query", ["delhi", "goa", "xx"])
+def test_short_names_need_a_close_match(query):
+    assert resolve_query(query) == (query, None)
+
+
+def test_exact_names_are_kept():
+    assert resolve_query("Pune") == ("Pune", "exact")
+
+
+@pytest.mark.parametrize("a, b, expected", [
+    ("pune", "pune", True), ("puen", "pune", True), ("pne", "pune", True), ("puune", "pune", True),
+    ("pone", "pune", True), ("upen", "pune", False), ("ne delhi", "delhi", False),
+])
+def test_within_one_edit(a, b, expected):
+    assert within_one_edit(a, b) is expected
@@ -0,0 +1,25 @@
+"""Validation of /predict/sweep grid axes."""
+import pytest
+from services.sweep import SWEEP_MAX_POINTS, parse_axis
+
+
+def test_ranges_are_inclusive():
+    assert parse_axis({"min": 0, "max": 10, "step": 2.5}, 0).tolist() == [0.0, 2.5, 5.0, 7.5, 10.0]
+    assert parse_axis({"min": 0, "max": 1, "num": 3}, 0).tolist() == [0.0, 0.5, 1.0]
+
+
+@pytest.mark.parametrize("spec", [
+    {"min": 0, "max": 1, "num": SWEEP_MAX_POINTS + 1},
+    {"min": 0, "max": 1, "num": 1e300},
+    {"min": 0, "max": 1e12, "step": 1e-9},
+    {"min": 0, "max": 1, "step": 1e-320},
+])
+def test_oversized_axes_are_refused(spec):
+    with pytest.raises(ValueError, match="more than"):
+        parse_axis(spec, 0)
+
+
+@pytest.mark.parametrize("spec", [True, [1, False], {"min": 0, "max": 1, "num": True}, {"min": False, "max": 1, "step": 1}])
+def test_bools_are_not_numbers(spec):
+    with pytest.raises(ValueError):
+        parse_axis(spec, 0)
@@ -0,0 +1,101 @@
+"""Parity of the NumPy tree ensemble with the scaler + XGBClassifier pipeline it replaces.
+
+    python -m pytest tests/test_tree_ensemble.py
+"""
+import os
+import warnings
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from services.inference import feature_names, predict_top_k
+from services.tree_ensemble import TreeEnsemble
+from tools.check_raw_model import TOLERANCE, deep_model, two_stage
+
+models_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models")
+data_file_path = os.path.join(models_dir, "..", "data", "Crop_recommendation_real.csv")
+
+
+@pytest.fixture(scope="module", autouse=True)
+def quiet():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        yield
+
+
+@pytest.fixture(scope="module")
+def model():
+    return joblib.load(os.path.join(models_dir, "crop_prediction_xgb_model.pkl"))
+
+
+@pytest.fixture(scope="module")
+def scaler():
+    return joblib.load(os.path.join(models_dir, "scaler.pkl"))
+
+
+@pytest.fixture(scope="module")
+def data():
+    data = pd.read_csv(data_file_path)[feature_names]
+    return data.fillna(data.median())
+
+
+@pytest.fixture(scope="module")
+def raw_rows(data):
+    """Training rows, plus random inputs over (and beyond) the realistic ranges."""
+    rng = np.random.default_rng(7)
+    low, high = data.min().to_numpy(), data.max().to_numpy()
+    random_rows = rng.uniform(low - 0.2 * (high - low), high + 0.2 * (high - low), size=(5000, len(feature_names)))
+    return np.concatenate([data.to_numpy(), random_rows])
+
+
+@pytest.fixture(scope="module")
+def deep(data, scaler):
+    return deep_model(data, scaler)
+
+
+def assert_same_predictions(model, scaler, ensemble, raw):
+    expected = two_stage(model, scaler, raw)
+    actual = ensemble.predict_proba(raw)
+    assert float(np.abs(expected - actual).max()) <= TOLERANCE
+    top_expected, _ = predict_top_k(model, scaler, raw)
+    top_actual, _ = predict_top_k(ensemble, None, raw)
+    np.testing.assert_array_equal(top_actual, top_expected)
+
+
+def test_raw_artifact_matches_pipeline(model, scaler, data, raw_rows):
+    raw_model = TreeEnsemble.load(os.path.join(models_dir, "crop_model_raw.npz"))
+    # The split boundaries themselves, where rounding would show first
+    edges = np.repeat(data.median().to_numpy()[None, :], len(raw_model.cuts[0]), axis=0)
+    edges[:, 0] = raw_model.cuts[0]
+    assert_same_predictions(model, scaler, raw_model, np.concatenate([raw_rows, edges]))
+
+
+def test_fold_scaler_matches_pipeline(model, scaler, raw_rows):
+    ensemble = TreeEnsemble.from_booster(model).fold_scaler(scaler.mean_, scaler.scale_)
+    assert_same_predictions(model, scaler, ensemble, raw_rows)
+
+
+def test_scaled_rows_match_booster(model, scaler, data):
+    ensemble = TreeEnsemble.from_booster(model)
+    rng = np.random.default_rng(42)
+    random_rows = rng.normal(scale=2.0, size=(5000, len(feature_names))).astype(np.float32)
+    random_rows[rng.random(random_rows.shape) < 0.01] = np.nan
+    X = np.concatenate([scaler.transform(data).astype(np.float32), random_rows])
+    assert float(np.abs(model.predict_proba(X) - ensemble.predict_proba(X)).max()) <= TOLERANCE
+
+
+def test_deep_trees_match_pipeline(deep, scaler, raw_rows):
+    deep_raw = TreeEnsemble.from_booster(deep).fold_scaler(scaler.mean_, scaler.scale_)
+    # Leaf positions past depth 8 no longer fit in a uint8
+    assert deep_raw.max_depth > 8
+    assert_same_predictions(deep, scaler, deep_raw, raw_rows)
+
+
+@pytest.mark.parametrize("name", ["model", "deep"])
+def test_lookup_tables_match_traversal(request, scaler, raw_rows, name):
+    ensemble = TreeEnsemble.from_booster(request.getfixturevalue(name)).fold_scaler(scaler.mean_, scaler.scale_)
+    if ensemble.tables is None:
+        pytest.skip("lookup tables not compiled for this model")
+    rows = np.asarray(raw_rows, dtype=ensemble.threshold.dtype)
+    traversed = ensemble._sum_by_class(ensemble._traverse(rows), ensemble.tree_class)
+    np.testing.assert_allclose(ensemble._margin_tables(rows), traversed, atol=TOLERANCE)
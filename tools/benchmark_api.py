@@ -0,0 +1,334 @@
+"""End-to-end benchmark of the API against a local fake Open-Meteo server.
+
+Starts the fake archive API with a fixed latency and the app (gunicorn
+``app:app``, or ``async_app.py`` with ``--server async``) with an empty
+climate store. It then replays one request mix twice:
+
+- cold: nothing cached yet, so districts seen for the first time go upstream
+- warm: the same requests again, answered from the climate store and caches
+
+The mix is generated from the districts in rainfall.csv (popular districts
+more often, repeated soil readings, some lat/lon and misspelled queries), or
+replayed from a JSONL file with ``--mix``. For each phase and endpoint the
+report gives p50/p95/p99 latency and throughput. It also splits the client
+time into stages: waiting for a connection, the server's answer, and reading
+the body. Any ``Server-Timing`` stages the app reports are aggregated too.
+Results are saved as JSON named after the commit, so runs can be compared:
+
+    python -m tools.benchmark_api --requests 2000 --concurrency 32
+    python -m tools.benchmark_api --compare benchmarks/<older commit>.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import urllib.request
+import aiohttp
+import numpy as np
+from services.districts import get_registry, normalize_district
+from tools.load_test import start_app, start_fake_server
+from tools.measure_rss import free_port, repo_dir, wait_until_up
+
+benchmarks_dir = os.path.join(repo_dir, "benchmarks")
+PERCENTILES = (50, 95, 99)
+
+# Share of each kind of request in a generated mix
+DEFAULT_MIX = {
+    "predict": 0.55,
+    "predict_latlon": 0.10,
+    "predict_misspelled": 0.05,
+    "weather": 0.15,
+    "rainfall": 0.10,
+    "profile": 0.05,
+}
+# Soil readings come from a coarse grid, so identical requests recur as they do in practice
+SOIL_VALUES = {
+    "N": np.arange(0, 141, 10), "P": np.arange(5, 146, 10), "K": np.arange(5, 206, 20),
+    "ph": np.round(np.arange(4.5, 9.01, 0.5), 1),
+}
+SOIL_PROFILES = ["default", "alluvial", "black", "red", "laterite", "sandy", "clayey"]
+
+
+def build_mix(n, seed=42, shares=DEFAULT_MIX):
+    """``n`` requests as dicts with ``kind``, ``method``, ``path`` and ``params`` or ``json``."""
+    rng = np.random.default_rng(seed)
+    registry = get_registry()
+    names = np.array(sorted(set(registry.names)))
+    # A few districts get most of the traffic (Zipf-like), like a real rollout
+    names = names[rng.permutation(len(names))]
+    popularity = 1.0 / np.arange(1, len(names) + 1) ** 0.8
+    districts = rng.choice(names, size=n, p=popularity / popularity.sum())
+    kinds = rng.choice(list(shares), size=n, p=np.array(list(shares.values())) / sum(shares.values()))
+
+    mix = []
+    for kind, district in zip(kinds, districts):
+        district = str(district)
+        if kind.startswith("predict"):
+            body = {name: float(rng.choice(values)) for name, values in SOIL_VALUES.items()}
+            if kind == "predict_latlon":
+                position = registry.index.get(normalize_district(district))
+                lat, lon = (registry.lat[position], registry.lon[position]) if position is not None else (np.nan, np.nan)
+                if np.isnan(lat):
+                    body["district"] = district
+                else:
+                    body["lat"], body["lon"] = round(lat + rng.normal(0, 0.05), 4), round(lon + rng.normal(0, 0.05), 4)
+            elif kind == "predict_misspelled" and len(district) > 4:
+                drop = int(rng.integers(1, len(district) - 1))
+                body["district"] = (district[:drop] + district[drop + 1:]).lower()
+            else:
+                body["district"] = district
+            mix.append({"kind": kind, "method": "POST", "path": "/predict/", "json": body})
+        elif kind == "weather":
+            mix.append({"kind": kind, "method": "GET", "path": "/weather/", "params": {"district": district}})
+        elif kind == "rainfall":
+            mix.append({"kind": kind, "method": "GET", "path": "/rainfall/", "params": {"district": district}})
+        else:
+            params = {"district": district, "profile": str(rng.choice(SOIL_PROFILES))}
+            mix.append({"kind": kind, "method": "GET", "path": "/predict/profile", "params": params})
+    return mix
+
+
+def read_mix(path):
+    """A mix from a JSONL file (one request per line, as written by ``--save-mix``)."""
+    with open(path) as f:
+        mix = [json.loads(line) for line in f if line.strip()]
+    for request in mix:
+        request.setdefault("method", "GET")
+        request.setdefault("kind", request["path"])
+    return mix
+
+
+def parse_server_timing(header):
+    """``{stage: milliseconds}`` from a ``Server-Timing`` header."""
+    stages = {}
+    for entry in header.split(","):
+        name, *fields = [field.strip() for field in entry.split(";")]
+        for field in fields:
+            if field.startswith("dur="):
+                try:
+                    stages[name] = stages.get(name, 0.0) + float(field[4:])
+                except ValueError:
+                    pass
+    return stages
+
+
+def connection_tracer():
+    """Record when each request got its connection (pooled or new) in its trace context."""
+    async def connected(session, context, params):
+        context.trace_request_ctx["connected"] = time.perf_counter()
+
+    trace = aiohttp.TraceConfig()
+    trace.on_connection_reuseconn.append(connected)
+    trace.on_connection_create_end.append(connected)
+    return trace
+
+
+async def replay(base, mix, concurrency):
+    """Send every request with ``concurrency`` in flight; returns one record per request."""
+    records = []
+    queue = list(reversed(mix))
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=300)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                     trace_configs=[connection_tracer()]) as session:
+
+        async def client():
+            while queue:
+                request = queue.pop()
+                trace = {}
+                sent = time.perf_counter()
+                record = {"kind": request["kind"], "status": None, "server_stages": {}}
+                try:
+                    response = await session.request(request["method"], base + request["path"],
+                                                     params=request.get("params"), json=request.get("json"),
+                                                     trace_request_ctx=trace)
+                    answered = time.perf_counter()
+                    async with response:
+                        await response.read()
+                        record["status"] = response.status
+                        record["server_stages"] = parse_server_timing(response.headers.get("Server-Timing", ""))
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    answered = time.perf_counter()
+                done = time.perf_counter()
+                connected = trace.get("connected", sent)
+                record.update(latency=done - sent, wait=connected - sent, server=answered - connected,
+                              read=done - answered)
+                records.append(record)
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+    return records
+
+
+def latency_summary(seconds):
+    """Percentiles, mean and max in milliseconds."""
+    ms = np.asarray(seconds) * 1000
+    if not len(ms):
+        return {}
+    summary = {f"p{p}": round(float(np.percentile(ms, p)), 3) for p in PERCENTILES}
+    summary.update(mean=round(float(ms.mean()), 3), max=round(float(ms.max()), 3))
+    return summary
+
+
+def summarise(records, elapsed):
+    """Report of one phase: totals, latency, client and server stages, for all requests and per kind."""
+    def group(records):
+        statuses = {}
+        for record in records:
+            statuses[str(record["status"])] = statuses.get(str(record["status"]), 0) + 1
+        server_stages = {}
+        for record in records:
+            for name, ms in record["server_stages"].items():
+                server_stages.setdefault(name, []).append(ms / 1000)
+        return {
+            "requests": len(records),
+            "errors": sum(record["status"] != 200 for record in records),
+            "statuses": statuses,
+            "latency_ms": latency_summary([record["latency"] for record in records]),
+            "stages_ms": {stage: latency_summary([record[stage] for record in records])
+                          for stage in ("wait", "server", "read")},
+            "server_stages_ms": {name: latency_summary(values) for name, values in sorted(server_stages.items())},
+        }
+
+    report = group(records)
+    report.update(seconds=round(elapsed, 3), throughput_rps=round(len(records) / elapsed, 2) if elapsed else None)
+    kinds = sorted({record["kind"] for record in records})
+    report["by_kind"] = {kind: group([record for record in records if record["kind"] == kind]) for kind in kinds}
+    return report
+
+
+def upstream_calls(fake_port):
+    return json.load(urllib.request.urlopen(f"http://127.0.0.1:{fake_port}/stats"))["calls"]
+
+
+def git_revision():
+    """``(commit, dirty)`` of the working tree, or ``(None, None)`` outside git."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo_dir, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=repo_dir,
+                                capture_output=True, text=True, check=True).stdout
+        return commit, bool(status.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def run_benchmark(mix, server="sync", workers=4, concurrency=32, latency_ms=200, warm_rounds=1, env_overrides=None):
+    """Cold and warm runs of ``mix`` against a freshly started app; returns the phase reports."""
+    fake_port = free_port()
+    fake = start_fake_server(fake_port, latency_ms)
+    scratch = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        OPEN_METEO_ARCHIVE_URL=f"http://127.0.0.1:{fake_port}/v1/archive",
+        CLIMATE_STORE_PATH=os.path.join(scratch, "climate.sqlite"),
+        CLIMATE_ARTIFACT_PATH=os.path.join(scratch, "missing.npz"),
+        RESPONSE_CACHE_PATH=os.path.join(scratch, "response_cache.sqlite"),
+        WARMUP="1",
+        **(env_overrides or {}),
+    )
+    port = free_port()
+    process = start_app(server, port, workers, env)
+    phases = {}
+    try:
+        base = f"http://127.0.0.1:{port}"
+        wait_until_up(f"http://127.0.0.1:{fake_port}/stats")
+        wait_until_up(base + "/")
+        for phase in ["cold"] + [f"warm{i + 1}" if warm_rounds > 1 else "warm" for i in range(warm_rounds)]:
+            calls_before = upstream_calls(fake_port)
+            started = time.perf_counter()
+            records = asyncio.run(replay(base, mix, concurrency))
+            report = summarise(records, time.perf_counter() - started)
+            report["upstream_calls"] = upstream_calls(fake_port) - calls_before
+            phases[phase] = report
+    finally:
+        for child in (process, fake):
+            child.terminate()
+            child.wait(timeout=30)
+        shutil.rmtree(scratch, ignore_errors=True)
+    return phases
+
+
+def print_phase(name, report, baseline=None):
+    def delta(value, old):
+        if old in (None, 0) or value is None:
+            return ""
+        return f" ({(value - old) / old * 100:+.0f}%)"
+
+    latency = report["latency_ms"]
+    old = baseline or {}
+    old_latency = old.get("latency_ms", {})
+    print(f"🌾 {name}: {report['requests']} requests in {report['seconds']:.2f}s, "
+          f"{report['throughput_rps']:.1f} req/s{delta(report['throughput_rps'], old.get('throughput_rps'))}, "
+          f"{report['errors']} errors, {report['upstream_calls']} upstream calls")
+    print("   latency " + ", ".join(f"p{p} {latency[f'p{p}']:.1f} ms{delta(latency[f'p{p}'], old_latency.get(f'p{p}'))}"
+                                    for p in PERCENTILES))
+    stages = report["stages_ms"]
+    print("   client p50: " + ", ".join(f"{stage} {stages[stage]['p50']:.1f} ms" for stage in stages))
+    if report["server_stages_ms"]:
+        print("   server p50: " + ", ".join(f"{stage} {values['p50']:.2f} ms"
+                                          for stage, values in report["server_stages_ms"].items()))
+    for kind, group in report["by_kind"].items():
+        old_kind = old.get("by_kind", {}).get(kind, {}).get("latency_ms", {})
+        print(f"   {kind:<20} {group['requests']:>6} req  " +
+              "  ".join(f"p{p} {group['latency_ms'][f'p{p}']:>8.1f} ms{delta(group['latency_ms'][f'p{p}'], old_kind.get(f'p{p}'))}"
+                        for p in PERCENTILES) +
+              (f"  {group['errors']} errors" if group["errors"] else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--server", choices=["async", "sync"], default="sync")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers for --server sync")
+    parser.add_argument("--requests", type=int, default=1000, help="Size of a generated mix")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=200, help="Latency of the fake Open-Meteo server")
+    parser.add_argument("--warm-rounds", type=int, default=1, help="Warm replays after the cold one")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mix", metavar="JSONL", help="Replay these requests instead of generating a mix")
+    parser.add_argument("--save-mix", metavar="JSONL", help="Write the generated mix, to replay it later")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE",
+                        help="Extra environment for the app, e.g. --env RESPONSE_CACHE_SIZE=0")
+    parser.add_argument("--output", help="Results file (default: benchmarks/<commit>.json)")
+    parser.add_argument("--compare", metavar="JSON", help="Earlier results to print the changes against")
+    args = parser.parse_args()
+
+    mix = read_mix(args.mix) if args.mix else build_mix(args.requests, args.seed)
+    if args.save_mix:
+        with open(args.save_mix, "w") as f:
+            f.writelines(json.dumps(request) + "\n" for request in mix)
+
+    env_overrides = dict(item.split("=", 1) for item in args.env)
+    phases = run_benchmark(mix, args.server, args.workers, args.concurrency, args.latency_ms, args.warm_rounds,
+                           env_overrides)
+    commit, dirty = git_revision()
+    results = {
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {
+            "server": args.server, "workers": args.workers, "concurrency": args.concurrency,
+            "upstream_latency_ms": args.latency_ms, "requests": len(mix), "seed": None if args.mix else args.seed,
+            "mix": args.mix, "env": env_overrides,
+        },
+        "phases": phases,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"📊 Compared with {args.compare} ({(baseline.get('commit') or '?')[:10]})")
+    for name, report in phases.items():
+        print_phase(name, report, (baseline or {}).get("phases", {}).get(name))
+
+    output = args.output or os.path.join(benchmarks_dir, f"{(commit or 'unknown')[:10]}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results saved to {output}")
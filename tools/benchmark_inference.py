@@ -0,0 +1,63 @@
+"""Micro-benchmark: per-season DataFrame inference vs one batched call.
+
+    python -m tools.benchmark_inference --repeat 2000
+"""
+import argparse
+import os
+import time
+import warnings
+import joblib
+import numpy as np
+import pandas as pd
+from services.inference import build_feature_matrix, feature_names, predict_top_k
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+models_dir = os.path.join(current_dir, "..", "models")
+
+# One request: fixed soil values, one (temperature, humidity, rainfall) row per season
+SOIL = (50.0, 30.0, 40.0, 6.5)
+CLIMATE = [(30.6, 67.7, 36.6), (25.1, 67.7, 861.0), (27.1, 67.7, 117.4)]
+
+
+def per_season(model, scaler):
+    """The original path: one DataFrame, transform and predict_proba per season."""
+    nitrogen, phosphorus, potassium, ph_level = SOIL
+    results = []
+    for temp, humidity, rainfall in CLIMATE:
+        input_data = pd.DataFrame([[nitrogen, phosphorus, potassium, temp, humidity, ph_level, rainfall]],
+                                  columns=feature_names)
+        prediction_probs = model.predict_proba(scaler.transform(input_data))[0]
+        results.append(np.argsort(prediction_probs)[-3:][::-1])
+    return np.array(results)
+
+
+def batched(model, scaler):
+    input_data = build_feature_matrix(*SOIL, CLIMATE)
+    top_indices, _ = predict_top_k(model, scaler, input_data, k=3)
+    return top_indices
+
+
+def time_per_call(fn, repeat):
+    fn()  # Warm up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    model = joblib.load(os.path.join(models_dir, "crop_prediction_xgb_model.pkl"))
+    scaler = joblib.load(os.path.join(models_dir, "scaler.pkl"))
+
+    assert (per_season(model, scaler) == batched(model, scaler)).all(), "top-3 results differ"
+
+    old = time_per_call(lambda: per_season(model, scaler), args.repeat)
+    new = time_per_call(lambda: batched(model, scaler), args.repeat)
+    print(f"per-season (3 DataFrames, 3 predict_proba): {old * 1e6:9.1f} µs/request")
+    print(f"batched    (1 matrix, 1 predict_proba):     {new * 1e6:9.1f} µs/request")
+    print(f"saving: {(old - new) * 1e6:.1f} µs/request ({old / new:.1f}x)")
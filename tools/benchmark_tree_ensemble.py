@@ -0,0 +1,69 @@
+"""Parity check and latency benchmark: XGBClassifier vs the NumPy tree ensemble.
+
+    python -m tools.benchmark_tree_ensemble --repeat 200
+"""
+import argparse
+import os
+import time
+import warnings
+import joblib
+import numpy as np
+import pandas as pd
+from services.tree_ensemble import TreeEnsemble
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+models_dir = os.path.join(current_dir, "..", "models")
+data_file_path = os.path.join(current_dir, "..", "data", "Crop_recommendation_real.csv")
+
+TOLERANCE = 1e-5
+
+
+def check_parity(model, ensemble, X):
+    """Fail loudly if any probability differs by more than TOLERANCE."""
+    expected = model.predict_proba(X)
+    actual = ensemble.predict_proba(X)
+    max_error = float(np.abs(expected - actual).max())
+    flipped = int((expected.argmax(axis=1) != actual.argmax(axis=1)).sum())
+    print(f"parity on {len(X)} rows: max |Δp| = {max_error:.2e}, top-1 flips = {flipped}")
+    assert max_error <= TOLERANCE, f"probabilities differ by {max_error}"
+    return max_error
+
+
+def time_per_call(fn, X, repeat):
+    fn(X)  # Warm up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(X)
+    return (time.perf_counter() - started) / repeat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    model = joblib.load(os.path.join(models_dir, "crop_prediction_xgb_model.pkl"))
+    scaler = joblib.load(os.path.join(models_dir, "scaler.pkl"))
+
+    started = time.perf_counter()
+    ensemble = TreeEnsemble.from_booster(model)
+    print(f"exported {ensemble.n_trees} trees (depth {ensemble.max_depth}) in {time.perf_counter() - started:.2f}s")
+
+    # Real (scaled) training rows, plus random rows with some missing values
+    data = pd.read_csv(data_file_path).drop(columns=["label"])
+    data = data.fillna(data.median())
+    real = scaler.transform(data).astype(np.float32)
+    rng = np.random.default_rng(42)
+    random_rows = rng.normal(scale=2.0, size=(10000, real.shape[1])).astype(np.float32)
+    random_rows[rng.random(random_rows.shape) < 0.01] = np.nan
+    check_parity(model, ensemble, real)
+    check_parity(model, ensemble, random_rows)
+
+    for batch_size in (1, 10000):
+        X = random_rows[:batch_size]
+        repeat = args.repeat if batch_size == 1 else max(args.repeat // 40, 3)
+        xgb = time_per_call(model.predict_proba, X, repeat)
+        compiled = time_per_call(ensemble.predict_proba, X, repeat)
+        print(f"batch {batch_size:>5}: XGBClassifier {xgb * 1e3:8.3f} ms | compiled {compiled * 1e3:8.3f} ms"
+              f" | {xgb / compiled:.1f}x")
@@ -0,0 +1,72 @@
+"""Parity check: raw-feature model artifact vs the scaler + XGBClassifier pipeline.
+
+    python -m tools.check_raw_model
+"""
+import os
+import warnings
+import joblib
+import numpy as np
+import pandas as pd
+from services.inference import feature_names, predict_top_k
+from services.tree_ensemble import TreeEnsemble
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+models_dir = os.path.join(current_dir, "..", "models")
+data_file_path = os.path.join(current_dir, "..", "data", "Crop_recommendation_real.csv")
+
+TOLERANCE = 1e-5
+
+
+def two_stage(model, scaler, raw):
+    """The original pipeline: DataFrame -> scaler.transform -> predict_proba."""
+    return model.predict_proba(scaler.transform(pd.DataFrame(raw, columns=feature_names)))
+
+
+def deep_model(data, scaler, max_depth=10):
+    """A few unregularised trees deeper than 8 levels, the depth where narrow leaf indices would wrap."""
+    from sklearn.preprocessing import LabelEncoder
+    from xgboost import XGBClassifier
+
+    labels = LabelEncoder().fit_transform(pd.read_csv(data_file_path)["label"])
+    model = XGBClassifier(n_estimators=3, max_depth=max_depth, learning_rate=1.0, min_child_weight=0, gamma=0,
+                          reg_lambda=0, tree_method="exact", random_state=0)
+    model.fit(scaler.transform(data.fillna(data.median())), labels)
+    return model
+
+
+if __name__ == "__main__":
+    warnings.filterwarnings("ignore")
+    model = joblib.load(os.path.join(models_dir, "crop_prediction_xgb_model.pkl"))
+    scaler = joblib.load(os.path.join(models_dir, "scaler.pkl"))
+    raw_model = TreeEnsemble.load(os.path.join(models_dir, "crop_model_raw.npz"))
+
+    # Training rows, plus random inputs over (and beyond) the realistic ranges
+    data = pd.read_csv(data_file_path)[feature_names]
+    rng = np.random.default_rng(7)
+    low, high = data.min().to_numpy(), data.max().to_numpy()
+    random_rows = rng.uniform(low - 0.2 * (high - low), high + 0.2 * (high - low), size=(20000, len(feature_names)))
+    # Include the split boundaries themselves, where rounding would show first
+    edges = np.repeat(data.median().to_numpy()[None, :], len(raw_model.cuts[0]), axis=0)
+    edges[:, 0] = raw_model.cuts[0]
+
+    # The same rows through a model with trees deeper than 8 levels
+    deep = deep_model(data, scaler)
+    deep_raw = TreeEnsemble.from_booster(deep).fold_scaler(scaler.mean_, scaler.scale_)
+    print(f"deep model: {deep_raw.max_depth} levels")
+
+    failed = deep_raw.max_depth <= 8
+    cases = [(name, model, raw_model, raw) for name, raw in (
+        ("training rows", data.fillna(data.median()).to_numpy()), ("random rows", random_rows), ("threshold rows", edges)
+    )]
+    cases += [("deep trees", deep, deep_raw, np.concatenate([data.fillna(data.median()).to_numpy(), random_rows]))]
+    for name, model, raw_model, raw in cases:
+        expected = two_stage(model, scaler, raw)
+        actual = raw_model.predict_proba(raw)
+        max_error = float(np.abs(expected - actual).max())
+        top_expected, _ = predict_top_k(model, scaler, raw)
+        top_actual, _ = predict_top_k(raw_model, None, raw)
+        mismatches = int((top_expected != top_actual).any(axis=1).sum())
+        print(f"{name:>14}: {len(raw)} rows, max |Δp| = {max_error:.2e}, top-3 mismatches = {mismatches}")
+        failed |= max_error > TOLERANCE or mismatches > 0
+
+    raise SystemExit(1 if failed else 0)
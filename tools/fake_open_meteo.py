@@ -0,0 +1,138 @@
+"""Local stand-in for the Open-Meteo archive API.
+
+Serves deterministic hourly series (or their daily means) for any coordinate
+so jobs and benchmarks can run without touching the network:
+
+    python -m tools.fake_open_meteo --port 8089 --latency-ms 200
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+
+
+def synthetic_series(lat, lon, start_date, end_date):
+    """Hourly temperature and humidity that vary smoothly with place and time."""
+    days = (date.fromisoformat(end_date) - date.fromisoformat(start_date)).days + 1
+    month = date.fromisoformat(start_date).month
+    base_temp = 32.0 - 0.35 * abs(lat - 10.0) + 4.0 * math.sin(month / 12.0 * 2 * math.pi)
+    base_humidity = 55.0 + 20.0 * math.cos(lon / 10.0)
+    diurnal = np.tile(np.sin(np.arange(24) / 24.0 * 2 * math.pi), days)
+    temperature = np.round(base_temp + 5.0 * diurnal, 1)
+    humidity = np.round(base_humidity - 10.0 * diurnal)
+    return temperature, humidity
+
+
+def daily_means(hourly, decimals):
+    return np.round(hourly.reshape(-1, 24).mean(axis=1), decimals)
+
+
+class FakeOpenMeteoHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    failure_rate = 0.0
+    calls = 0
+    in_flight = 0
+    peak_in_flight = 0
+    calls_lock = threading.Lock()
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/stats":
+            # Call counters for load tests that run the server in another process
+            self.send_json(200, {"calls": self.calls, "peak_in_flight": self.peak_in_flight})
+            return
+        handler = type(self)
+        with self.calls_lock:
+            handler.calls += 1
+            handler.in_flight += 1
+            handler.peak_in_flight = max(handler.peak_in_flight, handler.in_flight)
+        try:
+            self.answer()
+        finally:
+            with self.calls_lock:
+                handler.in_flight -= 1
+
+    def answer(self):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            self.send_json(503, {"error": True, "reason": "Injected failure"})
+            return
+
+        query = parse_qs(urlparse(self.path).query)
+        try:
+            # Comma-separated coordinates ask for several locations at once
+            lats = [float(value) for value in query["latitude"][0].split(",")]
+            lons = [float(value) for value in query["longitude"][0].split(",")]
+            start_date, end_date = query["start_date"][0], query["end_date"][0]
+            if len(lats) != len(lons):
+                raise ValueError
+        except (KeyError, ValueError):
+            self.send_json(400, {"error": True, "reason": "Invalid query"})
+            return
+
+        payloads = [self.location(lat, lon, start_date, end_date, query) for lat, lon in zip(lats, lons)]
+        self.send_json(200, payloads if len(payloads) > 1 else payloads[0])
+
+    def location(self, lat, lon, start_date, end_date, query):
+        temperature, humidity = synthetic_series(lat, lon, start_date, end_date)
+        payload = {"latitude": lat, "longitude": lon}
+        if "hourly" in query:
+            payload["hourly"] = {
+                "temperature_2m": temperature.tolist(),
+                "relative_humidity_2m": humidity.astype(int).tolist(),
+            }
+        if "daily" in query:
+            payload["daily"] = {
+                "temperature_2m_mean": daily_means(temperature, 1).tolist(),
+                "relative_humidity_2m_mean": daily_means(humidity, 0).astype(int).tolist(),
+            }
+        return payload
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # Load tests open hundreds of connections at once
+
+
+def start_server(host="127.0.0.1", port=0, latency_ms=0, failure_rate=0.0):
+    """Start the fake server in a daemon thread; returns (server, archive_url)."""
+    handler = type("Handler", (FakeOpenMeteoHandler,), {
+        "latency": latency_ms / 1000.0, "failure_rate": failure_rate,
+        "calls": 0, "in_flight": 0, "peak_in_flight": 0,
+    })
+    server = FakeServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1/archive"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Open-Meteo archive API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--failure-rate", type=float, default=0, help="Fraction of calls answered with a 503")
+    args = parser.parse_args()
+
+    server, url = start_server(args.host, args.port, args.latency_ms, args.failure_rate)
+    print(f"Fake Open-Meteo archive API listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,116 @@
+"""Load test /weather/ or /predict/ against a local fake Open-Meteo server.
+
+Starts the fake archive API with a fixed latency, then either the async app
+or the sync app under gunicorn, each with an empty climate store so every
+district is a cold upstream fetch. Requests go out with a fixed number in
+flight; the report shows throughput, latency and how many upstream calls the
+server had open at once.
+
+    python -m tools.load_test --server async --concurrency 256
+    python -m tools.load_test --server sync --concurrency 256
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import aiohttp
+import numpy as np
+from services.districts import get_registry
+from tools.measure_rss import free_port, repo_dir, wait_until_up
+
+
+def start_fake_server(port, latency_ms):
+    # Its own process, so serving the fake archive doesn't compete with the load generator
+    command = [sys.executable, "-m", "tools.fake_open_meteo", "--port", str(port), "--latency-ms", str(latency_ms)]
+    return subprocess.Popen(command, cwd=repo_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def start_app(server, port, workers, env):
+    if server == "async":
+        command = [sys.executable, "async_app.py", "--host", "127.0.0.1", "--port", str(port)]
+    else:
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"]
+        env = dict(env, BIND=f"127.0.0.1:{port}", WEB_CONCURRENCY=str(workers))
+    return subprocess.Popen(command, cwd=repo_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def drive(base, endpoint, districts, concurrency):
+    """Send one request per district with ``concurrency`` in flight; returns (latencies, errors)."""
+    latencies, errors = [], 0
+    queue = list(reversed(districts))
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=300)) as session:
+
+        async def client():
+            nonlocal errors
+            while queue:
+                district = queue.pop()
+                sent = time.perf_counter()
+                try:
+                    if endpoint == "weather":
+                        response = await session.get(f"{base}/weather/", params={"district": district})
+                    else:
+                        response = await session.post(f"{base}/predict/", json={"district": district})
+                    async with response:
+                        await response.read()
+                        errors += response.status != 200
+                except aiohttp.ClientError:
+                    errors += 1
+                latencies.append(time.perf_counter() - sent)
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--server", choices=["async", "sync"], default="async")
+    parser.add_argument("--endpoint", choices=["weather", "predict"], default="weather")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers for --server sync")
+    parser.add_argument("--latency-ms", type=float, default=200)
+    args = parser.parse_args()
+
+    fake_port = free_port()
+    fake = start_fake_server(fake_port, args.latency_ms)
+    url = f"http://127.0.0.1:{fake_port}/v1/archive"
+    scratch = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        OPEN_METEO_ARCHIVE_URL=url,
+        CLIMATE_STORE_PATH=os.path.join(scratch, "climate.sqlite"),
+        CLIMATE_ARTIFACT_PATH=os.path.join(scratch, "missing.npz"),
+        RESPONSE_CACHE_SIZE="0",
+        WARMUP="1",
+    )
+    names = sorted(set(get_registry().names))
+    districts = [names[i % len(names)] for i in range(args.requests)]
+
+    port = free_port()
+    process = start_app(args.server, port, args.workers, env)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        wait_until_up(f"http://127.0.0.1:{fake_port}/stats")
+        wait_until_up(base + "/")
+        started = time.perf_counter()
+        latencies, errors = asyncio.run(drive(base, args.endpoint, districts, args.concurrency))
+        elapsed = time.perf_counter() - started
+        upstream = json.load(urllib.request.urlopen(f"http://127.0.0.1:{fake_port}/stats"))
+    finally:
+        for child in (process, fake):
+            child.terminate()
+            child.wait(timeout=30)
+
+    latencies_ms = np.array(latencies) * 1000
+    print(f"🌾 {args.server} /{args.endpoint}/: {len(latencies)} requests, {args.concurrency} in flight, "
+          f"upstream latency {args.latency_ms:.0f} ms")
+    print(f"   {len(latencies) / elapsed:.1f} req/s over {elapsed:.2f}s, {errors} errors")
+    print(f"   latency p50 {np.percentile(latencies_ms, 50):.0f} ms, p95 {np.percentile(latencies_ms, 95):.0f} ms, "
+          f"max {latencies_ms.max():.0f} ms")
+    print(f"   upstream calls {upstream['calls']}, peak in flight {upstream['peak_in_flight']}")
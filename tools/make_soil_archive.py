@@ -0,0 +1,38 @@
+"""Write a large synthetic soil-test archive for exercising out-of-core training.
+
+Rows are drawn from Crop_recommendation_real.csv with Gaussian noise on
+every feature (and a few missing values), written chunk by chunk so the
+generator itself stays small.
+
+    python -m tools.make_soil_archive /tmp/archive.csv --rows 2000000
+"""
+import argparse
+import numpy as np
+import pandas as pd
+from services.inference import feature_names
+from training.pipeline import training_data_path
+
+
+def write_archive(path, rows, chunk_rows=200000, missing=0.001, seed=0):
+    rng = np.random.default_rng(seed)
+    source = pd.read_csv(training_data_path)
+    X = source[feature_names].to_numpy(dtype=np.float64)
+    labels = source["label"].to_numpy()
+    spread = X.std(axis=0) * 0.05
+    for start in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - start)
+        picks = rng.integers(len(X), size=n)
+        values = X[picks] + rng.normal(size=(n, len(feature_names))) * spread
+        values[rng.random(values.shape) < missing] = np.nan
+        chunk = pd.DataFrame(values.round(3), columns=feature_names)
+        chunk["label"] = labels[picks]
+        chunk.to_csv(path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=int, default=2000000)
+    args = parser.parse_args()
+    write_archive(args.path, args.rows)
+    print(f"✅ Wrote {args.rows} rows to {args.path}")
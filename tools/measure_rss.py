@@ -0,0 +1,99 @@
+"""Total memory of a gunicorn deployment with 1, 4 and 16 workers.
+
+Starts ``gunicorn -c gunicorn.conf.py app:app`` once per worker count and mode
+(pre-loaded shared artifacts vs per-worker loading), sends a few predictions
+so every worker has touched the model, then sums RSS and PSS over the master
+and its workers. PSS splits shared pages between the processes mapping them,
+so it is the number that shows copy-on-write sharing.
+
+    python -m tools.measure_rss --workers 1 4 16
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+repo_dir = os.path.join(current_dir, "..")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def memory_kb(pid):
+    """(rss, pss) in kB from /proc/<pid>/smaps_rollup."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:"):
+                values[parts[0]] = int(parts[1])
+    return values.get("Rss:", 0), values.get("Pss:", 0)
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def wait_until_up(url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def measure(workers, preload, requests_per_worker, env_overrides):
+    port = free_port()
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PRELOAD="1" if preload else "0",
+               BIND=f"127.0.0.1:{port}", **env_overrides)
+    process = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+                               cwd=repo_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        wait_until_up(base + "/")
+        body = json.dumps({"district": "PUNE", "N": 60, "P": 40, "K": 30, "ph": 6.8}).encode()
+        for _ in range(workers * requests_per_worker):
+            request = urllib.request.Request(base + "/predict/", data=body, headers={"Content-Type": "application/json"})
+            urllib.request.urlopen(request, timeout=30).read()
+        time.sleep(0.5)
+        pids = [process.pid] + children(process.pid)
+        totals = [sum(values) for values in zip(*(memory_kb(pid) for pid in pids))]
+        return {"workers": workers, "preload": preload, "processes": len(pids),
+                "rss_mb": round(totals[0] / 1024, 1), "pss_mb": round(totals[1] / 1024, 1)}
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests-per-worker", type=int, default=4)
+    args = parser.parse_args()
+
+    # Keep the run offline: a throwaway climate store filled from a local fake Open-Meteo server
+    from tools.fake_open_meteo import start_server
+
+    fake, archive_url = start_server()
+    overrides = {"CLIMATE_STORE_PATH": os.path.join(tempfile.mkdtemp(), "climate.sqlite"),
+                 "OPEN_METEO_ARCHIVE_URL": archive_url}
+
+    print(f"{'workers':>7} {'mode':>12} {'RSS MB':>9} {'PSS MB':>9}")
+    for workers in args.workers:
+        for preload in (False, True):
+            result = measure(workers, preload, args.requests_per_worker, overrides)
+            mode = "preload+mmap" if preload else "per-worker"
+            print(f"{result['workers']:>7} {mode:>12} {result['rss_mb']:>9} {result['pss_mb']:>9}")
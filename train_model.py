@@ -1,71 +1,67 @@
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import joblib
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.metrics import classification_report, accuracy_score
-from imblearn.over_sampling import SMOTE
-from xgboost import XGBClassifier, plot_importance
+import argparse
 import os
-
-# Load dataset
-data = pd.read_csv("./data/Crop_recommendation_real.csv")
-
-# Handle missing values (only for numeric columns)
-numeric_cols = data.select_dtypes(include=[np.number]).columns
-data[numeric_cols] = data[numeric_cols].fillna(data[numeric_cols].median())
-
-# Encode categorical target variable
-label_encoder = LabelEncoder()
-data["label"] = label_encoder.fit_transform(data["label"])
-
-# Separate features and target
-X = data.drop(columns=["label"])
-y = data["label"]
-
-# Normalize numerical features
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
-
-# Handle class imbalance using SMOTE
-smote = SMOTE(random_state=42)
-X_resampled, y_resampled = smote.fit_resample(X_scaled, y)
-
-# Split data into train and test sets
-X_train, X_test, y_train, y_test = train_test_split(X_resampled, y_resampled, test_size=0.2, random_state=42)
-
-# Train best XGBoost model with optimized hyperparameters
-best_xgb = XGBClassifier(n_estimators=100, max_depth=2, learning_rate=0.05, gamma=0.2, subsample=0.7, 
-                         reg_lambda=5, reg_alpha=0.5, min_child_weight=3, eval_metric='logloss')
-
-best_xgb.fit(X_train, y_train)
-
-# Evaluate model
-train_accuracy = best_xgb.score(X_train, y_train)
-test_accuracy = best_xgb.score(X_test, y_test)
-
-print(f"Training Accuracy: {train_accuracy:.4f}")
-print(f"Test Accuracy: {test_accuracy:.4f}")
-
-# Detailed classification report
-y_pred = best_xgb.predict(X_test)
-print("Classification Report:")
-print(classification_report(y_test, y_pred))
+import joblib
+import numpy as np
+from services.model_bundle import activate, write_bundle
+from services.tree_ensemble import export_raw_model
+from training.pipeline import DEFAULT_PARAMS, load_prepared, print_report, run_experiment, search
+
+parser = argparse.ArgumentParser(description="Train the crop recommendation model")
+parser.add_argument("--output", default="models", help="Directory for the model and preprocessing files")
+parser.add_argument("--no-activate", action="store_true", help="Write the bundle without making it the served one")
+parser.add_argument("--search", type=int, default=0, metavar="N",
+                    help="Pick hyperparameters by a randomised search over N candidates first")
+parser.add_argument("--no-cache", action="store_true", help="Redo preprocessing instead of using the cache")
+parser.add_argument("--plot", action="store_true", help="Show the feature importance chart")
+parser.add_argument("--stream", metavar="PATH",
+                    help="Train out of core on a large CSV or Parquet archive instead of the bundled dataset")
+parser.add_argument("--max-rows-per-class", type=int,
+                    help="With --stream, train on a bounded per-class sample so memory doesn't grow with the file")
+args = parser.parse_args()
+
+if args.stream:
+    from training.streaming import print_streaming_report, train_streaming
+    best_xgb, scaler, label_encoder, report = train_streaming(args.stream, max_rows_per_class=args.max_rows_per_class)
+    print_streaming_report(report)
+else:
+    # Median fill, label encoding, scaling, SMOTE and the splits come from the shared cache
+    prepared = load_prepared(use_cache=not args.no_cache)
+    scaler, label_encoder = prepared.scaler, prepared.label_encoder
+
+    # Train the XGBoost model (hist, early stopping on the validation split)
+    params = search(prepared, n_iter=args.search)[0]["params"] if args.search else DEFAULT_PARAMS
+    best_xgb, report = run_experiment(params, prepared)
+    print_report(report)
+
+    # Detailed classification report
+    from sklearn.metrics import classification_report
+    print("Classification Report:")
+    print(classification_report(prepared.y_test, best_xgb.predict(prepared.X_test)))
 
 # Feature importance visualization
-plot_importance(best_xgb)
-plt.title("Feature Importance in Crop Prediction Model")
-plt.show()
+if args.plot:
+    import matplotlib.pyplot as plt
+    from xgboost import plot_importance
+    plot_importance(best_xgb)
+    plt.title("Feature Importance in Crop Prediction Model")
+    plt.show()
 
 # Save trained model and preprocessing tools
-if not os.path.exists("pkl_files"):
-    os.makedirs("pkl_files")
-joblib.dump(best_xgb, "pkl_files/crop_prediction_xgb_model.pkl")
-joblib.dump(label_encoder, "pkl_files/label_encoder.pkl")
-joblib.dump(scaler, "pkl_files/scaler.pkl")
+os.makedirs(args.output, exist_ok=True)
+joblib.dump(best_xgb, os.path.join(args.output, "crop_prediction_xgb_model.pkl"))
+joblib.dump(label_encoder, os.path.join(args.output, "label_encoder.pkl"))
+joblib.dump(scaler, os.path.join(args.output, "scaler.pkl"))
+
+# Export the raw-feature model used by the API (scaler folded into the split thresholds)
+export_raw_model(best_xgb, scaler, label_encoder, os.path.join(args.output, "crop_model_raw.npz"))
+
+# Versioned bundle the API loads; activating it hot-swaps every running worker
+version = write_bundle(best_xgb, scaler, label_encoder.classes_, os.path.join(args.output, "bundles"),
+                       metadata={"report": report})
+if not args.no_activate:
+    activate(version, os.path.join(args.output, "bundles"))
 
-print("✅ Model training complete and saved successfully!")
+print(f"✅ Model training complete and saved successfully (bundle {version})!")
 
 # Test model on a new sample input
 sample_input = np.array([[40, 30, 15, 6.5, 200, 30, 70]])  # Example values
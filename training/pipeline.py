@@ -0,0 +1,260 @@
+"""Shared training pipeline: cached preprocessing, hist XGBoost with early stopping, parallel search.
+
+    python -m training.pipeline --search 30 --folds 5
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+import numpy as np
+from services.inference import feature_names
+
+# Get the absolute path of the current directory (training)
+current_dir = os.path.dirname(os.path.abspath(__file__))
+training_data_path = os.path.join(current_dir, "..", "data", "Crop_recommendation_real.csv")
+# Preprocessed matrices keyed by a hash of the CSV bytes and the config
+training_cache_dir = os.environ.get("TRAINING_CACHE_DIR", os.path.join(current_dir, "..", "data", "training_cache"))
+# Bump when preprocess() changes, so stale cache entries are never reused
+PREPROCESS_VERSION = 1
+
+DEFAULT_CONFIG = {
+    "data": training_data_path,
+    "test_size": 0.2,
+    "validation_size": 0.1,  # Of the training split, held out for early stopping
+    "random_state": 42,
+    "smote": True,
+}
+
+# The hyperparameters train_model.py has shipped with; n_estimators is now an upper bound
+DEFAULT_PARAMS = {
+    "n_estimators": 100, "max_depth": 2, "learning_rate": 0.05, "gamma": 0.2, "subsample": 0.7,
+    "reg_lambda": 5, "reg_alpha": 0.5, "min_child_weight": 3,
+}
+EARLY_STOPPING_ROUNDS = int(os.environ.get("EARLY_STOPPING_ROUNDS", "20"))
+
+# Search space of the old RandomizedSearchCV runs (n_estimators is now a cap for early stopping)
+PARAM_GRID = {
+    "n_estimators": [50, 100, 200],
+    "max_depth": [2, 3],
+    "learning_rate": [0.01, 0.05, 0.1],
+    "gamma": [0.1, 0.2, 0.5],
+    "subsample": [0.5, 0.7],
+    "reg_lambda": [1, 5, 10],
+    "reg_alpha": [0.1, 0.5, 1],
+    "min_child_weight": [3, 5, 7],
+}
+
+
+class Prepared:
+    """Train/validation/test matrices plus the fitted scaler and label encoder."""
+
+    def __init__(self, arrays):
+        from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+        self.arrays = arrays
+        for name in ("X_train", "y_train", "X_valid", "y_valid", "X_test", "y_test"):
+            setattr(self, name, arrays[name])
+        # Rebuilt from their fitted attributes, so the cache holds plain arrays only
+        self.scaler = StandardScaler()
+        self.scaler.mean_, self.scaler.scale_ = arrays["scaler_mean"], arrays["scaler_scale"]
+        self.scaler.var_ = self.scaler.scale_ ** 2
+        self.scaler.n_features_in_ = len(self.scaler.mean_)
+        self.scaler.n_samples_seen_ = len(self.X_train) + len(self.X_valid) + len(self.X_test)
+        self.label_encoder = LabelEncoder()
+        self.label_encoder.classes_ = arrays["classes"]
+
+
+def cache_key(config):
+    """Hash of the training CSV's bytes, the config and the preprocessing code version."""
+    digest = hashlib.sha1()
+    with open(config["data"], "rb") as f:
+        digest.update(f.read())
+    settings = {key: value for key, value in config.items() if key != "data"}
+    digest.update(json.dumps([PREPROCESS_VERSION, settings], sort_keys=True).encode())
+    return digest.hexdigest()[:20]
+
+
+def preprocess(config):
+    """Median fill, label encoding, scaling, SMOTE and the splits, as plain arrays."""
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    data = pd.read_csv(config["data"])
+    data.columns = data.columns.str.strip()
+    data[feature_names] = data[feature_names].fillna(data[feature_names].median())
+    label_encoder = LabelEncoder()
+    y = label_encoder.fit_transform(data["label"])
+    scaler = StandardScaler()
+    X = scaler.fit_transform(data[feature_names].to_numpy(dtype=np.float64))
+
+    # Same order as the original scripts: SMOTE on the scaled data, then split
+    if config["smote"]:
+        from imblearn.over_sampling import SMOTE
+        X, y = SMOTE(random_state=config["random_state"]).fit_resample(X, y)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=config["test_size"], random_state=config["random_state"]
+    )
+    X_train, X_valid, y_train, y_valid = train_test_split(
+        X_train, y_train, test_size=config["validation_size"], random_state=config["random_state"], stratify=y_train
+    )
+    return {
+        "X_train": X_train, "y_train": y_train, "X_valid": X_valid, "y_valid": y_valid,
+        "X_test": X_test, "y_test": y_test,
+        "scaler_mean": scaler.mean_, "scaler_scale": scaler.scale_, "classes": label_encoder.classes_.astype(str),
+    }
+
+
+def load_prepared(config=None, use_cache=True):
+    """``Prepared`` data for a config, reading the on-disk cache when the CSV and config match."""
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    path = os.path.join(training_cache_dir, f"prepared-{cache_key(config)}.npz")
+    if use_cache and os.path.exists(path):
+        with np.load(path, allow_pickle=False) as cached:
+            return Prepared({name: cached[name] for name in cached.files})
+
+    arrays = preprocess(config)
+    if use_cache:
+        os.makedirs(training_cache_dir, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(temp_path, **{name: np.asarray(value) for name, value in arrays.items()})
+        os.replace(temp_path, path)
+    return Prepared(arrays)
+
+
+def available_cores():
+    """Cores this process may run on (the affinity mask, not the whole machine)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def make_classifier(params, nthread=None, early_stopping_rounds=EARLY_STOPPING_ROUNDS):
+    from xgboost import XGBClassifier
+
+    return XGBClassifier(
+        **params, tree_method="hist", n_jobs=nthread or available_cores(), eval_metric="mlogloss",
+        early_stopping_rounds=early_stopping_rounds,
+    )
+
+
+def fit(X_train, y_train, X_valid, y_valid, params, nthread=None):
+    """Train with early stopping on the validation split; returns the fitted classifier."""
+    model = make_classifier(params, nthread)
+    model.fit(X_train, y_train, eval_set=[(X_valid, y_valid)], verbose=False)
+    return model
+
+
+def fit_and_score(X_train, y_train, X_stop, y_stop, X_score, y_score, params, nthread):
+    """Held-out accuracy, trees kept by early stopping and wall-clock seconds of one fit.
+
+    Early stopping watches ``X_stop``; accuracy is measured on ``X_score``,
+    which the fit never sees, so picking the best round doesn't inflate it.
+    """
+    started = time.perf_counter()
+    model = fit(X_train, y_train, X_stop, y_stop, params, nthread)
+    accuracy = float((model.predict(X_score) == y_score).mean())
+    return accuracy, model.best_iteration + 1, time.perf_counter() - started
+
+
+def thread_budget(n_jobs=-1):
+    """``(workers, threads per fit)`` so that workers x threads never exceeds the cores."""
+    cores = available_cores()
+    workers = cores if n_jobs is None or n_jobs < 1 else min(n_jobs, cores)
+    return workers, max(1, cores // workers)
+
+
+def search(prepared, n_iter=30, folds=5, n_jobs=-1, param_grid=PARAM_GRID, random_state=42,
+           stopping_size=DEFAULT_CONFIG["validation_size"]):
+    """Randomised search over ``param_grid`` with early stopping in every fold.
+
+    Each fold's training rows lose ``stopping_size`` of themselves to an
+    early-stopping split, and candidates are scored on the fold's held-out
+    rows, which neither training nor early stopping has seen. Every
+    (candidate, fold) fit is an independent job on a process pool sized by
+    ``thread_budget``, and each fit gets the remaining cores as XGBoost
+    threads. Preprocessing is not repeated: folds index the cached training
+    matrix. Returns one result dict per candidate, best first.
+    """
+    from joblib import Parallel, delayed
+    from sklearn.model_selection import ParameterSampler, StratifiedKFold, train_test_split
+
+    X = np.concatenate([prepared.X_train, prepared.X_valid])
+    y = np.concatenate([prepared.y_train, prepared.y_valid])
+    candidates = list(ParameterSampler(param_grid, n_iter=n_iter, random_state=random_state))
+    splits = []
+    for train, score in StratifiedKFold(n_splits=folds, shuffle=True, random_state=random_state).split(X, y):
+        train, stop = train_test_split(train, test_size=stopping_size, random_state=random_state, stratify=y[train])
+        splits.append((train, stop, score))
+    workers, nthread = thread_budget(n_jobs)
+
+    started = time.perf_counter()
+    scores = Parallel(n_jobs=workers)(
+        delayed(fit_and_score)(X[train], y[train], X[stop], y[stop], X[score], y[score], params, nthread)
+        for params in candidates for train, stop, score in splits
+    )
+    elapsed = time.perf_counter() - started
+
+    results = []
+    for c, params in enumerate(candidates):
+        accuracy, trees, seconds = np.array(scores[c * folds:(c + 1) * folds]).T
+        results.append({
+            "params": params, "accuracy": float(accuracy.mean()), "accuracy_std": float(accuracy.std()),
+            "trees": int(np.round(trees.mean())), "fit_seconds": float(seconds.sum()),
+        })
+    results.sort(key=lambda result: -result["accuracy"])
+    print(f"🔎 {len(candidates)} candidates x {folds} folds in {elapsed:.1f}s "
+          f"({workers} workers x {nthread} threads)")
+    return results
+
+
+def evaluate(model, prepared):
+    """Train and test accuracy of a fitted classifier."""
+    return {
+        "train_accuracy": float((model.predict(prepared.X_train) == prepared.y_train).mean()),
+        "test_accuracy": float((model.predict(prepared.X_test) == prepared.y_test).mean()),
+    }
+
+
+def run_experiment(params, prepared=None, config=None, nthread=None):
+    """Fit one parameter set on the cached data; returns ``(model, report)`` with timings."""
+    started = time.perf_counter()
+    prepared = prepared or load_prepared(config)
+    prepared_seconds = time.perf_counter() - started
+    model = fit(prepared.X_train, prepared.y_train, prepared.X_valid, prepared.y_valid, params, nthread)
+    report = {
+        "params": params, **evaluate(model, prepared), "trees": model.best_iteration + 1,
+        "prepare_seconds": round(prepared_seconds, 3), "wall_seconds": round(time.perf_counter() - started, 3),
+    }
+    return model, report
+
+
+def print_report(report):
+    print(f"⏱️ {report['wall_seconds']:.2f}s (data {report['prepare_seconds']:.2f}s), {report['trees']} trees: "
+          f"train {report['train_accuracy']:.4f}, test {report['test_accuracy']:.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--search", type=int, default=0, metavar="N", help="Randomised search over N candidates")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--jobs", type=int, default=-1, help="Parallel fits (default: one per core)")
+    parser.add_argument("--no-cache", action="store_true", help="Redo preprocessing without reading or writing the cache")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    prepared = load_prepared(use_cache=not args.no_cache)
+    print(f"📦 Data ready in {time.perf_counter() - started:.2f}s: {len(prepared.X_train)} train, "
+          f"{len(prepared.X_valid)} validation, {len(prepared.X_test)} test rows")
+
+    params = DEFAULT_PARAMS
+    if args.search:
+        results = search(prepared, n_iter=args.search, folds=args.folds, n_jobs=args.jobs)
+        for result in results[:5]:
+            print(f"   {result['accuracy']:.4f} ± {result['accuracy_std']:.4f}, {result['trees']} trees, "
+                  f"{result['fit_seconds']:.1f}s of fits: {result['params']}")
+        params = results[0]["params"]
+    _, report = run_experiment(params, prepared)
+    print_report(report)
@@ -0,0 +1,266 @@
+"""Out-of-core training for soil-test archives too large for memory.
+
+The CSV (or Parquet) file is read in fixed-dtype chunks. A first pass
+collects the labels, class counts, scaler statistics and a bounded sample
+for the median fill. Rows are assigned to train/validation/test by a hash
+of their position, and classes are balanced with per-row weights instead
+of SMOTE. Training then takes one of two routes:
+
+- external memory (default): XGBoost re-reads the file through an
+  iterator and pages the quantised chunks to disk. Only XGBoost's
+  per-row gradients (about 0.25 KB a row with 22 classes) stay in RAM.
+- ``max_rows_per_class``: the first pass also keeps a uniform sample of
+  at most that many rows per class, and training runs on the sample.
+  Memory is then bounded by the cap whatever the file size, and rare
+  classes are kept whole.
+
+    python -m training.streaming archive.csv
+    python -m training.streaming archive.csv --max-rows-per-class 20000
+    python train_model.py --stream archive.csv
+"""
+import argparse
+import os
+import resource
+import tempfile
+import time
+import numpy as np
+from services.inference import feature_names
+from training.pipeline import available_cores
+
+# Rows per chunk; peak memory grows with this, not with the file
+CHUNK_ROWS = int(os.environ.get("TRAINING_CHUNK_ROWS", "100000"))
+# Rows kept to estimate the median used for missing values
+MEDIAN_SAMPLE_ROWS = int(os.environ.get("TRAINING_MEDIAN_SAMPLE_ROWS", "100000"))
+FEATURE_DTYPES = {name: "float32" for name in feature_names}
+
+STREAM_PARAMS = {
+    "max_depth": 2, "learning_rate": 0.05, "gamma": 0.2, "subsample": 0.7,
+    "reg_lambda": 5, "reg_alpha": 0.5, "min_child_weight": 3,
+}
+
+
+def iter_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Yield ``(features, labels)`` chunks: a float32 (rows, 7) array and a string array."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=feature_names + ["label"]):
+            frame = batch.to_pandas()
+            yield frame[feature_names].to_numpy(dtype=np.float32), frame["label"].astype(str).str.strip().to_numpy()
+        return
+
+    import pandas as pd
+
+    reader = pd.read_csv(path, usecols=feature_names + ["label"], dtype={**FEATURE_DTYPES, "label": "string"},
+                         chunksize=chunk_rows)
+    for frame in reader:
+        yield frame[feature_names].to_numpy(dtype=np.float32), frame["label"].str.strip().to_numpy(dtype=str)
+
+
+def split_of(rows, test_size, validation_size):
+    """0 (train), 1 (validation) or 2 (test) per global row number, stable across passes."""
+    # Knuth's multiplicative hash spreads consecutive rows uniformly over [0, 1)
+    u = (rows.astype(np.uint64) * np.uint64(2654435761) % np.uint64(2 ** 32)) / 2 ** 32
+    return np.where(u < test_size, 2, np.where(u < test_size + validation_size, 1, 0))
+
+
+class Reservoir:
+    """Uniform sample of at most ``size`` rows from a stream of row blocks.
+
+    Every row gets a random key and the ``size`` smallest keys are kept
+    (bottom-k sampling), which works a block at a time with NumPy.
+    """
+
+    def __init__(self, size, width, rng):
+        self.size = size
+        self.rng = rng
+        self.rows = np.empty((0, width), dtype=np.float32)
+        self.keys = np.empty(0)
+
+    def add(self, rows):
+        keys = np.concatenate([self.keys, self.rng.random(len(rows))])
+        rows = np.concatenate([self.rows, rows])
+        if len(keys) > self.size:
+            keep = np.argpartition(keys, self.size)[:self.size]
+            rows, keys = rows[keep], keys[keep]
+        self.rows, self.keys = rows, keys
+
+
+class ArchiveStats:
+    """Everything training needs from the archive, gathered in one streaming pass.
+
+    With ``max_rows_per_class`` it also samples the training and validation
+    rows of every class into ``samples`` ({label: (rows, 8)}, the split in
+    the last column).
+    """
+
+    def __init__(self, path, chunk_rows=CHUNK_ROWS, test_size=0.2, validation_size=0.1,
+                 max_rows_per_class=None, sample_rows=MEDIAN_SAMPLE_ROWS, seed=42):
+        from sklearn.preprocessing import StandardScaler
+
+        rng = np.random.default_rng(seed)
+        self.scaler = StandardScaler()
+        counts = {}
+        median_sample = Reservoir(sample_rows, len(feature_names), rng)
+        samples = {}
+        self.rows = 0
+        for X, labels in iter_chunks(path, chunk_rows):
+            # StandardScaler.partial_fit ignores NaNs, like fit does
+            self.scaler.partial_fit(X)
+            names, n = np.unique(labels, return_counts=True)
+            for name, count in zip(names, n):
+                counts[name] = counts.get(name, 0) + int(count)
+            median_sample.add(X)
+            if max_rows_per_class:
+                split = split_of(np.arange(self.rows, self.rows + len(X)), test_size, validation_size)
+                rows = np.column_stack([X, split.astype(np.float32)])
+                for name in names:
+                    reservoir = samples.setdefault(name, Reservoir(max_rows_per_class, rows.shape[1], rng))
+                    reservoir.add(rows[(labels == name) & (split < 2)])
+            self.rows += len(X)
+
+        self.classes = np.array(sorted(counts))
+        self.class_counts = np.array([counts[name] for name in self.classes], dtype=np.int64)
+        self.medians = np.nanmedian(median_sample.rows, axis=0).astype(np.float32)
+        self.samples = {name: reservoir.rows for name, reservoir in samples.items()}
+        # Inverse-frequency weights: every class carries the same total weight
+        self.class_weights = balanced_weights(self.class_counts)
+
+
+def balanced_weights(class_counts):
+    """Per-class row weights that give every class the same total weight."""
+    return (class_counts.sum() / (len(class_counts) * np.maximum(class_counts, 1))).astype(np.float32)
+
+
+def prepare_chunk(X, labels, stats):
+    """Median-filled, scaled float32 features and label indices of one chunk."""
+    X = np.where(np.isnan(X), stats.medians, X)
+    X = ((X - stats.scaler.mean_) / stats.scaler.scale_).astype(np.float32)
+    return X, np.searchsorted(stats.classes, labels)
+
+
+def make_iterator(path, stats, split, test_size, validation_size, chunk_rows, cache_prefix):
+    """``xgboost.DataIter`` over one split of the archive, re-reading the file on every pass."""
+    import xgboost
+
+    class ChunkIterator(xgboost.DataIter):
+        def __init__(self):
+            super().__init__(cache_prefix=cache_prefix)
+            self._chunks = None
+            self._start = 0
+
+        def reset(self):
+            self._chunks = iter_chunks(path, chunk_rows)
+            self._start = 0
+
+        def next(self, input_data):
+            if self._chunks is None:
+                self.reset()
+            for X, labels in self._chunks:
+                rows = np.arange(self._start, self._start + len(X))
+                self._start += len(X)
+                mine = split_of(rows, test_size, validation_size) == split
+                if not mine.any():
+                    continue
+                X, y = prepare_chunk(X[mine], labels[mine], stats)
+                input_data(data=X, label=y, weight=stats.class_weights[y])
+                return 1
+            return 0
+
+    return ChunkIterator()
+
+
+def test_accuracy(booster, path, stats, test_size, validation_size, chunk_rows):
+    """Accuracy on the test split, scored chunk by chunk."""
+    correct = total = start = 0
+    for X, labels in iter_chunks(path, chunk_rows):
+        mine = split_of(np.arange(start, start + len(X)), test_size, validation_size) == 2
+        start += len(X)
+        if mine.any():
+            X, y = prepare_chunk(X[mine], labels[mine], stats)
+            correct += int((booster.inplace_predict(X).argmax(axis=1) == y).sum())
+            total += len(y)
+    return correct / max(total, 1)
+
+
+def sampled_matrices(stats):
+    """In-memory train and validation DMatrix of the per-class samples, reweighted to balance classes."""
+    import xgboost
+
+    rows = np.concatenate([stats.samples.get(name, np.empty((0, 8), np.float32)) for name in stats.classes])
+    labels = np.repeat(stats.classes, [len(stats.samples.get(name, ())) for name in stats.classes])
+    X, y = prepare_chunk(rows[:, :-1], labels, stats)
+    split = rows[:, -1]
+    weights = balanced_weights(np.bincount(y[split == 0], minlength=len(stats.classes)))[y]
+    train = xgboost.DMatrix(X[split == 0], label=y[split == 0], weight=weights[split == 0])
+    valid = xgboost.DMatrix(X[split == 1], label=y[split == 1], weight=weights[split == 1])
+    return train, valid
+
+
+def train_streaming(path, params=None, num_boost_round=100, early_stopping_rounds=20, test_size=0.2,
+                    validation_size=0.1, chunk_rows=CHUNK_ROWS, max_rows_per_class=None, cache_dir=None):
+    """Train on ``path`` without loading it; returns ``(classifier, scaler, label_encoder, report)``.
+
+    The classifier, scaler and label encoder are the same types train_model.py
+    saves, so the API and export_raw_model take them unchanged.
+    """
+    import xgboost
+    from sklearn.preprocessing import LabelEncoder
+
+    started = time.perf_counter()
+    stats = ArchiveStats(path, chunk_rows, test_size, validation_size, max_rows_per_class)
+    scanned = time.perf_counter()
+    params = {
+        **STREAM_PARAMS, **(params or {}), "objective": "multi:softprob", "num_class": len(stats.classes),
+        "tree_method": "hist", "eval_metric": "mlogloss", "nthread": available_cores(),
+    }
+
+    with tempfile.TemporaryDirectory(dir=cache_dir) as scratch:
+        if max_rows_per_class:
+            train, valid = sampled_matrices(stats)
+        else:
+            # XGBoost pages the quantised chunks to disk under the scratch directory
+            train = xgboost.DMatrix(make_iterator(path, stats, 0, test_size, validation_size, chunk_rows,
+                                                  os.path.join(scratch, "train")))
+            valid = xgboost.DMatrix(make_iterator(path, stats, 1, test_size, validation_size, chunk_rows,
+                                                  os.path.join(scratch, "valid")))
+        booster = xgboost.train(params, train, num_boost_round=num_boost_round, evals=[(valid, "valid")],
+                                early_stopping_rounds=early_stopping_rounds, verbose_eval=False)
+        training_rows = train.num_row()
+        # Free the matrices while their page files can still be removed with the scratch directory
+        del train, valid
+    booster = booster[: booster.best_iteration + 1]
+    trained = time.perf_counter()
+
+    classifier = xgboost.XGBClassifier()
+    classifier.load_model(bytearray(booster.save_raw(raw_format="json")))
+    label_encoder = LabelEncoder()
+    label_encoder.classes_ = stats.classes.astype(object)
+    report = {
+        "rows": stats.rows, "training_rows": training_rows, "classes": len(stats.classes),
+        "trees": booster.num_boosted_rounds(),
+        "test_accuracy": test_accuracy(booster, path, stats, test_size, validation_size, chunk_rows),
+        "scan_seconds": round(scanned - started, 2), "train_seconds": round(trained - scanned, 2),
+        "wall_seconds": round(time.perf_counter() - started, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    return classifier, stats.scaler, label_encoder, report
+
+
+def print_streaming_report(report):
+    print(f"⏱️ {report['rows']} rows ({report['training_rows']} trained on) in {report['wall_seconds']:.1f}s (scan {report['scan_seconds']:.1f}s, "
+          f"train {report['train_seconds']:.1f}s), {report['trees']} rounds: test {report['test_accuracy']:.4f}, "
+          f"peak RSS {report['peak_rss_mb']} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="CSV or .parquet file with the 7 feature columns and label")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--max-rows-per-class", type=int, help="Train on a bounded per-class sample")
+    args = parser.parse_args()
+
+    *_, report = train_streaming(args.path, num_boost_round=args.rounds, chunk_rows=args.chunk_rows,
+                                 max_rows_per_class=args.max_rows_per_class)
+    print_streaming_report(report)